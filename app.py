@@ -3,11 +3,49 @@ CoachBot AI - Smart Fitness Assistance Web Application
 Powered by Google Gemini 2.5 Flash
 """
 
+import time
+_script_started = time.perf_counter()   # startup timing, see the end of this script
+
 import streamlit as st
-import google.generativeai as genai
-import pandas as pd
 from datetime import datetime
 
+from batch_generation import generate_batch
+from coach_chat import ChatSession
+from context_cache import PreparedRequest, get_context_cache
+from gemini_client import (
+    DEFAULT_MODEL, configure_api_key, custom_generation_config, get_model, is_error_response,
+    plan_generation_config, structured_generation_config,
+)
+from markdown_tables import (
+    MarkdownTableParser, extract_tables, parquet_available, split_response, tables_to_zip,
+)
+from page_assets import page_head
+from plan_exports import (
+    EXPORT_POLL_SECONDS, EXPORT_WAIT_SECONDS, FORMATS, available_formats, export_file_name,
+    get_export_pipeline,
+)
+from plan_history import PlanHistory
+from plan_library import get_plan_library, is_personalized
+from prompts import (
+    build_library_seed, build_profile, build_prompt, build_structured_prompt, calorie_goal_options,
+    diet_type_options,
+    feature_options, fitness_level_options, gender_options, position_options,
+    training_duration_options, training_frequency_options, training_intensity_options,
+)
+from question_cache import DEFAULT_THRESHOLD, get_question_cache
+from request_coalescer import get_request_coalescer
+from reference_tables import dashboard_layout, table_html
+from response_cache import get_response_cache, make_cache_key
+from structured_output import (
+    parse_structured, read_structured, response_schema, structured_blocks, structured_to_markdown,
+)
+from telemetry import STARTUP_TIMING, get_metrics, record_script_run, start_exporter
+from token_budget import CUSTOM_FEATURE, get_token_budgeter
+from training_log import (CLUB_OVERVIEW_ENABLED, acwr_zone, athlete_id, get_training_log, progress_source,
+                          read_sessions_csv)
+
+_imports_done = time.perf_counter()
+
 # ─────────────────────────────────────────────
 # PAGE CONFIG
 # ─────────────────────────────────────────────
@@ -19,297 +57,522 @@ st.set_page_config(
 )
 
 # ─────────────────────────────────────────────
-# CSS  — same as previous app
+# CSS  — same as previous app (see page_assets.py)
 # ─────────────────────────────────────────────
-st.markdown("""
-<style>
-.main-header {
-    font-size: 2.5rem;
-    color: #1E88E5;
-    text-align: center;
-    font-weight: bold;
-    margin-bottom: 0.5rem;
-}
-.sub-header {
-    font-size: 1.2rem;
-    color: #666;
-    text-align: center;
-    margin-bottom: 2rem;
-}
-.feature-box {
-    background-color: #f0f2f6;
-    padding: 1.5rem;
-    border-radius: 10px;
-    margin: 1rem 0;
-    border-left: 5px solid #1E88E5;
-}
-.output-box {
-    background-color: #e8f4f8;
-    padding: 1.5rem;
-    border-radius: 10px;
-    margin: 1rem 0;
-    border: 2px solid #1E88E5;
-}
-.stButton>button {
-    width: 100%;
-    background-color: #1E88E5;
-    color: white;
-    font-weight: bold;
-    border-radius: 5px;
-    padding: 0.5rem 1rem;
-}
-/* Hide sidebar for Tab 2 */
-[data-testid="stSidebar"][aria-label="sidebar"] {
-    display: block;
-}
-</style>
-<script>
-// Hide sidebar when Custom Coach tab is active
-const tabs = window.parent.document.querySelectorAll('[role="tab"]');
-const sidebar = window.parent.document.querySelector('[data-testid="stSidebar"]');
-
-if (tabs && sidebar) {
-    tabs.forEach((tab, index) => {
-        tab.addEventListener('click', () => {
-            if (index === 1) {  // Tab 2 (Custom Coach)
-                sidebar.style.display = 'none';
-            } else {  // Tab 1 (Smart Assistant)
-                sidebar.style.display = 'block';
-            }
-        });
-    });
-    
-    // Check initial state
-    const activeTab = window.parent.document.querySelector('[role="tab"][aria-selected="true"]');
-    if (activeTab) {
-        const activeIndex = Array.from(tabs).indexOf(activeTab);
-        sidebar.style.display = activeIndex === 1 ? 'none' : 'block';
-    }
-}
-</script>
-""", unsafe_allow_html=True)
+st.markdown(page_head(), unsafe_allow_html=True)
 
 # ─────────────────────────────────────────────
 # SESSION STATE
 # ─────────────────────────────────────────────
 if "api_key_configured" not in st.session_state:
     st.session_state.api_key_configured = False
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+if "plan_history" not in st.session_state:
+    st.session_state.plan_history = PlanHistory()
+if "open_plan_id" not in st.session_state:
+    st.session_state.open_plan_id = None
+if "plan_results" not in st.session_state:
+    st.session_state.plan_results = {}      # feature -> last plan_result() for that feature
+if "batch_result" not in st.session_state:
+    st.session_state.batch_result = None
+if "coach_chat" not in st.session_state:
+    st.session_state.coach_chat = ChatSession(st.session_state.plan_history.session_id)
+
+# Metrics file / endpoint, once per process (see telemetry.py)
+start_exporter()
+metrics = get_metrics()
 
 # ─────────────────────────────────────────────
 # AI HELPER
 # ─────────────────────────────────────────────
-def get_ai_response(model, prompt):
-    """Call the model and clean up stray HTML. Handle incomplete responses."""
+def notify_queued(wait_seconds):
+    st.toast(f"⏳ High demand — your request is queued (about {wait_seconds:.0f}s).")
+
+def join_ai_request(model, prompt, stream, on_usage=None, feature=None, key=None):
+    """Flight for this request. With a key, an identical request already in flight
+    (from any session) is joined instead; only the caller that starts it gets on_usage.
+    """
+    return get_request_coalescer().join(key, model, prompt, stream=stream, on_usage=on_usage,
+                                        feature=feature)
+
+def get_ai_response(flight):
+    """Wait for a flight's cleaned text. Handle incomplete responses; returns (text, truncated)."""
+    text, truncated = flight.result(on_queued=notify_queued)
+    if truncated:
+        st.warning("⚠️ Response was truncated due to length. The AI generated a partial answer.")
+    return text, truncated
+
+def stream_ai_response(flight):
+    """Yield a flight's cleaned chunks as the model generates them (for st.write_stream).
+
+    Every caller following the same flight sees its chunks as they arrive.
+    """
+    yield from flight.follow(on_queued=notify_queued)
+    if flight.truncated:
+        st.warning("⚠️ Response was truncated due to length. The AI generated a partial answer.")
+
+def render_block(slot, kind, block):
+    if kind == "table":
+        slot.dataframe(block, use_container_width=True, hide_index=True)
+    else:
+        slot.markdown(block)
+
+def render_response_blocks(text, native_tables=True):
+    """Prose as markdown; pipe tables as native DataFrames when native_tables is on."""
+    if not native_tables:
+        st.markdown(text)
+        return
+    for kind, block in split_response(text):
+        render_block(st, kind, block)
+
+def render_structured_blocks(data, feature, native_tables=True):
+    """A JSON-mode plan: the tables come straight from the parsed rows, no markdown parsing."""
+    if not native_tables:
+        st.markdown(structured_to_markdown(data, feature))
+        return
+    for kind, block in structured_blocks(data, feature):
+        render_block(st, kind, block)
+
+def render_plan_blocks(text, structured, feature, native_tables=True):
+    if structured is not None:
+        render_structured_blocks(structured, feature, native_tables)
+    else:
+        render_response_blocks(text, native_tables)
+
+def write_structured_stream(chunks):
+    """Like st.write_stream, but tables render natively while they are still streaming.
+
+    Finished blocks are drawn once; only the block being written is redrawn per chunk.
+    """
+    parser = MarkdownTableParser()
+    slots, final = [], 0
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        parser.feed(chunk)
+        blocks = parser.blocks()
+        while len(slots) < len(blocks):
+            slots.append(st.empty())
+        for i in range(final, len(blocks)):
+            render_block(slots[i], *blocks[i])
+        final = parser.completed
+    parser.close()
+    blocks = parser.blocks()
+    while len(slots) < len(blocks):
+        slots.append(st.empty())
+    for i in range(final, len(blocks)):
+        render_block(slots[i], *blocks[i])
+    return "".join(parts)
+
+def render_ai_response(model, prompt, cache_key, stream=True, use_cache=True, refresh=False,
+                       spinner_text="🤖 CoachBot is thinking...", on_usage=None, native_tables=True,
+                       feature=None):
+    """Render a response (streamed or blocking), serving repeats from the response cache.
+
+    Returns (text, served_from_cache, truncated).
+    """
+    cache = get_response_cache()
+    if use_cache and not refresh:
+        cached = cache.get(cache_key)
+        metrics.record_cache(feature, "response", cached is not None)
+        if cached is not None:
+            st.caption("⚡ Served from cache")
+            render_response_blocks(cached, native_tables)
+            return cached, True, False
+
+    flight = join_ai_request(model, prompt, stream, on_usage, feature, cache_key)
+    with metrics.timer("coachbot_render_seconds", feature=feature or "unknown", phase="response"):
+        if stream and native_tables:
+            result = write_structured_stream(stream_ai_response(flight))
+        elif stream:
+            result = st.write_stream(stream_ai_response(flight))
+        else:
+            with st.spinner(spinner_text):
+                result, _ = get_ai_response(flight)
+            render_response_blocks(result, native_tables)
+
+    # A truncated answer is never cached: a hit would serve the partial plan without its warning
+    if use_cache and not flight.truncated and not is_error_response(result):
+        cache.set(cache_key, result)
+    return result, False, flight.truncated
+
+def render_json_response(model, prompt, cache_key, feature, use_cache=True, refresh=False,
+                         spinner_text="🤖 CoachBot is thinking...", on_usage=None, native_tables=True):
+    """render_ai_response for the structured (JSON) mode; the plan is drawn once it is complete.
+
+    The response cache keeps the raw JSON. Returns (markdown text, data, served_from_cache,
+    truncated); data is None if the response was an error or unreadable.
+    """
+    cache = get_response_cache()
+    if use_cache and not refresh:
+        cached = cache.get(cache_key)
+        metrics.record_cache(feature, "response", cached is not None)
+        if cached is not None:
+            text, data = read_structured(cached, feature)
+            st.caption("⚡ Served from cache")
+            render_plan_blocks(text, data, feature, native_tables)
+            return text, data, True, False
+
+    with metrics.timer("coachbot_render_seconds", feature=feature, phase="response"):
+        with st.spinner(spinner_text):
+            raw, truncated = get_ai_response(
+                join_ai_request(model, prompt, False, on_usage, feature, cache_key))
+        text, data = read_structured(raw, feature)
+        render_plan_blocks(text, data, feature, native_tables)
+
+    if use_cache and data is not None and not truncated:
+        cache.set(cache_key, raw)
+    return text, data, False, truncated
+
+def table_download_buttons(text, key):
+    """CSV (and Parquet, if pyarrow is installed) zips of every table in a response."""
+    tables = extract_tables(text)
+    if not tables:
+        return
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    st.download_button(
+        f"📊 Download {len(tables)} Table(s) as CSV",
+        data=tables_to_zip(tables, "csv"),
+        file_name=f"coachbot_tables_{stamp}.zip",
+        mime="application/zip",
+        key=f"{key}_csv",
+        on_click="ignore",
+    )
+    if parquet_available():
+        st.download_button(
+            "📊 Download Tables as Parquet",
+            data=tables_to_zip(tables, "parquet"),
+            file_name=f"coachbot_tables_{stamp}_parquet.zip",
+            mime="application/zip",
+            key=f"{key}_parquet",
+            on_click="ignore",
+        )
+
+def feature_generation_config(feature, temperature, max_output_tokens, structured=False):
+    if structured:
+        return structured_generation_config(temperature, response_schema(feature), max_output_tokens)
+    return plan_generation_config(temperature, max_output_tokens)
+
+def prepare_request(profile, feature, generation_config, use_context_cache=False, seed_from_library=False,
+                    structured=False):
+    """Model + prompt for one feature; with context caching the athlete prefix is cached once.
+
+    With seed_from_library, the nearest plan-library entry is appended for Gemini to adapt.
+    Structured (JSON) requests always send their full prompt: the cached prefix asks for markdown.
+    """
+    if structured:
+        prompt = build_structured_prompt(profile, feature)
+        request = PreparedRequest(get_model(DEFAULT_MODEL, generation_config), prompt, prompt, None)
+    elif use_context_cache:
+        request = get_context_cache().prepare(profile, feature, generation_config,
+                                              owner=st.session_state.plan_history.session_id)
+    else:
+        prompt = build_prompt(profile, feature)
+        request = PreparedRequest(get_model(DEFAULT_MODEL, generation_config), prompt, prompt, None)
+    seed = get_plan_library().get(profile, feature) if seed_from_library else None
+    if seed is None:
+        return request
+    suffix = build_library_seed(seed["text"])
+    return request._replace(prompt=request.prompt + suffix, full_prompt=request.full_prompt + suffix,
+                            seeded=True)
+
+def token_caption(prompt_tokens, budget):
+    """One-line token summary; prompt_tokens is the pre-flight count Future."""
     try:
-        response = model.generate_content(prompt)
-        
-        # Check if response was generated
-        if not response or not response.candidates:
-            return "⚠️ No response generated. Please try again."
-        
-        # Get the first candidate
-        candidate = response.candidates[0]
-        
-        # Check finish reason
-        if hasattr(candidate, 'finish_reason'):
-            finish_reason = str(candidate.finish_reason)
-            if 'MAX_TOKENS' in finish_reason or 'LENGTH' in finish_reason:
-                st.warning("⚠️ Response was truncated due to length. The AI generated a partial answer.")
-        
-        # Extract text
-        if not response.text:
-            return "⚠️ Response was blocked or empty. Please try again."
-        
-        # Clean HTML
-        return (response.text
-                .replace("<br>", "\n")
-                .replace("</br>", "")
-                .replace("<div>", "")
-                .replace("</div>", ""))
-    except Exception as e:
-        err = str(e)
-        if "quota" in err.lower():
-            return "⚠️ API quota exceeded. Please wait and try again."
-        if "api key" in err.lower():
-            return "⚠️ Invalid API key. Please check your configuration."
-        return f"⚠️ Error: {err}"
+        count = prompt_tokens.result(timeout=2)
+    except Exception:
+        count = None
+    prompt_part = f"{count:,} prompt tokens" if count is not None else "prompt tokens unavailable"
+    return f"🔢 {prompt_part} · output budget {budget:,} tokens"
 
 # ─────────────────────────────────────────────
-# REFERENCE TABLE BUILDERS
+# REFERENCE TABLES
 # ─────────────────────────────────────────────
-def create_weekly_training_table(intensity="Moderate"):
-    scores = {
-        "Low":       [4, 3, 5, 2, 4, 3, 1],
-        "Moderate":  [6, 5, 7, 3, 6, 4, 2],
-        "High":      [8, 6, 9, 4, 7, 5, 2],
-        "Very High": [9, 7, 10, 5, 8, 6, 2],
-    }.get(intensity, [6, 5, 7, 3, 6, 4, 2])
-    return pd.DataFrame({
-        "Day":               ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"],
-        "Focus":             ["Strength Training","Cardio/Endurance","Sport-Specific Skills",
-                              "Recovery/Mobility","Strength + Conditioning","Light Cardio","Rest/Active Recovery"],
-        "Duration":          ["60 min","45 min","75 min","30 min","60 min","30 min","20 min"],
-        "Intensity (1-10)":  scores,
-    })
-
-def create_training_distribution_table():
-    return pd.DataFrame({
-        "Training Type":   ["Strength Training","Cardio/Endurance","Skill Work",
-                            "Flexibility/Mobility","Rest/Recovery"],
-        "Percentage (%)":  [30, 25, 25, 10, 10],
-        "Hours per Week":  [3.0, 2.5, 2.5, 1.0, 1.0],
-    })
-
-def create_nutrition_table(calorie_goal="Maintenance"):
-    g, c = {
-        "Maintenance":            ("150g","280g","70g","2350 kcal"),
-        "Deficit (Weight Loss)":  ("140g","240g","60g","2000 kcal"),
-        "Surplus (Muscle Gain)":  ("180g","340g","85g","2800 kcal"),
-    }.get(calorie_goal, ("150g","280g","70g","2350 kcal")), None
-    vals = g
-    return pd.DataFrame({
-        "Nutrient":       ["Protein","Carbohydrates","Fats","Total Calories"],
-        "Percentage":     ["30%","45%","25%","100%"],
-        "Grams per Day":  [vals[0], vals[1], vals[2], "—"],
-        "Calories":       ["varies","varies","varies", vals[3]],
-    })
-
-def create_weekly_meal_plan_table():
-    return pd.DataFrame({
-        "Day":       ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"],
-        "Breakfast": ["Oatmeal + Eggs","Greek Yogurt + Fruits","Whole Grain Toast + Avocado",
-                      "Protein Smoothie","Scrambled Eggs + Veggies","Pancakes + Berries","Omelet + Toast"],
-        "Lunch":     ["Chicken + Rice + Veggies","Fish + Quinoa Salad","Turkey Wrap + Soup",
-                      "Pasta + Lean Meat","Grilled Chicken Salad","Rice Bowl + Protein","Sandwich + Fruit"],
-        "Dinner":    ["Salmon + Sweet Potato","Lean Beef + Brown Rice","Chicken Stir-fry",
-                      "Fish + Vegetables","Turkey + Quinoa","Grilled Chicken + Pasta","Lean Meat + Rice"],
-        "Snacks":    ["Protein Bar + Nuts","Fruit + Cheese","Hummus + Veggies",
-                      "Greek Yogurt","Trail Mix","Protein Shake","Fruit + Nut Butter"],
-    })
-
-def create_exercise_table():
-    return pd.DataFrame({
-        "Exercise":   ["Squats","Bench Press","Deadlifts","Pull-ups",
-                       "Shoulder Press","Lunges","Rows","Core Work"],
-        "Sets":       [4, 4, 3, 3, 3, 3, 4, 3],
-        "Reps":       ["8-10","8-10","6-8","8-12","10-12","10 each leg","10-12","15-20"],
-        "Rest (sec)": [90, 90, 120, 90, 60, 60, 75, 45],
-        "Notes":      ["Focus on form","Control the weight","Keep back straight",
-                       "Use assistance if needed","Full range of motion","Maintain balance",
-                       "Squeeze at top","Engage core throughout"],
-    })
-
-def create_progress_tracking_table(weeks=8):
-    w  = list(range(1, weeks + 1))
-    s  = [20,30,42,55,65,75,82,90,93,95,97,99][:weeks]
-    e  = [25,35,45,58,68,76,84,92,94,96,98,99][:weeks]
-    k  = [30,38,48,58,68,76,83,89,91,93,95,97][:weeks]
-    bw = [70,70.5,71,71.2,71.5,71.8,72,72.2,72.3,72.4,72.5,72.6][:weeks]
-    notes = ["Baseline","Good progress","Increasing intensity","Maintaining form",
-             "Peak week","Recovery focus","Final push","Assessment week",
-             "Advanced","Near peak","Optimising","Elite"][:weeks]
-    return pd.DataFrame({
-        "Week": w, "Strength (%)": s, "Endurance (%)": e,
-        "Skill Level (%)": k, "Body Weight (kg)": bw, "Notes": notes,
-    })
-
-def create_injury_recovery_table():
-    return pd.DataFrame({
-        "Phase":      ["Week 1-2","Week 3-4","Week 5-6","Week 7-8","Week 9+"],
-        "Focus":      ["Pain Management","Gentle Movement","Strength Building",
-                       "Sport-Specific Work","Full Training"],
-        "Intensity":  ["Very Low (2-3/10)","Low (3-4/10)","Moderate (5-6/10)",
-                       "High (7-8/10)","Full (9-10/10)"],
-        "Activities": ["Ice, Rest, Gentle Stretching","Pool Work, Light Mobility",
-                       "Resistance Bands, Bodyweight","Light Sport Drills","Full Practice"],
-        "Red Flags":  ["Sharp pain, Swelling","Persistent pain","Limited ROM",
-                       "Pain during sport moves","Recurring issues"],
-    })
-
-def display_tabular_dashboard(feature_type, training_intensity, calorie_goal):
-    """Show reference tables below the AI output — same logic as before."""
+def render_table(builder, *args, interactive=False):
+    """Interactive grid, or the lighter pre-rendered static HTML for read-only tables."""
+    if interactive:
+        st.dataframe(builder(*args), use_container_width=True, hide_index=True)
+    else:
+        st.markdown(table_html(builder, *args), unsafe_allow_html=True)
+
+def display_tabular_dashboard(feature_type, training_intensity, calorie_goal, interactive=False,
+                              progress=None):
+    """Show reference tables below the AI output; progress is the athlete's logged progress table."""
     st.markdown("---")
     st.markdown("## 📊 Training Schedule & Breakdown (Tables)")
     st.markdown("*Organised reference data to support your plan*")
 
-    st.markdown("### 📅 Weekly Training Schedule")
-    st.dataframe(create_weekly_training_table(training_intensity),
-                 use_container_width=True, hide_index=True)
+    for row in dashboard_layout(feature_type, training_intensity, calorie_goal, progress):
+        slots = st.columns(len(row)) if len(row) > 1 else [st.container()]
+        for slot, (icon, title, builder, args) in zip(slots, row):
+            with slot:
+                st.markdown(f"### {icon} {title}")
+                render_table(builder, *args, interactive=interactive)
 
-    if any(k in feature_type for k in ["Workout","Training Plan","Strength","Decision",
-                                        "Drill","Warm","Tactical","Mental","Visualization"]):
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("### 💪 Exercise Routine")
-            st.dataframe(create_exercise_table(), use_container_width=True, hide_index=True)
-        with c2:
-            st.markdown("### 📈 Training Distribution")
-            st.dataframe(create_training_distribution_table(), use_container_width=True, hide_index=True)
-        st.markdown("### 📊 8-Week Progress Tracking")
-        st.dataframe(create_progress_tracking_table(8), use_container_width=True, hide_index=True)
+# ─────────────────────────────────────────────
+# RESULT VIEWS
+# ─────────────────────────────────────────────
+# Generated results live in session_state and are drawn by these fragments, so
+# changing a display option or downloading reruns only the fragment and never
+# calls the model again.
+def plan_result(feature, text, training_intensity, calorie_goal, truncated=False, notes=(),
+                structured=None):
+    return {
+        "feature":            feature,
+        "text":               text,
+        "structured":         structured,     # parsed JSON-mode plan, or None for markdown
+        "training_intensity": training_intensity,
+        "calorie_goal":       calorie_goal,
+        "truncated":          truncated,
+        "notes":              list(notes),
+        "generated_at":       datetime.now().strftime("%Y%m%d_%H%M%S"),
+    }
 
-    elif "Nutrition" in feature_type:
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("### 🍽️ Macro Breakdown")
-            st.dataframe(create_nutrition_table(calorie_goal), use_container_width=True, hide_index=True)
-        with c2:
-            st.markdown("### 📋 Meal Calorie Distribution")
-            st.dataframe(pd.DataFrame({
-                "Meal":       ["Breakfast","Lunch","Dinner","Snacks"],
-                "Calorie %":  [25, 30, 30, 15],
-            }), use_container_width=True, hide_index=True)
-        st.markdown("### 🗓️ Weekly Meal Plan")
-        st.dataframe(create_weekly_meal_plan_table(), use_container_width=True, hide_index=True)
-
-    elif any(k in feature_type for k in ["Recovery","Mobility","Hydration"]):
-        st.markdown("### 🏥 Recovery Timeline")
-        st.dataframe(create_injury_recovery_table(), use_container_width=True, hide_index=True)
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("### 🧘 Recovery Activities")
-            st.dataframe(pd.DataFrame({
-                "Activity":  ["Stretching","Foam Rolling","Low Impact Cardio","Rest"],
-                "Time %":    [30, 20, 25, 25],
-            }), use_container_width=True, hide_index=True)
-        with c2:
-            st.markdown("### 📊 Progress Tracking")
-            pt = create_progress_tracking_table(8)
-            st.dataframe(pt[["Week","Strength (%)","Endurance (%)"]],
-                         use_container_width=True, hide_index=True)
+def export_buttons(result):
+    """Download buttons for the plan's exports; each one is built once on the export pool."""
+    exports = get_export_pipeline()
+    formats = available_formats()
+    cols = st.columns(len(formats))
+    for col, fmt in zip(cols, formats):
+        label, _, mime = FORMATS[fmt]
+        state, payload = exports.lookup(result, fmt)
+        with col:
+            if state == "ready":
+                st.download_button(f"📄 {label}", data=payload, file_name=export_file_name(result, fmt),
+                                   mime=mime, key=f"export_{fmt}", on_click="ignore",
+                                   use_container_width=True)
+            elif state == "building":
+                st.button(f"⏳ Preparing {label}...", disabled=True, key=f"export_{fmt}_wait",
+                          use_container_width=True)
+            else:
+                st.caption(f"⚠️ {label} export failed: {payload}")
+
+@st.fragment(run_every=EXPORT_POLL_SECONDS)
+def poll_export_buttons(result):
+    """Redraws only the download row while exports build; one full rerun once they are done."""
+    if not get_export_pipeline().building(result):
+        st.rerun()
+    export_buttons(result)
+
+def show_exports(result):
+    exports = get_export_pipeline()
+    for fmt in available_formats():
+        exports.lookup(result, fmt)        # start any build this plan still needs
+    exports.wait(result, timeout=EXPORT_WAIT_SECONDS)
+    if exports.building(result):
+        poll_export_buttons(result)
     else:
-        c1, c2 = st.columns(2)
-        with c1:
-            st.markdown("### 📋 Training Distribution")
-            st.dataframe(pd.DataFrame({
-                "Category":      ["Physical Training","Skill Development","Mental Training","Recovery"],
-                "Percentage %":  [40, 30, 15, 15],
-            }), use_container_width=True, hide_index=True)
-        with c2:
-            st.markdown("### 📊 Progress Tracking")
-            pt = create_progress_tracking_table(8)
-            st.dataframe(pt[["Week","Strength (%)","Skill Level (%)"]],
-                         use_container_width=True, hide_index=True)
+        export_buttons(result)
+
+@st.fragment
+def show_plan_results(feature, athlete=None):
+    """Display options + the stored plan, batch pack and history for the Smart Assistant."""
+    result = st.session_state.plan_results.get(feature)
+    batch = st.session_state.batch_result
+    if result is None and batch is None and not st.session_state.plan_history:
+        return
+
+    st.markdown("---")
+    st.markdown("**📊 Display Settings**")
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        show_tables = st.checkbox("Show Training Tables & Data", value=True, key="show_tables",
+                                  help="Display reference tables below your plan")
+    with c2:
+        interactive_tables = st.checkbox("Interactive Tables", value=False, key="interactive_tables",
+                                         help="Sortable grids instead of lightweight static tables")
+    with c3:
+        native_tables = st.checkbox("Render Plan Tables Natively", value=True, key="native_tables",
+                                    help="Turn the plan's markdown tables into sortable, exportable tables")
+
+    if result is not None:
+        st.markdown("---")
+        st.markdown("## 📋 Your Personalized Plan")
+        for note in result["notes"]:
+            st.caption(note)
+        st.markdown('<div class="output-box">', unsafe_allow_html=True)
+        render_plan_blocks(result["text"], result.get("structured"), result["feature"], native_tables)
+        st.markdown("</div>", unsafe_allow_html=True)
+        if result["truncated"]:
+            st.warning("⚠️ Response was truncated due to length. The AI generated a partial answer.")
+
+        # ── Reference tables ──────────────
+        # The athlete's logged weeks replace the example progress table, here and in the exports
+        progress = progress_source(athlete)
+        if show_tables:
+            with metrics.timer("coachbot_render_seconds", feature=result["feature"], phase="dashboard"):
+                display_tabular_dashboard(result["feature"], result["training_intensity"],
+                                          result["calorie_goal"], interactive_tables, progress)
+
+        # ── Download ──────────────────────
+        st.download_button(
+            "📥 Download Plan as Text File",
+            data=result["text"],
+            file_name=f"coachbot_plan_{result['generated_at']}.txt",
+            mime="text/plain",
+            on_click="ignore",
+        )
+        if not is_error_response(result["text"]):
+            show_exports(dict(result, progress=progress))
+        st.success("✅ Plan generated! Review carefully and consult a coach if needed.")
+
+    if batch is not None:
+        st.markdown("---")
+        st.markdown("## 📦 Athlete Plan Pack")
+        bundle = []
+        for name in batch["features"]:
+            res = batch["results"][name]
+            source = "cache" if res["cached"] else f"{res['seconds']:.1f}s"
+            status = "⚠️" if is_error_response(res["text"]) else "✅"
+            if res["truncated"]:
+                st.warning(f"⚠️ {name} was truncated due to length.")
+            with st.expander(f"{status} {name} ({source})"):
+                render_plan_blocks(res["text"], res.get("structured"), name, native_tables)
+            bundle.append(f"# {name}\n\n{res['text']}")
+        st.download_button(
+            "📥 Download Plan Pack",
+            data="\n\n---\n\n".join(bundle),
+            file_name=f"coachbot_pack_{batch['generated_at']}.md",
+            mime="text/markdown",
+            key="batch_download_btn",
+            on_click="ignore",
+        )
+
+    # ── Chat history ──────────────────────
+    if st.session_state.plan_history:
+        st.markdown("---")
+        with st.expander("📜 View Previous Plans"):
+            for entry in st.session_state.plan_history.recent(5):
+                st.markdown(f"**{entry['timestamp']}** — {entry['feature']}")
+                st.text(entry["preview"] + "...")
+                is_open = st.session_state.open_plan_id == entry["plan_id"]
+                if st.button("🙈 Hide full plan" if is_open else "📖 Open full plan",
+                             key=f"open_{entry['plan_id']}"):
+                    st.session_state.open_plan_id = None if is_open else entry["plan_id"]
+                    st.rerun(scope="fragment")
+                if is_open:
+                    full_plan = st.session_state.plan_history.load(entry["plan_id"])
+                    if full_plan is None:
+                        st.caption("This plan has expired from history.")
+                    else:
+                        render_response_blocks(full_plan, native_tables)
+                st.markdown("---")
+
+@st.fragment
+def show_custom_chat():
+    """The Custom Coach conversation, newest turn last, with downloads and per-turn usage."""
+    chat = st.session_state.coach_chat
+    if not chat.transcript:
+        return
+    st.markdown("---")
+    st.markdown("### 💬 Conversation")
+    if chat.summary:
+        with st.expander("🗂️ Summary of earlier turns"):
+            st.write(chat.summary)
+    for turn in chat.transcript:
+        with st.chat_message("user"):
+            st.markdown(turn["question"])
+        with st.chat_message("assistant"):
+            for note in turn["notes"]:
+                st.caption(note)
+            render_response_blocks(turn["text"])
+            if turn["truncated"]:
+                st.warning("⚠️ Response was truncated due to length. The AI generated a partial answer.")
+
+    latest = chat.transcript[-1]
+    st.download_button(
+        "📥 Download Response",
+        data=latest["text"],
+        file_name=f"coachbot_custom_{latest['generated_at']}.txt",
+        mime="text/plain",
+        key="custom_download_btn",
+        on_click="ignore",
+    )
+    table_download_buttons(latest["text"], key="custom_tables")
+    st.download_button(
+        "📥 Download Conversation",
+        data="\n\n---\n\n".join(f"**Q:** {turn['question']}\n\n{turn['text']}" for turn in chat.transcript),
+        file_name=f"coachbot_chat_{latest['generated_at']}.md",
+        mime="text/markdown",
+        key="chat_download_btn",
+        on_click="ignore",
+    )
+    if chat.usage:
+        with st.expander("📈 Token Usage This Session"):
+            st.dataframe(list(chat.usage), use_container_width=True, hide_index=True)
+    if st.button("🗑️ New Conversation", key="new_chat_btn"):
+        chat.reset()
+        st.rerun(scope="fragment")
 
 # ─────────────────────────────────────────────
-# SPORT / POSITION DATA
+# TRAINING LOG
 # ─────────────────────────────────────────────
-position_options = {
-    "Football/Soccer":         ["Goalkeeper","Defender","Midfielder","Forward/Striker","Winger"],
-    "Cricket":                 ["Batsman","Bowler (Fast)","Bowler (Spin)","All-rounder","Wicket-keeper"],
-    "Basketball":              ["Point Guard","Shooting Guard","Small Forward","Power Forward","Center"],
-    "Athletics/Track & Field": ["Sprinter","Middle Distance","Long Distance","Jumper","Thrower"],
-    "Tennis":                  ["Singles Player","Doubles Player","Baseline Player","Serve-and-Volley"],
-    "Swimming":                ["Freestyle","Backstroke","Breaststroke","Butterfly","Individual Medley"],
-    "Volleyball":              ["Setter","Outside Hitter","Middle Blocker","Libero","Opposite Hitter"],
-    "Badminton":               ["Singles Player","Doubles Player","Mixed Doubles"],
-    "Hockey":                  ["Forward","Midfielder","Defender","Goalkeeper"],
-    "Kabaddi":                 ["Raider","Defender","All-Rounder"],
-    "Rugby":                   ["Forward","Back"],
-    "Other":                   ["General Athlete"],
-}
+@st.fragment
+def show_training_log(athlete):
+    """Log sessions and see workload trends; logging reruns only this tab."""
+    log = get_training_log()
+    if not log.available:
+        st.info("📈 The training log needs `pyarrow` (pip install pyarrow).")
+        return
+    if athlete is None:
+        st.info("👈 Enter your name in the sidebar to keep a training log.")
+        return
+
+    st.caption("🔓 The log is kept under your sidebar name, which is not a login: "
+               "anyone who enters the same name sees and adds to the same log.")
+    with st.form("log_session_form", border=False, clear_on_submit=True):
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            session_date = st.date_input("Session Date", value=datetime.now().date(),
+                                         max_value=datetime.now().date())
+            duration = st.number_input("Duration (minutes)", min_value=1, max_value=600, value=60)
+        with c2:
+            rpe = st.slider("Session RPE", 0, 10, 6, help="How hard was the session overall? 0 = rest, 10 = maximal")
+            intensity = st.selectbox("Intensity", training_intensity_options, key="log_intensity")
+        with c3:
+            body_weight = st.number_input("Body Weight (kg, optional)", min_value=20.0, max_value=250.0,
+                                          value=None, step=0.1)
+        log_clicked = st.form_submit_button("➕ Log Session", type="primary")
+    if log_clicked:
+        log.append(athlete, [{"date": session_date, "duration_min": duration, "rpe": rpe,
+                              "intensity": intensity, "body_weight_kg": body_weight}])
+        st.success(f"✅ Logged {duration} min at RPE {rpe} on {session_date:%d %b %Y}.")
+
+    with st.expander("📥 Import Sessions (CSV)"):
+        st.caption("Columns: date, duration_min, rpe (0-10), and optionally intensity and body_weight_kg")
+        upload = st.file_uploader("Sessions CSV", type="csv", key="log_import_file")
+        if upload is not None and st.button("Import Sessions", key="log_import_btn"):
+            try:
+                added = log.append(athlete, read_sessions_csv(upload))
+                st.success(f"✅ Imported {added} sessions.")
+            except ValueError as e:
+                st.error(f"❌ {e}")
+
+    figures = log.current(athlete)
+    if figures is None:
+        st.caption("No sessions logged yet.")
+        return
+    st.markdown("---")
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Load, Last 7 Days", f"{figures['acute_load']:,.0f} AU",
+              help="Sum of duration × RPE over the last 7 days")
+    m2.metric("Weekly Average, 28 Days", f"{figures['chronic_load']:,.0f} AU")
+    m3.metric("Acute:Chronic Ratio", "—" if figures["acwr"] != figures["acwr"] else f"{figures['acwr']:.2f}",
+              help=f"{acwr_zone(figures['acwr'])} · 0.8-1.3 is the usual sweet spot")
+    m4.metric("Body Weight", "—" if figures["body_weight"] != figures["body_weight"]
+              else f"{figures['body_weight']:.1f} kg")
+
+    builder, args = progress_source(athlete)
+    st.markdown("### 📊 Weekly Progress")
+    st.dataframe(builder(*args), use_container_width=True, hide_index=True)
+    st.markdown("### 📈 Acute vs Chronic Load")
+    daily = log.daily(athlete, datetime.now().date()).tail(90)
+    st.line_chart(daily.set_index("date")[["acute_load", "chronic_load"]]
+                  .rename(columns={"acute_load": "Acute (7 days)", "chronic_load": "Chronic (28-day weekly avg)"}))
+    with st.expander("🗒️ Recent Sessions"):
+        st.dataframe(log.recent_sessions(athlete), use_container_width=True, hide_index=True)
+    if CLUB_OVERVIEW_ENABLED:
+        with st.expander("👥 Club Overview"):
+            st.dataframe(log.club_overview(), use_container_width=True, hide_index=True)
 
 # ─────────────────────────────────────────────
 # PAGE HEADER
@@ -332,13 +595,13 @@ with st.sidebar:
         if "GEMINI_API_KEY" in st.secrets:
             api_key = st.secrets["GEMINI_API_KEY"]
             st.success("✅ API Key loaded from secrets!")
-            genai.configure(api_key=api_key)
+            configure_api_key(api_key)
             st.session_state.api_key_configured = True
         else:
             api_key = st.text_input("Enter Gemini API Key", type="password",
                                     help="Get your key from Google AI Studio")
             if api_key:
-                genai.configure(api_key=api_key)
+                configure_api_key(api_key)
                 st.session_state.api_key_configured = True
                 st.success("✅ API Key Configured!")
     except Exception:
@@ -346,7 +609,7 @@ with st.sidebar:
                                 help="Get your key from Google AI Studio")
         if api_key:
             try:
-                genai.configure(api_key=api_key)
+                configure_api_key(api_key)
                 st.session_state.api_key_configured = True
                 st.success("✅ API Key Configured!")
             except Exception as e:
@@ -357,7 +620,7 @@ with st.sidebar:
     st.header("👤 Your Profile")
     user_name   = st.text_input("Name", placeholder="e.g. Sarah")
     user_age    = st.number_input("Age", min_value=10, max_value=100, value=15)
-    user_gender = st.selectbox("Gender", ["Male","Female","Other","Prefer not to say"])
+    user_gender = st.selectbox("Gender", gender_options)
 
     st.markdown("---")
     st.header("⚽ Sport Details")
@@ -366,24 +629,24 @@ with st.sidebar:
 
     st.markdown("---")
     st.header("🎯 Fitness Details")
-    fitness_level  = st.select_slider("Current Fitness Level",
-                                      options=["Beginner","Intermediate","Advanced","Elite"])
+    fitness_level  = st.select_slider("Current Fitness Level", options=fitness_level_options)
     injury_history = st.text_area("Injury History / Risk Zones",
                                   placeholder="e.g. Previous ankle sprain, knee sensitivity")
 
     st.markdown("---")
     st.header("🍽️ Nutrition Preferences")
-    diet_type    = st.selectbox("Diet Type", ["Vegetarian","Non-Vegetarian","Vegan","Pescatarian"])
+    diet_type    = st.selectbox("Diet Type", diet_type_options)
     allergies    = st.text_input("Allergies / Food Restrictions", placeholder="e.g. Nuts, dairy")
-    calorie_goal = st.select_slider("Daily Calorie Goal",
-                                    options=["Maintenance","Deficit (Weight Loss)","Surplus (Muscle Gain)"])
+    calorie_goal = st.select_slider("Daily Calorie Goal", options=calorie_goal_options)
+
+athlete = athlete_id(user_name)      # training log key
 
 # ─────────────────────────────────────────────
 # MAIN AREA
 # ─────────────────────────────────────────────
 if st.session_state.api_key_configured:
 
-    tab1, tab2 = st.tabs(["📊 Smart Assistant", "🧠 Custom Coach"])
+    tab1, tab2, tab3 = st.tabs(["📊 Smart Assistant", "🧠 Custom Coach", "📈 Training Log"])
 
     # ══════════════════════════════════════════
     # TAB 1 — SMART ASSISTANT
@@ -392,409 +655,310 @@ if st.session_state.api_key_configured:
 
         st.header("🎯 What would you like CoachBot to help you with?")
 
-        feature = st.selectbox("Select a Feature", [
-            "1. Full-Body Workout Plan for [Position] in [Sport]",
-            "2. Safe Recovery Training Schedule for Athlete with [Injury]",
-            "3. Tactical Coaching Tips to Improve [Skill] in [Sport]",
-            "4. Week-Long Nutrition Guide for Young Athlete",
-            "5. Personalized Warm-up & Cooldown Routine",
-            "6. Mental Focus Routines for Tournaments",
-            "7. Hydration & Electrolyte Strategy",
-            "8. Pre-Match Visualization Techniques",
-            "9. Positional Decision-Making Drills",
-            "10. Mobility Workouts for Post-Injury Recovery",
-        ])
-
-        col1, col2 = st.columns(2)
-        with col1:
-            training_intensity = st.select_slider("Training Intensity",
-                                                   options=["Low","Moderate","High","Very High"])
-            training_duration  = st.selectbox("Training Duration per Session",
-                                              ["30 minutes","45 minutes","60 minutes",
-                                               "90 minutes","120 minutes"])
-        with col2:
-            training_frequency = st.selectbox("Training Frequency",
-                                              ["2-3 times/week","4-5 times/week",
-                                               "6 times/week","Daily"])
-            specific_goal      = st.text_input("Specific Goal",
-                                               placeholder="e.g. Improve stamina, tournament prep")
-
-        with st.expander("🔧 Advanced Settings (Optional)"):
-            temperature = st.slider("AI Creativity Level", 0.0, 1.0, 0.5, 0.1,
-                                    help="Lower = conservative  |  Higher = creative")
-            st.markdown("---")
-            st.markdown("**📊 Display Settings**")
-            show_tables = st.checkbox("Show Training Tables & Data", value=True,
-                                      help="Display reference tables below your plan")
-
-        if st.button("🚀 Generate Personalized Plan", type="primary"):
-
-            # Full user context injected into every prompt
-            user_context = f"""
-Athlete Profile:
-- Name: {user_name if user_name else 'Athlete'}
-- Age: {user_age} years old
-- Gender: {user_gender}
-- Sport: {sport}
-- Position: {position}
-- Current Fitness Level: {fitness_level}
-- Injury History / Risk Zones: {injury_history if injury_history else 'None'}
-- Diet Type: {diet_type}
-- Food Allergies / Restrictions: {allergies if allergies else 'None'}
-- Daily Calorie Goal: {calorie_goal}
-- Training Intensity: {training_intensity}
-- Training Duration per Session: {training_duration}
-- Training Frequency: {training_frequency}
-- Specific Goal: {specific_goal if specific_goal else 'General improvement'}
-"""
-
-            # ── 10 PROMPTS — text explanations + embedded tables ──
-            prompts = {
-
-"1. Full-Body Workout Plan for [Position] in [Sport]": f"""
-You are an experienced sports coach. Create a full-body workout plan for this athlete.
-
-{user_context}
-
-IMPORTANT: You MUST include markdown tables in your response. Follow this structure exactly:
-
-1. Write 2-3 paragraphs explaining the approach and why it suits this {position} in {sport}.
-
-2. Then create this MARKDOWN TABLE (copy this format exactly):
-
-| Day | Focus | Key Exercises | Sets x Reps | Duration |
-|-----|-------|---------------|-------------|----------|
-| Monday | Strength | Squats, Push-ups, Rows | 4x10, 3x12, 4x10 | 60 min |
-| Tuesday | Cardio | Running intervals | 6x400m | 45 min |
-(continue for all 7 days)
-
-3. Write 1-2 paragraphs on progressive overload.
-
-4. Then create this MARKDOWN TABLE:
-
-| Exercise | Sets | Reps | Rest | Technique Tip |
-|----------|------|------|------|---------------|
-| Squats | 4 | 10 | 90s | Keep chest up |
-(add 6-8 exercises)
-
-5. End with 1 paragraph on recovery advice for a {user_age}-year-old.
-
-CRITICAL: Use proper markdown table syntax with pipes (|) and dashes. Make the tables complete.
-""",
-
-"2. Safe Recovery Training Schedule for Athlete with [Injury]": f"""
-You are a sports physiotherapist. Create a recovery plan for injury: {injury_history if injury_history else 'general recovery'}.
-
-{user_context}
-
-MANDATORY FORMAT - Include these markdown tables:
-
-1. Write 2-3 paragraphs on recovery approach and safety principles.
-
-2. Create this MARKDOWN TABLE:
-
-| Phase | Weeks | Focus | Key Exercises | Load Level | Duration/Day |
-|-------|-------|-------|---------------|------------|--------------|
-| Phase 1 | 1-2 | Pain management | Gentle stretching | Very low | 15 min |
-| Phase 2 | 3-4 | Mobility | Pool work, bands | Low | 25 min |
-(continue for 4-5 phases)
-
-3. Write 1-2 paragraphs on warning signs.
-
-4. Create this MARKDOWN TABLE:
-
-| Exercise to AVOID | Reason | Safe Alternative |
-|-------------------|--------|------------------|
-| Jumping | Impact stress | Step-ups |
-| Sprinting | Re-injury risk | Walking intervals |
-(add 5-6 items)
-
-5. End with 1 paragraph on return criteria.
-
-CRITICAL: Use pipes (|) and dashes for markdown tables.
-""",
-
-"3. Tactical Coaching Tips to Improve [Skill] in [Sport]": f"""
-You are a tactical coach specialising in {sport}. Give advanced coaching advice for this athlete.
-
-{user_context}
-
-Write your response in this exact format:
-1. Start with 2-3 paragraphs describing the key tactical responsibilities of a {position} in {sport}, what skills they must develop, and how their fitness level and goal affect tactical training.
-2. Then include a Markdown table: Key Tactical Scenarios (Situation | What To Read | Best Response | Common Mistake).
-3. Then 1-2 paragraphs on developing game intelligence and communication with teammates.
-4. Then a Markdown table: Training Drills (Drill Name | Duration | Players Needed | Instructions | KPI to Measure).
-5. End with a short paragraph on professional examples and how to study the game.
-
-Reference their specific position, sport, and goal throughout.
-""",
-
-"4. Week-Long Nutrition Guide for Young Athlete": f"""
-You are a sports nutritionist. Create a nutrition guide for this {user_age}-year-old {sport} athlete.
-
-{user_context}
-
-IMPORTANT: You MUST include markdown tables. Follow this structure:
-
-1. Write 2-3 paragraphs on nutritional approach for {sport}, macro split for {calorie_goal}, and handling {diet_type} diet with allergies: {allergies if allergies else 'none'}.
-
-2. Create this MARKDOWN TABLE:
-
-| Nutrient | Grams/Day | % Total | Calories | Best Sources |
-|----------|-----------|---------|----------|--------------|
-| Protein | 150g | 30% | 600 | Chicken, eggs, beans |
-| Carbs | 280g | 45% | 1120 | Rice, oats, fruits |
-| Fats | 70g | 25% | 630 | Avocado, nuts, oil |
-
-3. Write 1-2 paragraphs on meal timing around training.
-
-4. Create this MARKDOWN TABLE:
-
-| Day | Breakfast | Lunch | Dinner | Snacks | Total kcal |
-|-----|-----------|-------|--------|--------|------------|
-| Monday | Oatmeal + eggs | Chicken rice bowl | Salmon + veggies | Protein shake | 2400 |
-(continue for all 7 days, adapt to {diet_type}, exclude {allergies if allergies else 'nothing'})
-
-5. End with 1 paragraph on hydration and grocery tips.
-
-CRITICAL: Use proper markdown table format with pipes (|) and dashes.
-""",
-
-"5. Personalized Warm-up & Cooldown Routine": f"""
-You are a professional strength and conditioning coach. Create a warm-up and cooldown routine for this athlete.
-
-{user_context}
-
-Write your response in this exact format:
-1. Start with 2 paragraphs explaining why a proper warm-up matters for a {position} in {sport}, and how injury history ({injury_history if injury_history else 'none'}) affects the routine.
-2. Then include a Markdown table: Dynamic Warm-up (Exercise | Duration | Sets | Purpose | Injury Modification).
-3. Then 1 paragraph explaining the sport-specific activation phase and what it prepares the athlete for.
-4. Then a Markdown table: Cooldown & Stretching (Exercise | Hold Duration | Target Muscle | Benefit | Notes).
-5. End with a short paragraph on foam rolling sequence and breathing techniques for recovery.
-
-Make the routine practical for {training_duration} sessions at {training_intensity} intensity.
-""",
-
-"6. Mental Focus Routines for Tournaments": f"""
-You are a sports psychologist. Build a mental preparation programme for this athlete.
-
-{user_context}
-
-Write your response in this exact format:
-1. Start with 2-3 paragraphs explaining the mental challenges for a {user_age}-year-old {position} in tournament {sport}, and the overall psychological approach to competition preparation.
-2. Then include a Markdown table: Pre-Tournament Timeline (Days Before | Mental Activity | Duration | Goal | How To Do It).
-3. Then 1-2 paragraphs on managing performance anxiety, dealing with nerves, and building confidence specifically for {sport}.
-4. Then a Markdown table: Match-Day Mental Routine (Time | Activity | Duration | Purpose | Technique).
-5. End with a paragraph on post-performance reflection and positive self-talk strategies.
-
-Be age-appropriate for {user_age} years old and reference {sport} scenarios throughout.
-""",
-
-"7. Hydration & Electrolyte Strategy": f"""
-You are a sports nutrition and hydration specialist. Build a hydration strategy for this athlete.
-
-{user_context}
-
-Write your response in this exact format:
-1. Start with 2-3 paragraphs explaining why hydration is critical for {sport} at {training_intensity} intensity, how dehydration impacts performance, and the general daily targets for a {user_age}-year-old athlete.
-2. Then include a Markdown table: Daily Hydration Schedule (Time of Day | Amount (ml) | Drink Type | Purpose | Notes).
-3. Then 1-2 paragraphs on electrolyte balance, when to use sports drinks vs water, and hot/cold weather adjustments.
-4. Then a Markdown table: Training Hydration Protocol (Phase | Timing | Amount | Electrolytes Needed | Warning Signs).
-5. End with a short paragraph on recognising dehydration early and practical tips for staying consistent.
-
-Reference their training frequency ({training_frequency}) and duration ({training_duration}) throughout.
-""",
-
-"8. Pre-Match Visualization Techniques": f"""
-You are a sports psychologist specialising in mental performance. Teach visualisation techniques for this athlete.
-
-{user_context}
-
-Write your response in this exact format:
-1. Start with 2-3 paragraphs explaining what visualisation is, why it works for athletes, and how a {position} in {sport} can specifically benefit from it before matches.
-2. Then include a Markdown table: Visualisation Timeline (Time Before Match | Activity | Duration | What to Visualise | Expected Benefit).
-3. Then 1-2 paragraphs on combining breathing techniques with mental imagery and how to handle negative thoughts that arise.
-4. Then a Markdown table: Position-Specific Scenarios to Visualise (Scenario | What to See | What to Feel | Outcome to Imagine).
-5. End with a sample 5-minute visualisation script written specifically for a {position} in {sport}.
-
-Make it practical for a {user_age}-year-old. Reference their specific position throughout.
-""",
-
-"9. Positional Decision-Making Drills": f"""
-You are a professional {sport} coach. Design decision-making drills for this athlete.
-
-{user_context}
-
-Write your response in this exact format:
-1. Start with 2-3 paragraphs explaining the decision-making demands of a {position} in {sport}, the key cognitive skills to develop, and how training at {training_intensity} intensity helps build game intelligence.
-2. Then include a Markdown table: Core Drills (Drill Name | Duration | Players Needed | Instructions | Progression | KPI).
-3. Then 1-2 paragraphs on how to practice decision-making alone (solo drills) and the mental habits to build between sessions.
-4. Then a Markdown table: Game Scenarios (Situation | Options Available | Best Decision | Why | Common Error).
-5. End with a short paragraph on tracking improvement and integrating drills into team training sessions.
-
-All drills must be specific to {position} in {sport}. Reference their fitness level and goal.
-""",
-
-"10. Mobility Workouts for Post-Injury Recovery": f"""
-You are a sports physiotherapist and mobility specialist. Design a post-injury mobility programme for this athlete.
-
-{user_context}
-
-Write your response in this exact format:
-1. Start with 2-3 paragraphs explaining the importance of mobility work for {sport}, how their injury history ({injury_history if injury_history else 'general recovery'}) shapes this programme, and the key principles of safe progression.
-2. Then include a Markdown table: Phase-by-Phase Plan (Phase | Weeks | Focus | Key Exercises | Load | Daily Duration).
-3. Then 1-2 paragraphs on exercises to strictly avoid during recovery, pain management strategies, and when to seek professional support.
-4. Then a Markdown table: Daily Mobility Routine (Exercise | Sets | Duration/Reps | Target Area | Technique Notes | Avoid If).
-5. End with a paragraph on return-to-sport mobility standards and how to progress toward full {sport} training.
-
-Emphasise safety throughout. Make the plan specific to {sport} movement demands.
-""",
-            }
+        # A form, so editing these fields doesn't rerun the app until you submit
+        with st.form("plan_form", border=False):
+            feature = st.selectbox("Select a Feature", feature_options)
+
+            col1, col2 = st.columns(2)
+            with col1:
+                training_intensity = st.select_slider("Training Intensity",
+                                                       options=training_intensity_options)
+                training_duration  = st.selectbox("Training Duration per Session",
+                                                  training_duration_options)
+            with col2:
+                training_frequency = st.selectbox("Training Frequency",
+                                                  training_frequency_options)
+                specific_goal      = st.text_input("Specific Goal",
+                                                   placeholder="e.g. Improve stamina, tournament prep")
+
+            with st.expander("🔧 Advanced Settings (Optional)"):
+                temperature = st.slider("AI Creativity Level", 0.0, 1.0, 0.5, 0.1,
+                                        help="Lower = conservative  |  Higher = creative")
+                stream_output = st.checkbox("Stream Plan as It Is Written", value=True,
+                                            help="Show the plan while Gemini is still generating it")
+                structured_output = st.checkbox("Structured Output (JSON)", value=False,
+                                                help="Gemini returns schema-checked JSON and the tables are "
+                                                     "built straight from it: fewer tokens, no broken tables. "
+                                                     "The plan appears once it is complete")
+                use_cache     = st.checkbox("Reuse Cached Plans", value=True,
+                                            help="Serve an identical earlier request instantly instead of calling Gemini")
+                refresh_cache = st.checkbox("Force Fresh Plan", value=False,
+                                            help="Skip the cache lookup and replace the cached plan")
+                # Only offered where the prefix can be cached: Gemini's minimum is above a typical profile
+                context_cache = get_context_cache().caches_profiles() and st.checkbox(
+                    "Reuse Athlete Context Across Features", value=False,
+                    help="Send your profile to Gemini once and reuse it for every feature you generate")
+                use_library   = st.checkbox("Serve Ready-Made Plans", value=True,
+                                            help="Without injuries, allergies, a specific goal or a training "
+                                                 "log, serve a pre-generated plan for your sport, position "
+                                                 "and level instantly. Plans are built per age band; gender, "
+                                                 "diet, session length and frequency must match a built "
+                                                 "plan (by default the sidebar's initial choices)")
+                seed_library  = st.checkbox("Start Personalized Plans from the Plan Library", value=False,
+                                            help="Have Gemini adapt the ready-made plan to your injuries, "
+                                                 "allergies and goal instead of writing from scratch")
+                stats = get_response_cache().stats
+                st.caption(f"Cache — memory hits: {stats['memory_hits']} · disk hits: {stats['disk_hits']} · "
+                           f"misses: {stats['misses']}")
+
+            generate_clicked = st.form_submit_button("🚀 Generate Personalized Plan", type="primary")
+
+            with st.expander("📦 Batch Mode — Generate Several Plans at Once"):
+                batch_features = st.multiselect("Features to Generate", feature_options,
+                                                default=feature_options)
+                batch_clicked = st.form_submit_button("📦 Generate All Selected Plans")
+
+        if generate_clicked or batch_clicked:
+            profile = build_profile(
+                name=user_name, age=user_age, gender=user_gender, sport=sport, position=position,
+                fitness_level=fitness_level, injury_history=injury_history, diet_type=diet_type,
+                allergies=allergies, calorie_goal=calorie_goal,
+                training_intensity=training_intensity, training_duration=training_duration,
+                training_frequency=training_frequency, specific_goal=specific_goal,
+                training_load=get_training_log().load_summary(athlete),
+            )
 
-            selected_prompt = prompts.get(
-                feature, prompts["1. Full-Body Workout Plan for [Position] in [Sport]"]
+            budgeter = get_token_budgeter()
+            native_tables = st.session_state.get("native_tables", True)
+            library = get_plan_library()
+            serve_library = use_library and not refresh_cache and library.covers(profile)
+            seed_from_library = seed_library and library.available and is_personalized(profile)
+            # Live output while generating; replaced by show_plan_results once stored
+            live = st.empty()
+
+        if generate_clicked:
+            library_plan = library.get(profile, feature) if serve_library else None
+            if serve_library:
+                metrics.record_cache(feature, "library", library_plan is not None)
+
+        if generate_clicked and library_plan:
+            st.session_state.plan_results[feature] = plan_result(
+                feature, library_plan["text"], training_intensity, calorie_goal,
+                notes=["📚 Ready-made plan for your sport, position, level and training settings"],
             )
+            st.session_state.plan_history.add(feature, library_plan["text"])
+        elif generate_clicked:
+            plan_config = feature_generation_config(feature, temperature, budgeter.budget_for(feature),
+                                                    structured_output)
+            with metrics.timer("coachbot_prompt_build_seconds", feature=feature):
+                request = prepare_request(profile, feature, plan_config, context_cache,
+                                          seed_from_library, structured_output)
+            prompt_tokens = budgeter.count_prompt_tokens(request.model, request.prompt)
+
+            def record_plan_usage(usage):
+                budgeter.record(feature, DEFAULT_MODEL, usage)
+
+            with live.container():
+                st.markdown("---")
+                st.markdown("## 📋 Your Personalized Plan")
+                st.markdown('<div class="output-box">', unsafe_allow_html=True)
+                cache_key = make_cache_key(request.full_prompt, DEFAULT_MODEL, plan_config)
+                spinner_text = "🤖 CoachBot is creating your personalised plan..."
+                if structured_output:
+                    result, structured, from_cache, truncated = render_json_response(
+                        request.model, request.prompt, cache_key, feature,
+                        use_cache=use_cache, refresh=refresh_cache, spinner_text=spinner_text,
+                        on_usage=record_plan_usage, native_tables=native_tables,
+                    )
+                else:
+                    structured = None
+                    result, from_cache, truncated = render_ai_response(
+                        request.model, request.prompt, cache_key,
+                        stream=stream_output, use_cache=use_cache, refresh=refresh_cache,
+                        spinner_text=spinner_text,
+                        on_usage=record_plan_usage,
+                        native_tables=native_tables,
+                        feature=feature,
+                    )
+                st.markdown("</div>", unsafe_allow_html=True)
 
-            with st.spinner("🤖 CoachBot is creating your personalised plan..."):
-                from google.generativeai.types import HarmCategory, HarmBlockThreshold
-                
-                model = genai.GenerativeModel(
-                    model_name="gemini-2.5-flash",
-                    generation_config={
-                        "temperature": temperature,
-                        "top_p": 0.95,
-                        "top_k": 40,
-                        "max_output_tokens": 8192,
-                        "candidate_count": 1,
-                    },
-                    safety_settings={
-                        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-                    }
-                )
-                result = get_ai_response(model, selected_prompt)
-
-            # ── Display output ────────────────
-            st.markdown("---")
-            st.markdown("## 📋 Your Personalized Plan")
-            st.markdown('<div class="output-box">', unsafe_allow_html=True)
-            st.markdown(result)
-            st.markdown("</div>", unsafe_allow_html=True)
-
-            # ── Reference tables ──────────────
-            if show_tables:
-                display_tabular_dashboard(feature, training_intensity, calorie_goal)
-
-            # ── History + download ────────────
-            st.session_state.chat_history.append({
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "feature":   feature,
-                "response":  result,
-            })
-            st.download_button(
-                "📥 Download Plan as Text File",
-                data=result,
-                file_name=f"coachbot_plan_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                mime="text/plain",
+            notes = (["⚡ Served from cache"] if from_cache
+                     else [token_caption(prompt_tokens, plan_config["max_output_tokens"])])
+            if request.seeded:
+                notes.append("🌱 Adapted from the ready-made plan for your sport, position and level")
+            st.session_state.plan_results[feature] = plan_result(
+                feature, result, training_intensity, calorie_goal,
+                truncated=truncated, notes=notes, structured=structured,
             )
-            st.success("✅ Plan generated! Review carefully and consult a coach if needed.")
-
-        # ── Chat history ──────────────────────
-        if st.session_state.chat_history:
-            st.markdown("---")
-            with st.expander("📜 View Previous Plans"):
-                for entry in reversed(st.session_state.chat_history[-5:]):
-                    st.markdown(f"**{entry['timestamp']}** — {entry['feature']}")
-                    st.text(entry["response"][:200] + "...")
+            st.session_state.plan_history.add(feature, result)
+            live.empty()
+
+        if batch_clicked:
+            if not batch_features:
+                st.warning("Select at least one feature for batch mode.")
+            else:
+                with live.container():
                     st.markdown("---")
+                    st.markdown("## 📦 Athlete Plan Pack")
+                    progress = st.progress(0.0, text="🤖 CoachBot is generating your plans...")
+                    jobs = {}
+                    batch_results = {}
+                    for name in batch_features:
+                        library_plan = library.get(profile, name) if serve_library else None
+                        if serve_library:
+                            metrics.record_cache(name, "library", library_plan is not None)
+                        if library_plan:
+                            batch_results[name] = {"text": library_plan["text"], "truncated": False,
+                                                   "seconds": 0.0, "cached": True}
+                            st.write(f"📚 {name} (plan library)")
+                            continue
+                        config = feature_generation_config(name, temperature, budgeter.budget_for(name),
+                                                           structured_output)
+                        with metrics.timer("coachbot_prompt_build_seconds", feature=name):
+                            request = prepare_request(profile, name, config, context_cache,
+                                                      seed_from_library, structured_output)
+                        jobs[name] = (request.model, request.prompt,
+                                      make_cache_key(request.full_prompt, DEFAULT_MODEL, config))
+                    for name, res in generate_batch(
+                            jobs, use_cache=use_cache, refresh=refresh_cache,
+                            on_usage=lambda name, usage: budgeter.record(name, DEFAULT_MODEL, usage),
+                            cacheable=((lambda name, text: parse_structured(text, name) is not None)
+                                       if structured_output else None)):
+                        if structured_output:
+                            text, data = read_structured(res["text"], name)
+                            res = dict(res, text=text, structured=data)
+                        batch_results[name] = res
+                        source = "cache" if res["cached"] else f"{res['seconds']:.1f}s"
+                        status = "⚠️" if is_error_response(res["text"]) else "✅"
+                        st.write(f"{status} {name} ({source})")
+                        progress.progress(len(batch_results) / len(batch_features),
+                                          text=f"{len(batch_results)}/{len(batch_features)} plans ready")
+
+                for name in batch_features:
+                    res = batch_results[name]
+                    st.session_state.plan_results[name] = plan_result(
+                        name, res["text"], training_intensity, calorie_goal, truncated=res["truncated"],
+                        structured=res.get("structured"),
+                    )
+                    st.session_state.plan_history.add(name, res["text"])
+                st.session_state.batch_result = {
+                    "features":     list(batch_features),
+                    "results":      batch_results,
+                    "generated_at": datetime.now().strftime("%Y%m%d_%H%M%S"),
+                }
+                live.empty()
+                st.success(f"✅ {len(batch_features)} plans generated! "
+                           "Review carefully and consult a coach if needed.")
+
+        show_plan_results(feature, athlete)
 
     # ══════════════════════════════════════════
-    # TAB 2 — CUSTOM COACH (Simple Q&A Only)
+    # TAB 2 — CUSTOM COACH (Multi-turn Chat)
     # ══════════════════════════════════════════
     with tab2:
 
         st.subheader("🧠 Custom Coach Consultation")
         st.markdown(
             '<div class="feature-box">'
-            "Ask any specific coaching question and get expert advice."
+            "Ask any specific coaching question and get expert advice. "
+            "Follow-up questions remember the conversation so far."
             "</div>",
             unsafe_allow_html=True,
         )
 
-        user_query = st.text_area(
-            "Ask your coaching question:",
-            placeholder="e.g. What are 3 best drills for explosive speed? How should I structure my training week? What should I eat before a match?",
-            height=150,
-        )
-
         col_a, col_b = st.columns([1, 2])
         with col_a:
-            intensity_val = st.slider("Advice Detail Level", 1, 100, 50, key="detail_slider")
+            intensity_val = st.slider("Advice Detail Level", 1, 100, 50, key="detail_slider",
+                                      help="Temperature = level / 100")
             ai_temp       = intensity_val / 100.0
-            st.caption(f"Temperature: **{ai_temp:.2f}**")
+            stream_answer = st.checkbox("Stream Answer", value=True, key="custom_stream_chk")
+            reuse_similar = st.checkbox("Reuse Answers to Similar Questions", value=True,
+                                        key="custom_reuse_chk",
+                                        help="Serve a near-identical earlier opening question's answer instantly")
+            similarity_threshold = st.slider("Similarity Threshold", 0.70, 0.99, DEFAULT_THRESHOLD, 0.01,
+                                             key="custom_similarity_slider")
         with col_b:
             st.info(
                 "💡 **Tip:** Be specific in your question. Mention your sport, age, position, "
                 "or any relevant details directly in your question for personalized advice."
             )
 
-        if st.button("🎯 Ask AI Coach", type="primary", key="custom_coach_btn"):
-            if not user_query.strip():
-                st.warning("Please type a question before submitting.")
-            else:
-                custom_prompt = f"""
-You are a professional sports coach. Answer this question with text AND a markdown table.
-
-Question: {user_query}
-
-Response format (MANDATORY):
-
-1. Write 1-2 paragraphs answering the question with clear advice.
-
-2. Create a MARKDOWN TABLE related to the question. Examples:
-   - If question is about drills: make a table with Drill | Duration | How To | Benefit
-   - If about meals: Meal | Time | Foods | Macros
-   - If about exercises: Exercise | Sets | Reps | Notes
-   Use pipes (|) and dashes for proper markdown format.
+        chat = st.session_state.coach_chat
+        chat_area = st.container()
 
-3. End with 1 short paragraph of tips.
-
-CRITICAL: Your response MUST include at least one properly formatted markdown table.
-"""
-                with st.spinner("🤖 Getting expert coaching advice..."):
-                    from google.generativeai.types import HarmCategory, HarmBlockThreshold
-                    
-                    custom_model = genai.GenerativeModel(
-                        "gemini-2.5-flash",
-                        generation_config={
-                            "temperature": ai_temp,
-                            "max_output_tokens": 8192,
-                            "candidate_count": 1,
-                        },
-                        safety_settings={
-                            HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
-                            HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
-                            HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
-                            HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
-                        }
-                    )
-                    answer = get_ai_response(custom_model, custom_prompt)
+        # Cleared after each question, like a chat box; the settings above stay put
+        with st.form("custom_form", border=False, clear_on_submit=True):
+            user_query = st.text_area(
+                "Ask your coaching question:" if chat.is_new else "Ask a follow-up question:",
+                placeholder="e.g. What are 3 best drills for explosive speed? How should I structure my training week? What should I eat before a match?",
+                height=150,
+            )
+            ask_clicked = st.form_submit_button("🎯 Ask AI Coach", type="primary")
+
+        if ask_clicked and not user_query.strip():
+            st.warning("Please type a question before submitting.")
+        elif ask_clicked:
+            opening_question = chat.is_new
+            with metrics.timer("coachbot_prompt_build_seconds", feature=CUSTOM_FEATURE):
+                custom_prompt = chat.build_prompt(user_query)
+            budgeter = get_token_budgeter()
+            custom_config = custom_generation_config(ai_temp, budgeter.budget_for(CUSTOM_FEATURE))
+            custom_model = get_model(DEFAULT_MODEL, custom_config)
+
+            # Follow-ups depend on the conversation, so only opening questions can be reused
+            use_similar = reuse_similar and opening_question
+            similar = (get_question_cache().lookup(user_query, ai_temp, similarity_threshold)
+                       if use_similar else None)
+            if use_similar:
+                metrics.record_cache(CUSTOM_FEATURE, "question", similar is not None)
+            last_usage, truncated = {}, False
+            if similar:
+                answer = similar["answer"]
+                notes = [f"♻️ Answered from a similar question: “{similar['question']}” "
+                         f"(similarity {similar['similarity']:.2f})"]
+            else:
+                def record_custom_usage(usage):
+                    budgeter.record(CUSTOM_FEATURE, DEFAULT_MODEL, usage)
+                    last_usage.update(usage)
+
+                prompt_tokens = budgeter.count_prompt_tokens(custom_model, custom_prompt)
+                started = time.perf_counter()
+                with chat_area:
+                    live = st.empty()
+                    with live.container():
+                        for turn in chat.transcript:
+                            with st.chat_message("user"):
+                                st.markdown(turn["question"])
+                            with st.chat_message("assistant"):
+                                render_response_blocks(turn["text"])
+                        with st.chat_message("user"):
+                            st.markdown(user_query)
+                        with st.chat_message("assistant"):
+                            answer, from_cache, truncated = render_ai_response(
+                                custom_model, custom_prompt,
+                                make_cache_key(custom_prompt, DEFAULT_MODEL, custom_config),
+                                stream=stream_answer,
+                                spinner_text="🤖 Getting expert coaching advice...",
+                                on_usage=record_custom_usage,
+                                feature=CUSTOM_FEATURE,
+                            )
+                    live.empty()
+                notes = (["⚡ Served from cache"] if from_cache
+                         else [token_caption(prompt_tokens, custom_config["max_output_tokens"])])
+                if not from_cache:
+                    chat.record_usage(last_usage, time.perf_counter() - started, custom_prompt)
+                if use_similar and not from_cache and not truncated and not is_error_response(answer):
+                    get_question_cache().add(user_query, answer, ai_temp)
+
+            chat.add_turn(user_query, answer, notes, truncated=truncated)
+
+        with chat_area:
+            show_custom_chat()
 
-                st.markdown("---")
-                st.markdown("### 📋 AI Coach Response")
-                st.markdown('<div class="output-box">', unsafe_allow_html=True)
-                st.markdown(answer)
-                st.markdown("</div>", unsafe_allow_html=True)
+    # ══════════════════════════════════════════
+    # TAB 3 — TRAINING LOG
+    # ══════════════════════════════════════════
+    with tab3:
 
-                st.download_button(
-                    "📥 Download Response",
-                    data=answer,
-                    file_name=f"coachbot_custom_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                    mime="text/plain",
-                    key="custom_download_btn"
-                )
+        st.subheader("📈 Training Log")
+        st.markdown(
+            '<div class="feature-box">'
+            "Log each session's duration and effort (RPE). Your weekly load and acute:chronic "
+            "workload ratio feed the progress tables and every plan CoachBot writes for you."
+            "</div>",
+            unsafe_allow_html=True,
+        )
+        show_training_log(athlete)
 
 # ─────────────────────────────────────────────
 # NOT CONFIGURED STATE
@@ -847,3 +1011,14 @@ st.markdown("""
     trainers, and medical professionals before starting any new training programme.</p>
 </div>
 """, unsafe_allow_html=True)
+
+# ─────────────────────────────────────────────
+# STARTUP TIMING
+# ─────────────────────────────────────────────
+# Always recorded in metrics; COACHBOT_STARTUP_TIMING=1 also shows it in the sidebar
+_run_seconds = time.perf_counter() - _script_started
+_cold_run = record_script_run(_imports_done - _script_started, _run_seconds)
+if STARTUP_TIMING:
+    st.sidebar.caption(f"⏱️ {'Cold start' if _cold_run else 'Rerun'}: imports "
+                       f"{(_imports_done - _script_started) * 1000:.0f} ms · "
+                       f"run {_run_seconds * 1000:.0f} ms")
@@ -0,0 +1,70 @@
+"""
+CoachBot AI - Concurrent batch generation
+Runs several prompts on a bounded thread pool and yields each result as it finishes.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from gemini_client import is_error_response
+from request_coalescer import get_request_coalescer
+from response_cache import get_response_cache
+from telemetry import get_metrics
+
+DEFAULT_MAX_WORKERS = 10
+
+
+def _run_job(model, prompt, key, on_usage=None, feature=None):
+    started = time.perf_counter()
+    flight = get_request_coalescer().join(key, model, prompt, stream=False, on_usage=on_usage,
+                                          feature=feature)
+    text, truncated = flight.result()
+    return {"text": text, "truncated": truncated,
+            "seconds": time.perf_counter() - started, "cached": False}
+
+
+def generate_batch(jobs, max_workers=DEFAULT_MAX_WORKERS, use_cache=True, refresh=False,
+                   on_usage=None, feature_of=None, cacheable=None):
+    """Generate every job concurrently.
+
+    jobs maps a name to (model, prompt, cache_key). Yields (name, result) in
+    completion order, so callers can show progress as each one lands. Cached
+    results are yielded first without touching the pool; refresh skips the lookup
+    but still caches the fresh results. on_usage(name, usage) is called from the
+    worker thread after each model request. Requests share
+    the process-wide rate limiter, so a large batch queues rather than failing, and
+    a job identical to one already in flight (batch or single plan, any session)
+    waits on that request instead of sending its own.
+    feature_of(name) gives the feature label for telemetry (default: the name).
+    cacheable(name, text) can keep a fresh result out of the cache (default: any
+    non-error text that was not truncated is cached).
+    """
+    feature_of = feature_of or (lambda name: name)
+    cache = get_response_cache() if use_cache else None
+    pending = {}
+    for name, (model, prompt, cache_key) in jobs.items():
+        cached = cache.get(cache_key) if cache and not refresh else None
+        if cache and not refresh:
+            get_metrics().record_cache(feature_of(name), "response", cached is not None)
+        if cached is not None:
+            yield name, {"text": cached, "truncated": False, "seconds": 0.0, "cached": True}
+        else:
+            pending[name] = (model, prompt, cache_key)
+
+    if not pending:
+        return
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(pending)),
+                            thread_name_prefix="coachbot-batch") as pool:
+        futures = {
+            pool.submit(_run_job, model, prompt, cache_key,
+                        (lambda usage, name=name: on_usage(name, usage)) if on_usage else None,
+                        feature_of(name)): name
+            for name, (model, prompt, cache_key) in pending.items()
+        }
+        for future in as_completed(futures):
+            name = futures[future]
+            result = future.result()
+            if (cache and not result["truncated"] and not is_error_response(result["text"])
+                    and (cacheable is None or cacheable(name, result["text"]))):
+                cache.set(pending[name][2], result["text"])
+            yield name, result
@@ -0,0 +1,379 @@
+"""
+CoachBot AI - Offline benchmark suite
+Runs the app and its hot paths against the local fake Gemini backend and reports
+p50/p95/p99; with a stored baseline, exits non-zero when a benchmark regresses.
+
+    python benchmark.py                     # compare against benchmark_baseline.json
+    python benchmark.py --save-baseline     # record a new baseline on this machine
+"""
+
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Keep benchmark runs away from the real caches and plan history
+_SCRATCH = tempfile.mkdtemp(prefix="coachbot_bench_")
+os.environ["COACHBOT_CACHE_DB"] = os.path.join(_SCRATCH, "cache.sqlite3")
+os.environ["COACHBOT_QUESTION_INDEX"] = os.path.join(_SCRATCH, "questions.npz")
+
+import reference_tables
+from fake_gemini import FakeBackend, install
+from gemini_client import (DEFAULT_MODEL, StreamingHtmlCleaner, generate_text, get_model,
+                           plan_generation_config, routed_request)
+from markdown_tables import MarkdownTableParser
+from model_router import get_model_router
+from prompts import DEFAULT_FEATURE, build_profile, build_prompt, build_prompts, feature_options
+from rate_limiter import get_rate_limiter
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+DEFAULT_BASELINE = "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.25     # allowed slowdown (or memory growth) over the baseline
+COMPARED_STATS = ("p50", "p95")
+
+SAMPLE_PROFILE = build_profile(
+    name="Sarah", age=16, gender="Female", sport="Football", position="Midfielder",
+    fitness_level="Intermediate", injury_history="Mild ankle sprain last season",
+    diet_type="Vegetarian", allergies="Peanuts", calorie_goal="Maintenance",
+    training_intensity="High", training_duration="60 minutes",
+    training_frequency="4-5 times/week", specific_goal="Tournament prep",
+)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(samples, unit, scale):
+    values = [s * scale for s in samples]
+    return {
+        "unit": unit,
+        "n":    len(values),
+        "p50":  round(percentile(values, 50), 3),
+        "p95":  round(percentile(values, 95), 3),
+        "p99":  round(percentile(values, 99), 3),
+    }
+
+
+def timed(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+# ─────────────────────────────────────────────
+# IN-PROCESS BENCHMARKS
+# ─────────────────────────────────────────────
+def bench_prompt_render(repeat):
+    return timed(lambda: build_prompts(SAMPLE_PROFILE), repeat)
+
+
+def bench_generate_postprocess(repeat):
+    """generate_text() on an instant fake model: limiter, finish-reason checks and HTML cleanup."""
+    model = get_model(DEFAULT_MODEL, plan_generation_config(0.5))
+    prompt = build_prompt(SAMPLE_PROFILE, DEFAULT_FEATURE)
+    return timed(lambda: generate_text(model, prompt), repeat)
+
+
+def bench_stream_postprocess(repeat):
+    """What the streaming path does per response: HTML cleanup plus incremental table parsing."""
+    model = get_model(DEFAULT_MODEL, plan_generation_config(0.5))
+    prompt = build_prompt(SAMPLE_PROFILE, DEFAULT_FEATURE)
+    chunks = [chunk.text for chunk in model.generate_content(prompt, stream=True)]
+
+    def run():
+        cleaner, parser = StreamingHtmlCleaner(), MarkdownTableParser()
+        for chunk in chunks:
+            parser.feed(cleaner.feed(chunk))
+            parser.blocks()
+        parser.feed(cleaner.flush())
+        parser.close()
+        return parser.blocks()
+
+    return timed(run, repeat)
+
+
+def bench_reference_tables_cold(repeat):
+    """Build every reference table and its HTML from scratch (the first dashboard of a process)."""
+    builders = [getattr(reference_tables, name) for name in dir(reference_tables)
+                if name.startswith("create_")]
+
+    def run():
+        for builder in builders:
+            builder.cache_clear()
+        reference_tables.table_html.cache_clear()
+        for builder in builders:
+            reference_tables.table_html(builder)
+
+    return timed(run, repeat, warmup=0)
+
+
+# ─────────────────────────────────────────────
+# ROUTING BENCHMARKS (misbehaving primary model)
+# ─────────────────────────────────────────────
+SLOW_PRIMARY_SECONDS = 2.0
+HEDGE_AFTER_SECONDS = 0.2
+
+
+def _with_primary(overrides, run, repeat):
+    """Time run(model, prompt) with the primary model misbehaving and the others healthy."""
+    router = get_model_router()
+    saved = router.default_delays
+    router.default_delays = (HEDGE_AFTER_SECONDS, HEDGE_AFTER_SECONDS)
+    router.reset()
+    try:
+        with install(FakeBackend(models={DEFAULT_MODEL: overrides})):
+            model = get_model(DEFAULT_MODEL, plan_generation_config(0.5))
+            prompt = build_prompt(SAMPLE_PROFILE, DEFAULT_FEATURE)
+            return timed(lambda: run(model, prompt), repeat)
+    finally:
+        router.default_delays = saved
+        router.reset()
+
+
+def bench_route_slow_primary(repeat):
+    """Streamed request whose primary stalls for 2 s: hedged to the fallback after 0.2 s."""
+    return _with_primary({"latency": SLOW_PRIMARY_SECONDS},
+                         lambda model, prompt: routed_request(model, prompt, stream=True,
+                                                              on_text=lambda text: None),
+                         repeat)
+
+
+def bench_route_failing_primary(repeat):
+    """Blocking request whose primary always fails: failover, then skipped by its breaker."""
+    return _with_primary({"error_rate": 1.0, "error_code": 400, "latency": 0.05},
+                         lambda model, prompt: generate_text(model, prompt), repeat)
+
+
+# ─────────────────────────────────────────────
+# APP BENCHMARKS (streamlit.testing)
+# ─────────────────────────────────────────────
+def new_session(seed_plan=False):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(APP_PATH, default_timeout=60)
+    at.secrets["GEMINI_API_KEY"] = "fake-benchmark-key"
+    if seed_plan:
+        feature = feature_options[0]
+        at.session_state["plan_results"] = {feature: {
+            "feature":            feature,
+            "text":               FakeBackend().text_for("", DEFAULT_MODEL),
+            "structured":         None,
+            "training_intensity": "Moderate",
+            "calorie_goal":       "Maintenance",
+            "truncated":          False,
+            "notes":              [],
+            "generated_at":       "20240101_000000",
+        }}
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception[0].message}")
+    return at
+
+
+def widget(elements, label):
+    return next(el for el in elements if el.label == label)
+
+
+def rerun(at):
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception[0].message}")
+
+
+def bench_cold_run(repeat):
+    return timed(new_session, repeat, warmup=1)
+
+
+# Fresh interpreter per sample: the first page a new pod renders, before any API key.
+# Only the script run is timed; importing Streamlit itself happens at server start.
+_COLD_START_CODE = """
+import sys, time
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+started = time.perf_counter()
+at.run()
+print(time.perf_counter() - started)
+"""
+
+
+def bench_process_cold_start(repeat):
+    samples = []
+    for _ in range(repeat):
+        env = dict(os.environ, COACHBOT_METRICS_FILE="")
+        out = subprocess.run([sys.executable, "-c", _COLD_START_CODE, APP_PATH], env=env,
+                             capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(APP_PATH))
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def bench_rerun_idle(repeat):
+    at = new_session()
+    return timed(lambda: rerun(at), repeat)
+
+
+def bench_rerun_with_plan(repeat):
+    at = new_session(seed_plan=True)
+    at.checkbox(key="show_tables").uncheck()
+    rerun(at)
+    return timed(lambda: rerun(at), repeat)
+
+
+def bench_rerun_with_dashboard(repeat):
+    at = new_session(seed_plan=True)
+    return timed(lambda: rerun(at), repeat)
+
+
+def bench_rerun_with_dashboard_interactive(repeat):
+    at = new_session(seed_plan=True)
+    at.checkbox(key="interactive_tables").check()
+    rerun(at)
+    return timed(lambda: rerun(at), repeat)
+
+
+def click_generate(at):
+    widget(at.checkbox, "Reuse Cached Plans").uncheck()
+    widget(at.button, "🚀 Generate Personalized Plan").click()
+    rerun(at)
+
+
+def bench_generate_rerun(repeat):
+    """A full Generate click: prompt, fake model call, streaming render and storage."""
+    at = new_session()
+    return timed(lambda: click_generate(at), repeat)
+
+
+def bench_session_memory(repeat):
+    """Bytes a session keeps alive after generating every feature once."""
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        at = new_session()
+        for feature in feature_options:
+            widget(at.selectbox, "Select a Feature").select(feature)
+            click_generate(at)
+        gc.collect()
+        samples.append(tracemalloc.get_traced_memory()[0] - before)
+        tracemalloc.stop()
+        del at
+    return samples
+
+
+# name -> (function, unit, scale)
+BENCHMARKS = {
+    "prompt_render":                   (bench_prompt_render, "ms", 1e3),
+    "generate_postprocess":            (bench_generate_postprocess, "ms", 1e3),
+    "stream_postprocess":              (bench_stream_postprocess, "ms", 1e3),
+    "reference_tables_cold":           (bench_reference_tables_cold, "ms", 1e3),
+    "route_slow_primary":              (bench_route_slow_primary, "ms", 1e3),
+    "route_failing_primary":           (bench_route_failing_primary, "ms", 1e3),
+    "app_cold_run":                    (bench_cold_run, "ms", 1e3),
+    "app_process_cold_start":          (bench_process_cold_start, "ms", 1e3),
+    "app_rerun_idle":                  (bench_rerun_idle, "ms", 1e3),
+    "app_rerun_with_plan":             (bench_rerun_with_plan, "ms", 1e3),
+    "app_rerun_with_dashboard":        (bench_rerun_with_dashboard, "ms", 1e3),
+    "app_rerun_dashboard_interactive": (bench_rerun_with_dashboard_interactive, "ms", 1e3),
+    "app_generate_rerun":              (bench_generate_rerun, "ms", 1e3),
+    "session_memory":                  (bench_session_memory, "KiB", 1 / 1024),
+}
+DEFAULT_REPEATS = {"session_memory": 3, "app_cold_run": 10, "app_process_cold_start": 5,
+                   "app_generate_rerun": 20, "route_slow_primary": 20, "route_failing_primary": 20}
+
+
+def compare(results, baseline, tolerance):
+    """Regression messages for every stat that grew more than `tolerance` over the baseline."""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for stat in COMPARED_STATS:
+            limit = base[stat] * (1 + tolerance)
+            if stats[stat] > limit:
+                regressions.append(f"{name} {stat}: {stats[stat]:.3f} {stats['unit']} > "
+                                   f"{limit:.3f} (baseline {base[stat]:.3f})")
+    return regressions
+
+
+def print_report(results, baseline):
+    print(f"{'benchmark':34} {'unit':>4} {'n':>4} {'p50':>10} {'p95':>10} {'p99':>10} {'base p95':>10}")
+    for name, stats in results.items():
+        base = baseline.get(name, {}).get("p95")
+        base_text = f"{base:10.3f}" if base is not None else f"{'-':>10}"
+        print(f"{name:34} {stats['unit']:>4} {stats['n']:>4} {stats['p50']:10.3f} "
+              f"{stats['p95']:10.3f} {stats['p99']:10.3f} {base_text}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CoachBot against a local fake Gemini backend.")
+    parser.add_argument("--only", help="Comma-separated benchmark names (default: all)")
+    parser.add_argument("--repeat", type=int, default=50, help="Samples per benchmark")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed growth over the baseline, e.g. 0.25 = 25%%")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0,
+                        help="Fake generation speed (0 = instant)")
+    parser.add_argument("--finish-reason", default="STOP", help="Fake finish reason, e.g. MAX_TOKENS")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake calls that fail")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    backend = FakeBackend(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                          finish_reason=args.finish_reason, error_rate=args.error_rate, seed=0)
+    get_rate_limiter().configure(rpm=0, tpm=0)
+    results = {}
+    with install(backend):
+        for name in names:
+            fn, unit, scale = BENCHMARKS[name]
+            repeat = min(args.repeat, DEFAULT_REPEATS.get(name, args.repeat))
+            print(f"running {name} ({repeat} samples)...", file=sys.stderr)
+            results[name] = summarize(fn(repeat), unit, scale)
+
+    print_report(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    if not baseline:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one.")
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+CoachBot AI - Offline plan library builder
+Generates a plan for every cell of the sport x position x fitness level x feature
+matrix (times the intensity and calorie options) into the plan library.
+
+Usage:
+    python build_plan_library.py --dry-run
+    python build_plan_library.py --sports Cricket,Kabaddi --features 1,5 --rpm 60
+    python build_plan_library.py --features 4 --diets all
+
+Every other profile field is fixed to the sidebar's initial selection (age 15,
+vegetarian, 30-minute sessions, ...) unless listed with its own option; a profile
+only gets a library plan if its cell was built. Ages are built per band
+(plan_library.AGE_BANDS): --ages 16 builds the 14-17 band, written for age 15.
+Re-running skips cells already in the library, so a build can be resumed or
+extended. Truncated and failed plans are not stored.
+"""
+
+import argparse
+import itertools
+import os
+import sys
+
+from batch_generation import generate_batch
+from gemini_client import (
+    DEFAULT_MODEL, configure_api_key, estimate_prompt_tokens, get_model, is_error_response,
+    plan_generation_config,
+)
+from plan_library import DEFAULT_LIBRARY_PATH, PlanLibrary, library_age, library_key, library_profile
+from prompts import (
+    PROFILE_DEFAULTS, build_profile, build_prompt, calorie_goal_options, diet_type_options,
+    fitness_level_options, gender_options, position_options, training_duration_options,
+    training_frequency_options, training_intensity_options,
+)
+from rate_limiter import get_rate_limiter
+from roster_cli import parse_features
+from telemetry import get_metrics, write_metrics_file
+from token_budget import get_token_budgeter
+
+CHUNK_SIZE = 200      # cells handed to the batch pool at a time
+
+# option -> (profile field, choices, default selection: "all" or the sidebar's initial one)
+DIMENSIONS = {
+    "sports":        ("sport",              list(position_options), "all"),
+    "levels":        ("fitness_level",      fitness_level_options, "all"),
+    "intensities":   ("training_intensity", training_intensity_options, "all"),
+    "calorie_goals": ("calorie_goal",       calorie_goal_options, "all"),
+    "ages":          ("age",                None, "default"),
+    "genders":       ("gender",             gender_options, "default"),
+    "diets":         ("diet_type",          diet_type_options, "default"),
+    "durations":     ("training_duration",  training_duration_options, "default"),
+    "frequencies":   ("training_frequency", training_frequency_options, "default"),
+}
+
+
+def parse_choices(spec, field, choices):
+    """'all', 'default' or a comma-separated list (checked against the app's choices)."""
+    spec = spec.strip()
+    if spec.lower() == "all":
+        if choices is None:
+            raise ValueError(f"--{field}: give explicit values, not 'all'")
+        return list(choices)
+    if spec.lower() == "default":
+        # What the sidebar starts on, i.e. what most users leave it at
+        return [choices[0] if choices else PROFILE_DEFAULTS[field]]
+    values = [part.strip() for part in spec.split(",") if part.strip()]
+    if field == "age":
+        return sorted({library_age(int(value)) for value in values})
+    unknown = [value for value in values if value not in choices]
+    if unknown:
+        raise ValueError(f"unknown {field} value(s) {unknown}; choose from {choices}")
+    return values
+
+
+def iter_cells(selected, features):
+    """(profile, feature) for every cell; positions follow each selected sport."""
+    fields = [DIMENSIONS[name][0] for name in DIMENSIONS]
+    values = [selected[name] for name in DIMENSIONS]
+    for combo in itertools.product(*values):
+        base = dict(zip(fields, combo))
+        for position in position_options[base["sport"]]:
+            profile = library_profile(build_profile(position=position, **base))
+            for feature in features:
+                yield profile, feature
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-generate the CoachBot plan library.")
+    for name, (field, _, default) in DIMENSIONS.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, default=default,
+                            help=f"{field}: 'all', 'default' or a comma-separated list (default: {default})")
+    parser.add_argument("--features", default="all",
+                        help="Comma-separated feature numbers (1-10) or 'all'")
+    parser.add_argument("--library", default=DEFAULT_LIBRARY_PATH, help="Plan library file")
+    parser.add_argument("--limit", type=int, help="Generate at most this many new cells")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only count the cells (and estimate prompt tokens) to generate")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent model requests")
+    parser.add_argument("--rpm", type=float, default=30, help="Max requests per minute (0 = no limit)")
+    parser.add_argument("--tpm", type=float, help="Max prompt tokens per minute (0 = no limit)")
+    parser.add_argument("--temperature", type=float, default=0.5)
+    parser.add_argument("--metrics", help="Write request latency/token metrics (Prometheus text) here")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                        help="Gemini API key (defaults to $GEMINI_API_KEY)")
+    args = parser.parse_args(argv)
+
+    try:
+        selected = {name: parse_choices(getattr(args, name), field, choices)
+                    for name, (field, choices, _) in DIMENSIONS.items()}
+        features = parse_features(args.features)
+    except ValueError as e:
+        parser.error(str(e))
+
+    library = PlanLibrary(args.library)
+    existing = library.keys()
+    todo = [(profile, feature) for profile, feature in iter_cells(selected, features)
+            if library_key(profile, feature) not in existing]
+    total = len(existing) + len(todo)
+    if args.limit is not None:
+        todo = todo[:args.limit]
+    print(f"{len(todo)} cells to generate ({len(existing)} already in {args.library})",
+          file=sys.stderr)
+    if args.dry_run:
+        tokens = sum(estimate_prompt_tokens(build_prompt(p, f)) for p, f in todo)
+        print(f"~{tokens:,} prompt tokens; about {total:,} cells once complete", file=sys.stderr)
+        return 0
+
+    if not args.api_key:
+        parser.error("no API key: pass --api-key or set GEMINI_API_KEY")
+    configure_api_key(args.api_key)
+    get_rate_limiter().configure(rpm=args.rpm, tpm=args.tpm)
+    budgeter = get_token_budgeter()
+
+    done = failures = 0
+    for chunk in _chunks(enumerate(todo), CHUNK_SIZE):
+        jobs = {}
+        for i, (profile, feature) in chunk:
+            config = plan_generation_config(args.temperature, budgeter.budget_for(feature))
+            jobs[i] = (get_model(DEFAULT_MODEL, config), build_prompt(profile, feature), None)
+        stored = []
+        # The library is its own store; the response cache is left to interactive users
+        for i, res in generate_batch(jobs, max_workers=args.workers, use_cache=False,
+                                     on_usage=lambda i, usage: budgeter.record(todo[i][1], DEFAULT_MODEL, usage),
+                                     feature_of=lambda i: todo[i][1]):
+            done += 1
+            if is_error_response(res["text"]) or res["truncated"]:
+                failures += 1
+                status = "FAIL"
+            else:
+                stored.append((*todo[i], res["text"]))
+                status = "ok  "
+            profile, feature = todo[i]
+            print(f"[{done}/{len(todo)}] {status} {profile['sport']} / {profile['position']} / "
+                  f"{profile['fitness_level']} — {feature}", file=sys.stderr)
+        library.put_many(stored)
+
+    summary = library.summary()
+    print(f"{summary['plans']} plans in the library, {summary['compressed_bytes'] / 1e6:.1f} MB "
+          f"compressed ({summary['chars'] / 1e6:.1f} MB of text)", file=sys.stderr)
+    if args.metrics:
+        write_metrics_file(get_metrics(), args.metrics)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+CoachBot AI - Multi-turn Custom Coach chat
+Keeps the last few turns verbatim and folds older ones into a running summary
+(compacted off-thread), so each follow-up prompt stays roughly the same size.
+Per-turn token usage is kept per session and logged to SQLite.
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from gemini_client import (DEFAULT_MODEL, custom_generation_config, estimate_prompt_tokens,
+                           generate_text, get_model, is_error_response)
+from prompts import build_chat_prompt, build_chat_summary_prompt, build_custom_prompt
+from response_cache import DEFAULT_DB_PATH
+
+MAX_RECENT_TURNS = 3          # turns sent verbatim
+RECENT_TOKEN_BUDGET = 2500    # ...as long as they fit in roughly this many tokens
+SUMMARY_WORDS = 150
+SUMMARY_MAX_CHARS = 1500
+SUMMARY_TEMPERATURE = 0.2
+SUMMARY_MAX_OUTPUT_TOKENS = 1024
+TRANSCRIPT_SIZE = 20          # turns kept for display
+USAGE_WINDOW = 500            # per-turn usage records kept in memory
+SUMMARY_FEATURE = "Custom Coach (summary)"
+
+_summarizer = ThreadPoolExecutor(max_workers=2, thread_name_prefix="coachbot-summary")
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+def format_turns(turns):
+    return "\n\n".join(f"Athlete: {turn['question']}\nCoach: {turn['answer']}" for turn in turns)
+
+
+def _fallback_summary(summary, turns):
+    """Used when the summary call fails: keep the questions, newest last, within the cap."""
+    asked = " ".join(f"Athlete asked: {turn['question'][:200]}" for turn in turns)
+    text = f"{summary} {asked}".strip()
+    return text[-SUMMARY_MAX_CHARS:]
+
+
+def summarize_turns(summary, turns):
+    """Fold `turns` into `summary` with a small, low-temperature model call."""
+    config = custom_generation_config(SUMMARY_TEMPERATURE, SUMMARY_MAX_OUTPUT_TOKENS)
+    prompt = build_chat_summary_prompt(summary, format_turns(turns), SUMMARY_WORDS)
+    text, _ = generate_text(get_model(DEFAULT_MODEL, config), prompt, feature=SUMMARY_FEATURE)
+    if is_error_response(text):
+        return _fallback_summary(summary, turns)
+    return text.strip()[:SUMMARY_MAX_CHARS]
+
+
+class ChatSession:
+    """One browser session's conversation with the Custom Coach."""
+
+    def __init__(self, session_id=None, db_path=DEFAULT_DB_PATH, max_recent_turns=MAX_RECENT_TURNS,
+                 recent_token_budget=RECENT_TOKEN_BUDGET, summarize=summarize_turns):
+        self.session_id = session_id or uuid.uuid4().hex
+        self.db_path = db_path
+        self.max_recent_turns = max_recent_turns
+        self.recent_token_budget = recent_token_budget
+        self._summarize = summarize
+        self.summary = ""
+        self._recent = deque()          # verbatim turns, oldest first
+        self._folding = []              # turns being summarised right now (still sent verbatim)
+        self._pending = []              # turns that left the window while a summary was running
+        self._future = None
+        self.transcript = deque(maxlen=TRANSCRIPT_SIZE)
+        self.usage = deque(maxlen=USAGE_WINDOW)
+        self.turn_count = 0
+        self._ensure_schema()
+
+    # ── Prompt window ─────────────────────
+    @property
+    def is_new(self):
+        return self.turn_count == 0
+
+    def _window_turns(self):
+        return self._folding + self._pending + list(self._recent)
+
+    def _collect_summary(self):
+        """Apply a finished background summary; start the next one if turns are waiting."""
+        if self._future is not None and self._future.done():
+            try:
+                self.summary = self._future.result()
+            except Exception:
+                self.summary = _fallback_summary(self.summary, self._folding)
+            self._folding, self._future = [], None
+        self._compact()
+
+    def _compact(self):
+        while len(self._recent) > 1 and (
+                len(self._recent) > self.max_recent_turns
+                or estimate_prompt_tokens(format_turns(self._recent)) > self.recent_token_budget):
+            self._pending.append(self._recent.popleft())
+        if self._future is None and self._pending:
+            self._folding, self._pending = self._pending, []
+            self._future = _summarizer.submit(self._summarize, self.summary, list(self._folding))
+
+    def build_prompt(self, question):
+        """Prompt for the next question: summary + recent turns verbatim + the question."""
+        self._collect_summary()
+        if self.is_new:
+            return build_custom_prompt(question)
+        return build_chat_prompt(question, self.summary, format_turns(self._window_turns()))
+
+    def add_turn(self, question, answer, notes=(), truncated=False):
+        """Record an answered question. Error answers are shown but kept out of the context."""
+        self.turn_count += 1
+        self.transcript.append({
+            "question":     question,
+            "text":         answer,
+            "notes":        list(notes),
+            "truncated":    truncated,
+            "generated_at": datetime.now().strftime("%Y%m%d_%H%M%S"),
+        })
+        if not is_error_response(answer):
+            self._recent.append({"question": question, "answer": answer})
+        self._collect_summary()
+
+    def reset(self):
+        self.summary = ""
+        self._recent.clear()
+        self._folding, self._pending, self._future = [], [], None
+        self.transcript.clear()
+        self.turn_count = 0
+
+    # ── Usage ─────────────────────────────
+    def record_usage(self, usage, seconds, prompt):
+        """Per-turn usage (see gemini_client.usage_from_response), kept in memory and in SQLite."""
+        record = {
+            "turn":           self.turn_count + 1,
+            "prompt_tokens":  usage.get("prompt_tokens", 0) or estimate_prompt_tokens(prompt),
+            "output_tokens":  usage.get("output_tokens", 0),
+            "seconds":        round(seconds, 3),
+            "summary_chars":  len(self.summary),
+            "recent_turns":   len(self._window_turns()),
+        }
+        self.usage.append(record)
+        if not self.db_path:
+            return
+        try:
+            with sqlite3.connect(self.db_path, timeout=5) as conn:
+                conn.execute(
+                    "INSERT INTO chat_usage VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.session_id, record["turn"], record["prompt_tokens"], record["output_tokens"],
+                     record["seconds"], record["summary_chars"], time.time()),
+                )
+        except sqlite3.Error:
+            pass
+
+    def _ensure_schema(self):
+        if not self.db_path:
+            return
+        with _schema_lock:
+            if self.db_path in _schema_ready:
+                return
+            try:
+                with sqlite3.connect(self.db_path, timeout=5) as conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS chat_usage ("
+                        " session_id TEXT NOT NULL, turn INTEGER NOT NULL, prompt_tokens INTEGER,"
+                        " output_tokens INTEGER, seconds REAL, summary_chars INTEGER,"
+                        " recorded_at REAL NOT NULL)"
+                    )
+                _schema_ready.add(self.db_path)
+            except sqlite3.Error:
+                pass
@@ -0,0 +1,278 @@
+"""
+CoachBot AI - Context caching for the shared athlete prefix
+Puts the persona, house rules and athlete profile into Gemini cached content once,
+then sends each feature as a short delta against it. Entries are keyed by the
+profile fingerprint, refreshed before they expire and deleted when the profile
+that created them changes.
+"""
+
+import datetime
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from gemini_client import DEFAULT_MODEL, default_safety_settings, estimate_prompt_tokens, get_model
+from prompts import build_context_prefix, build_feature_delta, build_profile, context_fingerprint
+
+DEFAULT_BACKEND = os.environ.get("COACHBOT_CONTEXT_CACHE_BACKEND", "gemini")   # gemini | local
+DEFAULT_TTL_SECONDS = int(os.environ.get("COACHBOT_CONTEXT_CACHE_TTL", "900"))
+# The API rejects cached content below a per-model minimum (1,024 tokens for
+# gemini-2.5-flash); shorter prefixes are sent inline. A typical athlete prefix is
+# only ~270 tokens, so the app and roster CLI check caches_profiles() first.
+DEFAULT_MIN_TOKENS = int(os.environ.get("COACHBOT_CONTEXT_CACHE_MIN_TOKENS", "1024"))
+DEFAULT_MAX_ENTRIES = 64
+REFRESH_MARGIN = 0.5       # extend an entry once less than half its TTL remains
+FAILURE_BACKOFF = 300      # seconds before retrying a prefix whose create() failed
+
+# model: what to call; prompt: what to send it; full_prompt: prefix + delta (for
+# response-cache keys and token counting); context: cached content name or None
+# seeded: a plan-library entry was appended for Gemini to adapt (app.prepare_request)
+PreparedRequest = namedtuple("PreparedRequest", "model prompt full_prompt context seeded", defaults=(False,))
+
+
+class GeminiContextBackend:
+    """google.generativeai.caching.CachedContent."""
+
+    def create(self, model_name, prefix, ttl):
+        from google.generativeai import caching
+        return caching.CachedContent.create(
+            model=f"models/{model_name}", contents=[prefix],
+            ttl=datetime.timedelta(seconds=ttl), display_name="coachbot-athlete-context",
+        )
+
+    def extend(self, handle, ttl):
+        handle.update(ttl=datetime.timedelta(seconds=ttl))
+
+    def delete(self, handle):
+        handle.delete()
+
+    def model_for(self, handle, generation_config):
+        import google.generativeai as genai
+        return genai.GenerativeModel.from_cached_content(
+            handle, generation_config=dict(generation_config or {}),
+            safety_settings=default_safety_settings(),
+        )
+
+
+class _PrefixedModel:
+    """What the local backend hands out: prepends the stored prefix to every call."""
+
+    def __init__(self, model, prefix):
+        self._model = model
+        self._prefix = prefix
+        self.model_name = model.model_name
+
+    def generate_content(self, contents, stream=False):
+        return self._model.generate_content(self._prefix + str(contents), stream=stream)
+
+    def count_tokens(self, contents):
+        return self._model.count_tokens(self._prefix + str(contents))
+
+
+class LocalContextBackend:
+    """In-process stand-in with the same lifecycle, for tests and the offline benchmarks."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._store = {}
+        self._next_id = 0
+        self.stats = {"created": 0, "extended": 0, "deleted": 0}
+
+    def create(self, model_name, prefix, ttl):
+        with self._lock:
+            self._next_id += 1
+            name = f"cachedContents/local-{self._next_id}"
+            self._store[name] = (model_name, prefix)
+            self.stats["created"] += 1
+        return name
+
+    def extend(self, handle, ttl):
+        with self._lock:
+            self.stats["extended"] += 1
+
+    def delete(self, handle):
+        with self._lock:
+            if self._store.pop(handle, None) is not None:
+                self.stats["deleted"] += 1
+
+    @property
+    def live(self):
+        return len(self._store)
+
+    def model_for(self, handle, generation_config):
+        model_name, prefix = self._store[handle]
+        return _PrefixedModel(get_model(model_name, generation_config), prefix)
+
+
+class ContextCache:
+    """One cached prefix per (model, profile fingerprint), shared by whoever has that profile.
+
+    `owner` identifies who is using a profile (a browser session, a roster athlete).
+    When an owner's profile changes, their old entry is deleted as soon as no other
+    owner still uses it, instead of lingering (and being billed) until its TTL.
+    """
+
+    def __init__(self, backend, ttl_seconds=DEFAULT_TTL_SECONDS, min_tokens=DEFAULT_MIN_TOKENS,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (model, fingerprint) -> entry dict
+        self._owners = {}               # owner -> (model, fingerprint)
+        self._failed = {}               # (model, fingerprint) -> time of last failed create
+        self.stats = {"hits": 0, "misses": 0, "inline": 0, "invalidated": 0, "expired": 0}
+
+    def caches_profiles(self):
+        """True if a typical athlete prefix is large enough for the backend to cache."""
+        return estimate_prompt_tokens(build_context_prefix(build_profile())) >= self.min_tokens
+
+    def prepare(self, profile, feature, generation_config, model_name=DEFAULT_MODEL, owner=None):
+        """PreparedRequest for one feature, creating or reusing the athlete's cached prefix."""
+        prefix = build_context_prefix(profile)
+        delta = build_feature_delta(profile, feature)
+        key = (model_name, context_fingerprint(profile))
+        handle = self._acquire(key, prefix, owner)
+        if handle is None:
+            return PreparedRequest(get_model(model_name, generation_config), prefix + delta,
+                                   prefix + delta, None)
+        model = self._model(key, handle, generation_config)
+        return PreparedRequest(model, delta, prefix + delta, getattr(handle, "name", handle))
+
+    def _acquire(self, key, prefix, owner):
+        """Cached-content handle for this prefix, or None to send it inline."""
+        now = time.time()
+        refresh = False
+        with self._lock:
+            stale = self._expire(now)
+            if owner is not None:
+                stale += self._switch_owner(owner, key)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                refresh = entry["expires"] - now < self.ttl_seconds * REFRESH_MARGIN
+                if refresh:
+                    entry["expires"] = now + self.ttl_seconds
+            inline = entry is None and (estimate_prompt_tokens(prefix) < self.min_tokens
+                                        or now - self._failed.get(key, 0) < FAILURE_BACKOFF)
+            if inline:
+                self.stats["inline"] += 1
+        self._delete(stale)
+        if entry is not None:
+            if refresh:
+                try:
+                    self.backend.extend(entry["handle"], self.ttl_seconds)
+                except Exception:
+                    pass  # it is simply recreated after it expires
+            return entry["handle"]
+        if inline:
+            return None
+
+        try:
+            handle = self.backend.create(key[0], prefix, self.ttl_seconds)
+        except Exception:
+            with self._lock:
+                self._failed[key] = now
+                self.stats["inline"] += 1
+            return None
+        with self._lock:
+            self.stats["misses"] += 1
+            existing = self._entries.get(key)
+            if existing is not None:
+                # Another session created the same prefix meanwhile; keep theirs
+                stale = [handle]
+                handle = existing["handle"]
+            else:
+                self._entries[key] = {"handle": handle, "expires": now + self.ttl_seconds,
+                                      "models": {}}
+                stale = self._evict()
+        self._delete(stale)
+        return handle
+
+    def _model(self, key, handle, generation_config):
+        config_key = json.dumps(generation_config or {}, sort_keys=True, default=str)
+        with self._lock:
+            entry = self._entries.get(key)
+            model = entry["models"].get(config_key) if entry else None
+        if model is None:
+            model = self.backend.model_for(handle, generation_config)
+            with self._lock:
+                if entry is not None:
+                    entry["models"][config_key] = model
+        return model
+
+    def _switch_owner(self, owner, key):
+        """Record owner -> key; returns handles to delete if the owner's old entry is now unused."""
+        previous = self._owners.get(owner)
+        self._owners[owner] = key
+        if previous is None or previous == key:
+            return []
+        if previous in self._owners.values() or previous not in self._entries:
+            return []
+        self.stats["invalidated"] += 1
+        return [self._entries.pop(previous)["handle"]]
+
+    def _expire(self, now):
+        expired = [key for key, entry in self._entries.items() if entry["expires"] <= now]
+        self.stats["expired"] += len(expired)
+        return [self._entries.pop(key)["handle"] for key in expired]
+
+    def _evict(self):
+        stale = []
+        while len(self._entries) > self.max_entries:
+            _, entry = self._entries.popitem(last=False)
+            stale.append(entry["handle"])
+        return stale
+
+    def _delete(self, handles):
+        for handle in handles:
+            try:
+                self.backend.delete(handle)
+            except Exception:
+                pass  # server-side TTL cleans it up regardless
+
+    def release(self, owner):
+        """Forget an owner (e.g. a finished roster athlete); deletes their entry if unused."""
+        with self._lock:
+            key = self._owners.pop(owner, None)
+            stale = []
+            if key is not None and key not in self._owners.values() and key in self._entries:
+                stale.append(self._entries.pop(key)["handle"])
+        self._delete(stale)
+
+    def clear(self):
+        with self._lock:
+            stale = [entry["handle"] for entry in self._entries.values()]
+            self._entries.clear()
+            self._owners.clear()
+        self._delete(stale)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def make_backend(name=DEFAULT_BACKEND):
+    if name == "local":
+        return LocalContextBackend()
+    if name == "gemini":
+        return GeminiContextBackend()
+    raise ValueError(f"unknown context cache backend: {name!r}")
+
+
+def get_context_cache():
+    """Process-wide context cache (module globals survive Streamlit reruns)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            backend = make_backend()
+            min_tokens = 0 if isinstance(backend, LocalContextBackend) else DEFAULT_MIN_TOKENS
+            _default_cache = ContextCache(backend, min_tokens=min_tokens)
+        return _default_cache
@@ -0,0 +1,221 @@
+"""
+CoachBot AI - Local fake Gemini backend
+Drop-in stand-in for genai.GenerativeModel with configurable latency, token rate,
+finish reasons and error injection, for benchmarks and load tests without the API.
+"""
+
+import contextlib
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import google.generativeai as genai
+
+import gemini_client
+
+CHARS_PER_TOKEN = 4
+
+DEFAULT_RESPONSE = """## Your Plan
+
+Here is a structured plan built around your profile. Warm up properly and keep
+the intensity honest; quality beats volume at this stage.<br>
+
+| Day | Session | Sets | Reps | Duration |
+|-----|---------|------|------|----------|
+| Monday | Strength | 4 | 8 | 60 min |
+| Tuesday | Speed & Agility | 5 | 6 | 45 min |
+| Wednesday | Active Recovery | 1 | 1 | 30 min |
+| Thursday | Skill Work | 4 | 10 | 60 min |
+| Friday | Conditioning | 6 | 4 | 45 min |
+| Saturday | Match Simulation | 1 | 1 | 90 min |
+| Sunday | Rest | 0 | 0 | 0 min |
+
+<div>**Safety:** stop any exercise that causes sharp pain and tell your coach.</div>
+
+| Meal | Food | Calories |
+|------|------|----------|
+| Breakfast | Oats, banana, milk | 550 kcal |
+| Lunch | Rice, lentils, vegetables | 700 kcal |
+| Snack | Yoghurt, nuts | 300 kcal |
+| Dinner | Chicken or paneer, potatoes, salad | 750 kcal |
+"""
+
+
+def sample_for_schema(schema, rows=5):
+    """Plausible JSON for a response schema, for requests made in the structured (JSON) mode."""
+    kind = schema.get("type", "STRING").upper()
+    if kind == "OBJECT":
+        return {key: sample_for_schema(sub, rows) for key, sub in schema.get("properties", {}).items()}
+    if kind == "ARRAY":
+        return [sample_for_schema(schema.get("items", {}), rows) for _ in range(rows)]
+    if kind == "INTEGER":
+        return 10
+    if kind == "NUMBER":
+        return 2.5
+    return schema.get("description") or "Keep the intensity honest; quality beats volume at this stage."
+
+
+class FakeApiError(Exception):
+    """Carries an HTTP `code` like google.api_core exceptions, so retries treat it the same."""
+
+    def __init__(self, code, message):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FakeBackend:
+    """Shared behaviour of every fake model.
+
+    latency:           seconds before the first token (or the whole blocking response)
+    tokens_per_second: generation speed after the first token (0 = instant)
+    finish_reason:     "STOP", "MAX_TOKENS", "SAFETY", ... reported on the candidate
+    error_rate:        fraction of calls that raise error_code instead of answering
+    response:          text, or callable(prompt, model_name) -> text; requests with a
+                       response_schema get sample JSON instead of the default text
+    models:            per-model overrides of the above, e.g. a slow or failing primary:
+                       {"gemini-2.5-flash": {"latency": 20}, "gemini-2.5-flash-lite": {"error_rate": 1}}
+    """
+
+    def __init__(self, latency=0.0, tokens_per_second=0.0, finish_reason="STOP",
+                 error_rate=0.0, error_code=429, response=DEFAULT_RESPONSE,
+                 chunk_tokens=16, seed=None, models=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.finish_reason = finish_reason
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.response = response
+        self.chunk_tokens = chunk_tokens
+        self.models = models or {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "errors": 0, "streamed": 0, "count_tokens": 0, "cancelled": 0}
+        self.calls_by_model = {}
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def setting(self, model_name, name):
+        return self.models.get(model_name, {}).get(name, getattr(self, name))
+
+    def _should_fail(self, model_name):
+        error_rate = self.setting(model_name, "error_rate")
+        with self._lock:
+            return error_rate > 0 and self._random.random() < error_rate
+
+    def text_for(self, prompt, model_name):
+        return self.response(prompt, model_name) if callable(self.response) else self.response
+
+    def call(self, model, prompt, stream):
+        name = model.model_name
+        self._count("calls")
+        with self._lock:
+            self.calls_by_model[name] = self.calls_by_model.get(name, 0) + 1
+        latency = self.setting(name, "latency")
+        if self._should_fail(name):
+            self._count("errors")
+            time.sleep(latency)
+            raise FakeApiError(self.setting(name, "error_code"), "Injected failure from the fake backend.")
+        config = model.generation_config or {}
+        if config.get("response_schema") and self.response is DEFAULT_RESPONSE:
+            text = json.dumps(sample_for_schema(config["response_schema"]))
+        else:
+            text = self.text_for(str(prompt), name)
+        limit = config.get("max_output_tokens")
+        finish_reason = self.setting(name, "finish_reason")
+        if limit and len(text) // CHARS_PER_TOKEN > limit:
+            text, finish_reason = text[:limit * CHARS_PER_TOKEN], "MAX_TOKENS"
+        usage = SimpleNamespace(
+            prompt_token_count=len(str(prompt)) // CHARS_PER_TOKEN + 1,
+            candidates_token_count=len(text) // CHARS_PER_TOKEN + 1,
+            thoughts_token_count=0,
+        )
+        candidate = SimpleNamespace(finish_reason=finish_reason)
+        if stream:
+            self._count("streamed")
+            return FakeStreamResponse(self, name, text, candidate, usage)
+        time.sleep(latency + self._generation_seconds(text, name))
+        return FakeResponse(text, candidate, usage)
+
+    def _generation_seconds(self, text, model_name=None):
+        tokens_per_second = self.setting(model_name, "tokens_per_second")
+        if not tokens_per_second:
+            return 0.0
+        return len(text) / CHARS_PER_TOKEN / tokens_per_second
+
+
+class FakeResponse:
+    def __init__(self, text, candidate, usage):
+        self.text = text
+        self.candidates = [candidate]
+        self.usage_metadata = usage
+
+
+class FakeStreamResponse:
+    """Iterates text chunks at the backend's token rate; candidates/usage resolve at the end."""
+
+    def __init__(self, backend, model_name, text, candidate, usage):
+        self._backend = backend
+        self._model_name = model_name
+        self._iterator = self       # where the SDK keeps the cancellable gRPC call
+        self._text = text
+        self._candidate = candidate
+        self._usage = usage
+        self.candidates = []
+        self.usage_metadata = None
+
+    def __iter__(self):
+        backend, name = self._backend, self._model_name
+        time.sleep(backend.setting(name, "latency"))
+        step = max(1, backend.chunk_tokens) * CHARS_PER_TOKEN
+        for start in range(0, len(self._text), step):
+            piece = self._text[start:start + step]
+            time.sleep(backend._generation_seconds(piece, name))
+            yield SimpleNamespace(text=piece)
+        self.candidates = [self._candidate]
+        self.usage_metadata = self._usage
+
+    def cancel(self):
+        self._backend._count("cancelled")
+
+    @property
+    def text(self):
+        return self._text
+
+
+class FakeGenerativeModel:
+    """Same constructor and call surface CoachBot uses from genai.GenerativeModel."""
+
+    backend = FakeBackend()
+
+    def __init__(self, model_name="gemini-2.5-flash", generation_config=None, safety_settings=None,
+                 **kwargs):
+        self.model_name = model_name
+        self.generation_config = dict(generation_config or {})
+        self.safety_settings = safety_settings
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        return self.backend.call(self, contents, stream)
+
+    def count_tokens(self, contents, **kwargs):
+        self.backend._count("count_tokens")
+        return SimpleNamespace(total_tokens=len(str(contents)) // CHARS_PER_TOKEN + 1)
+
+
+@contextlib.contextmanager
+def install(backend=None):
+    """Route every model CoachBot builds to the fake backend for the duration of the block."""
+    backend = backend or FakeBackend()
+    original_model, original_configure = genai.GenerativeModel, genai.configure
+    model_class = type("FakeGenerativeModel", (FakeGenerativeModel,), {"backend": backend})
+    genai.GenerativeModel = model_class
+    genai.configure = lambda **kwargs: None
+    gemini_client._models.clear()
+    try:
+        yield backend
+    finally:
+        genai.GenerativeModel, genai.configure = original_model, original_configure
+        gemini_client._models.clear()
@@ -0,0 +1,318 @@
+"""
+CoachBot AI - Gemini client registry
+Builds GenerativeModel clients once per config and keeps the SDK transport warm.
+The SDK itself (grpc, protobuf, google-api-core) is only imported when first needed.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from model_router import MODEL_ROUTE, get_model_router
+from rate_limiter import RateLimitExceeded, call_with_retries, get_rate_limiter
+from telemetry import finish_reason_label, model_label, start_request
+
+DEFAULT_MODEL = MODEL_ROUTE[0]      # COACHBOT_MODEL_ROUTE, see model_router.py
+MAX_CACHED_MODELS = 64
+
+
+def _genai():
+    """google.generativeai, imported on first use rather than at app start."""
+    import google.generativeai as genai
+    return genai
+
+
+@lru_cache(maxsize=None)
+def default_safety_settings():
+    from google.generativeai.types import HarmBlockThreshold, HarmCategory
+    return {
+        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
+        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
+    }
+
+
+def plan_generation_config(temperature, max_output_tokens=8192):
+    """Generation config used for the 10 Smart Assistant features."""
+    return {
+        "temperature": temperature,
+        "top_p": 0.95,
+        "top_k": 40,
+        "max_output_tokens": max_output_tokens,
+        "candidate_count": 1,
+    }
+
+
+def structured_generation_config(temperature, response_schema, max_output_tokens=8192):
+    """plan_generation_config for the JSON mode: output constrained to the feature's schema."""
+    return dict(plan_generation_config(temperature, max_output_tokens),
+                response_mime_type="application/json", response_schema=response_schema)
+
+
+def custom_generation_config(temperature, max_output_tokens=8192):
+    """Generation config used for Custom Coach questions."""
+    return {
+        "temperature": temperature,
+        "max_output_tokens": max_output_tokens,
+        "candidate_count": 1,
+    }
+
+
+_lock = threading.Lock()
+_models = OrderedDict()        # (model, config, safety) -> GenerativeModel
+_configured_key = None         # fingerprint of the API key the SDK is configured with
+_pending_key = None            # that key, until genai.configure() has actually run
+
+
+def configure_api_key(api_key):
+    """Configure the SDK once per key.
+
+    genai.configure() throws away the SDK's pooled gRPC clients, so calling it on
+    every rerun meant a fresh channel (and TLS handshake) for every request. The
+    call itself is deferred to the first get_model(); the warm-up thread usually
+    gets there (SDK import included) before the user asks for anything.
+    """
+    global _configured_key, _pending_key
+    fingerprint = hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+    with _lock:
+        if fingerprint == _configured_key:
+            return
+        _configured_key = fingerprint
+        _pending_key = api_key
+        _models.clear()
+    threading.Thread(target=_warm_up, daemon=True).start()
+
+
+def _registry_key(model_name, generation_config, safety_settings):
+    return (
+        model_name,
+        json.dumps(generation_config or {}, sort_keys=True, default=str),
+        tuple(sorted((int(k), int(v)) for k, v in safety_settings.items())),
+    )
+
+
+def get_model(model_name=DEFAULT_MODEL, generation_config=None, safety_settings=None):
+    """Return the shared GenerativeModel for this (model, config, safety settings)."""
+    global _pending_key
+    if safety_settings is None:
+        safety_settings = default_safety_settings()
+    key = _registry_key(model_name, generation_config, safety_settings)
+    with _lock:
+        genai = _genai()
+        if _pending_key is not None:
+            genai.configure(api_key=_pending_key)
+            _pending_key = None
+        model = _models.get(key)
+        if model is None:
+            model = genai.GenerativeModel(
+                model_name=model_name,
+                generation_config=dict(generation_config or {}),
+                safety_settings=safety_settings,
+            )
+            _models[key] = model
+            while len(_models) > MAX_CACHED_MODELS:
+                _models.popitem(last=False)
+        else:
+            _models.move_to_end(key)
+        return model
+
+
+def sibling_model(model, model_name):
+    """The registry model for `model_name` with the same config as `model`, or None.
+
+    Models made elsewhere (e.g. on cached content) have no sibling: another model
+    cannot read their cached prefix.
+    """
+    with _lock:
+        key = next((k for k, m in _models.items() if m is model), None)
+    if key is None:
+        return None
+    _, config, safety = key
+    return get_model(model_name, json.loads(config), dict(safety))
+
+
+# ─────────────────────────────────────────────
+# RESPONSE HELPERS
+# ─────────────────────────────────────────────
+HTML_CLEANUP = (("<br>", "\n"), ("</br>", ""), ("<div>", ""), ("</div>", ""))
+
+
+def clean_html(text):
+    """Strip the stray HTML tags the model likes to add."""
+    for tag, replacement in HTML_CLEANUP:
+        text = text.replace(tag, replacement)
+    return text
+
+
+class StreamingHtmlCleaner:
+    """Apply clean_html chunk by chunk, holding back a tag split across two chunks."""
+
+    def __init__(self):
+        self._pending = ""
+
+    def feed(self, chunk):
+        text = self._pending + chunk
+        self._pending = ""
+        cut = text.rfind("<")
+        if cut != -1 and any(tag.startswith(text[cut:]) and tag != text[cut:]
+                             for tag, _ in HTML_CLEANUP):
+            text, self._pending = text[:cut], text[cut:]
+        return clean_html(text)
+
+    def flush(self):
+        text, self._pending = self._pending, ""
+        return text
+
+
+def is_truncated(candidate):
+    finish_reason = str(getattr(candidate, "finish_reason", ""))
+    return "MAX_TOKENS" in finish_reason or "LENGTH" in finish_reason
+
+
+def describe_error(e):
+    if isinstance(e, RateLimitExceeded):
+        return "⚠️ CoachBot is busy right now. Please try again in a moment."
+    err = str(e)
+    if "quota" in err.lower():
+        return "⚠️ API quota exceeded. Please wait and try again."
+    if "api key" in err.lower():
+        return "⚠️ Invalid API key. Please check your configuration."
+    return f"⚠️ Error: {err}"
+
+
+def usage_from_response(response, truncated=False):
+    """Token counts from response.usage_metadata (thinking tokens count against the budget)."""
+    meta = getattr(response, "usage_metadata", None)
+    return {
+        "prompt_tokens":   getattr(meta, "prompt_token_count", 0) or 0,
+        "output_tokens":   getattr(meta, "candidates_token_count", 0) or 0,
+        "thoughts_tokens": getattr(meta, "thoughts_token_count", 0) or 0,
+        "cached_tokens":   getattr(meta, "cached_content_token_count", 0) or 0,
+        "truncated":       truncated,
+    }
+
+
+def is_error_response(text):
+    return not text or text.startswith("⚠️")
+
+
+def estimate_prompt_tokens(prompt):
+    """Cheap local estimate (~4 characters per token) for the TPM bucket."""
+    return len(prompt) // 4 + 1
+
+
+def request_content(model, prompt, stream=False, on_queued=None, span=None, on_send=None):
+    """Every generate_content call goes through here: process-wide rate limit + retry/backoff.
+
+    span (telemetry.RequestSpan), if given, accumulates the time spent queued.
+    """
+    return call_with_retries(
+        lambda: model.generate_content(prompt, stream=stream),
+        get_rate_limiter(), estimate_prompt_tokens(prompt), on_queued,
+        on_wait=span.add_queue_wait if span is not None else None, on_send=on_send,
+    )
+
+
+def _cancel_stream(response):
+    """Best effort: stop the gRPC stream behind an abandoned streaming response."""
+    cancel = getattr(getattr(response, "_iterator", None), "cancel", None)
+    if cancel is not None:
+        try:
+            cancel()
+        except Exception:
+            pass
+
+
+def routed_request(model, prompt, stream=False, on_text=None, on_queued=None, feature=None):
+    """request_content() on `model`, hedged to / failed over to the route's other models.
+
+    Streamed responses are read to the end here; on_text(text) gets the winning
+    model's raw chunk texts as they arrive. Returns the winner's response, whose
+    candidates and usage_metadata are complete. Each attempt gets its own telemetry
+    span; the losing one is recorded as CANCELLED.
+    """
+    router = get_model_router()
+    models = {model_label(model): model}
+    for name in router.fallbacks(model_label(model)):
+        sibling = sibling_model(model, name)
+        if sibling is not None:
+            models[name] = sibling
+
+    def call(attempt):
+        attempt_model = models[attempt.model_name]
+        span = start_request(feature, attempt_model)
+        try:
+            response = request_content(attempt_model, prompt, stream=stream, on_queued=on_queued,
+                                       span=span, on_send=attempt.sent)
+            if stream:
+                for chunk in response:
+                    if attempt.cancelled.is_set():
+                        break
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        # Chunk carries no text parts (e.g. final safety/finish metadata)
+                        continue
+                    span.first_token()
+                    attempt.chunk(text)
+            if attempt.cancelled.is_set():
+                if stream:
+                    _cancel_stream(response)
+                span.cancel()
+                return None
+            if not response or not response.candidates:
+                span.finish("NO_CANDIDATES", usage_from_response(response))
+            else:
+                candidate = response.candidates[0]
+                span.finish(finish_reason_label(candidate),
+                            usage_from_response(response, is_truncated(candidate)))
+            return response
+        except Exception:
+            if attempt.cancelled.is_set():
+                span.cancel()
+            else:
+                span.fail()
+            raise
+
+    _, response = router.execute(list(models), call, stream=stream, on_text=on_text)
+    return response
+
+
+def generate_text(model, prompt, on_usage=None, on_queued=None, feature=None):
+    """Blocking call; returns (cleaned text, truncated). Safe to run off the Streamlit thread.
+
+    on_usage, if given, is called with usage_from_response() for every answered call;
+    on_queued(seconds) is called if the rate limiter makes the request wait. Timings,
+    tokens and the finish reason are recorded in telemetry under `feature`.
+    """
+    try:
+        response = routed_request(model, prompt, on_queued=on_queued, feature=feature)
+
+        # Check if response was generated
+        if not response or not response.candidates:
+            return "⚠️ No response generated. Please try again.", False
+
+        # Check finish reason on the first candidate
+        truncated = is_truncated(response.candidates[0])
+        usage = usage_from_response(response, truncated)
+        if on_usage is not None:
+            on_usage(usage)
+
+        # Extract text
+        if not response.text:
+            return "⚠️ Response was blocked or empty. Please try again.", truncated
+
+        return clean_html(response.text), truncated
+    except Exception as e:
+        return describe_error(e), False
+
+
+def _warm_up():
+    """Open the generative-service channel before the first real request needs it."""
+    try:
+        get_model().count_tokens("ping")
+    except Exception:
+        pass  # warm-up is best effort; the real call reports errors
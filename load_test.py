@@ -0,0 +1,578 @@
+"""
+CoachBot AI - Concurrent-session load test
+Starts app.py on a real Streamlit server backed by the local fake Gemini model, then
+drives N simulated browser sessions over Streamlit's WebSocket protocol through the
+usual journey: open the app, edit the sidebar profile, generate a plan, download it,
+ask the Custom Coach and download the answer. Each N runs on a fresh server process.
+
+    python load_test.py --sessions 1,10,25,50 --duration 60
+    python load_test.py --sessions 20 --fresh --rpm 0 --json load.json
+
+Reported per N: reruns per second, plans and answers per minute, latency
+percentiles per step, the server's event-loop lag, thread and model-call
+saturation, CPU and resident memory per session. "client lag" is the harness's
+own event-loop lag; when it grows, the harness (not the app) is the bottleneck.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+SAMPLE_SECONDS = 0.25        # server stats / event-loop lag sampling interval
+SERVER_START_TIMEOUT = 60
+# Steps that only rerun the script (no model call): what "rerun latency" means below
+RERUN_STEPS = ("open", "profile")
+STEPS = ("open", "profile", "generate", "coach", "download")
+SCRIPT_RUNNER_THREAD = "ScriptRunner.scriptThread"
+QUESTIONS = (
+    "What are 3 best drills for explosive speed?",
+    "How should I structure my training week around two matches?",
+    "What should I eat before a morning match?",
+    "How do I recover faster between sessions?",
+    "How can I improve my endurance in the second half?",
+    "What warm-up prevents hamstring injuries?",
+)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile (as in benchmark.py)."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+async def loop_lag(samples, interval=SAMPLE_SECONDS):
+    """Append how late each wake-up of the running event loop was, in seconds."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - started - interval))
+
+
+# ─────────────────────────────────────────────
+# SERVER (fake backend + stats sampler)
+# ─────────────────────────────────────────────
+async def sample_server(path, backend):
+    """One JSON line per interval: loop lag, threads, model calls in flight, CPU, RSS."""
+    from plan_exports import get_export_pipeline
+    from rate_limiter import get_rate_limiter
+    from request_coalescer import get_request_coalescer
+
+    lags = []
+    asyncio.get_running_loop().create_task(loop_lag(lags))
+    with open(path, "a", encoding="utf-8") as out:
+        while True:
+            await asyncio.sleep(SAMPLE_SECONDS)
+            threads = threading.enumerate()
+            out.write(json.dumps({
+                "t":              time.time(),
+                "cpu":            time.process_time(),
+                "rss":            rss_bytes(),
+                "loop_lag":       max(lags) if lags else 0.0,
+                "threads":        len(threads),
+                "script_threads": sum(t.name == SCRIPT_RUNNER_THREAD for t in threads),
+                "in_flight":      get_request_coalescer().in_flight,
+                "queued":         get_rate_limiter().queued,
+                "exports":        get_export_pipeline().pending,
+                "model_calls":    backend.stats["calls"],
+            }) + "\n")
+            out.flush()
+            lags.clear()
+
+
+def serve(args):
+    """Run app.py on this process's event loop with every model call going to the fake backend."""
+    from streamlit.web import bootstrap
+
+    from fake_gemini import FakeBackend, install
+
+    backend = FakeBackend(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                          error_rate=args.error_rate, seed=args.seed)
+    flag_options = {
+        "server_port":              args.port,
+        "server_address":           "127.0.0.1",
+        "server_headless":          True,
+        "server_fileWatcherType":   "none",
+        "browser_gatherUsageStats": False,
+        "logger_level":             "error",
+        "secrets_files":            [args.secrets],
+    }
+    bootstrap.load_config_options(flag_options)
+
+    async def main():
+        with install(backend):
+            # Inside a running loop, bootstrap.run() starts the server as a task on it,
+            # so the sampler measures the same loop that serves every WebSocket
+            bootstrap.run(APP_PATH, False, [], flag_options)
+            await sample_server(args.stats_file, backend)
+
+    asyncio.run(main())
+
+
+def start_server(args, scratch):
+    """A fresh server process on its own scratch caches; returns (process, base URL, stats file)."""
+    port = free_port()
+    secrets = os.path.join(scratch, "secrets.toml")
+    with open(secrets, "w", encoding="utf-8") as f:
+        f.write('GEMINI_API_KEY = "fake-load-test-key"\n')
+    stats_file = os.path.join(scratch, "server_stats.jsonl")
+    env = dict(os.environ,
+               COACHBOT_CACHE_DB=os.path.join(scratch, "cache.sqlite3"),
+               COACHBOT_QUESTION_INDEX=os.path.join(scratch, "questions.npz"),
+               COACHBOT_PLAN_LIBRARY=os.path.join(scratch, "library.sqlite3"),
+               COACHBOT_TRAINING_LOG=os.path.join(scratch, "training_log"),
+               COACHBOT_METRICS_FILE="")
+    if args.rpm is not None:
+        env["COACHBOT_RPM"] = str(args.rpm)
+    if args.tpm is not None:
+        env["COACHBOT_TPM"] = str(args.tpm)
+    command = [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+               "--secrets", secrets, "--stats-file", stats_file, "--latency", str(args.latency),
+               "--tokens-per-second", str(args.tokens_per_second),
+               "--error-rate", str(args.error_rate), "--seed", str(args.seed)]
+    log_path = os.path.join(scratch, "server.log")
+    with open(log_path, "wb") as log:
+        process = subprocess.Popen(command, env=env, cwd=os.path.dirname(APP_PATH),
+                                   stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            with open(log_path, encoding="utf-8", errors="replace") as log:
+                raise RuntimeError(f"server exited:\n{log.read()[-4000:]}")
+        try:
+            with urllib.request.urlopen(f"{base_url}/_stcore/health", timeout=2) as response:
+                if response.status == 200:
+                    return process, base_url, stats_file
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server did not start within {SERVER_START_TIMEOUT}s")
+
+
+def read_server_stats(path, since, until):
+    with open(path, encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    return [s for s in samples if since <= s["t"] <= until]
+
+
+# ─────────────────────────────────────────────
+# SIMULATED SESSION
+# ─────────────────────────────────────────────
+class SimulatedSession:
+    """One browser tab: a WebSocket, the elements of the last run and the widget values sent.
+
+    Like the frontend, every rerun sends the values of all widgets touched so far,
+    and fragments with run_every are rerun on their interval while the tab is idle.
+    """
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.elements = {}              # delta path -> Element of the current run
+        self.widget_states = {}         # widget id -> WidgetState
+        self.finished = asyncio.Queue()
+        self.errors = []
+        self.fragment_runs = 0
+        self._idle = asyncio.Event()    # the server is not running a script for this session
+        self._idle.set()
+        self._running = False
+        self._auto_reruns = {}
+        self._ws = None
+        self._reader = None
+
+    async def connect(self):
+        import websockets
+        url = self.base_url.replace("http", "ws", 1) + "/_stcore/stream"
+        self._ws = await websockets.connect(url, subprotocols=["streamlit"], max_size=None)
+        self._reader = asyncio.get_running_loop().create_task(self._read())
+
+    async def close(self):
+        for task in list(self._auto_reruns.values()) + [self._reader]:
+            if task is not None:
+                task.cancel()
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _read(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        statuses = ForwardMsg.ScriptFinishedStatus
+        try:
+            async for data in self._ws:
+                msg = ForwardMsg()
+                msg.ParseFromString(data)
+                kind = msg.WhichOneof("type")
+                if kind == "new_session" and not msg.new_session.fragment_ids_this_run:
+                    self.elements = {}
+                    for task in self._auto_reruns.values():
+                        task.cancel()
+                    self._auto_reruns = {}
+                elif kind == "delta" and msg.delta.WhichOneof("type") == "new_element":
+                    element = msg.delta.new_element
+                    self.elements[tuple(msg.metadata.delta_path)] = element
+                    if element.WhichOneof("type") == "exception":
+                        self.errors.append(element.exception.message)
+                elif kind == "session_status_changed":
+                    if msg.session_status_changed.script_is_running:
+                        self._idle.clear()
+                    else:
+                        self._idle.set()
+                elif kind == "auto_rerun":
+                    fragment_id = msg.auto_rerun.fragment_id
+                    if fragment_id in self._auto_reruns:
+                        self._auto_reruns[fragment_id].cancel()
+                    self._auto_reruns[fragment_id] = asyncio.get_running_loop().create_task(
+                        self._auto_rerun(fragment_id, msg.auto_rerun.interval))
+                elif kind == "script_finished":
+                    if msg.script_finished == statuses.FINISHED_FRAGMENT_RUN_SUCCESSFULLY:
+                        self.fragment_runs += 1
+                    elif msg.script_finished != statuses.FINISHED_EARLY_FOR_RERUN:
+                        self.finished.put_nowait(msg.script_finished)
+        except Exception as e:
+            self.errors.append(f"connection: {e}")
+            self.finished.put_nowait(None)
+            self._idle.set()
+
+    async def _auto_rerun(self, fragment_id, interval):
+        while True:
+            await asyncio.sleep(interval)
+            if not self._running:
+                await self._send(fragment_id=fragment_id, is_auto_rerun=True)
+
+    async def _send(self, triggers=(), **client_state):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = ""
+        for key, value in client_state.items():
+            setattr(msg.rerun_script, key, value)
+        states = msg.rerun_script.widget_states.widgets
+        states.extend(self.widget_states.values())
+        for widget_id in triggers:
+            states.add(id=widget_id, trigger_value=True)
+        await self._ws.send(msg.SerializeToString())
+
+    async def idle(self):
+        """Wait for a run the server started on its own (e.g. a fragment's st.rerun()) to finish."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            self.errors.append(f"script still running after {self.timeout:.0f}s")
+
+    # ── Widgets ───────────────────────────
+    def find(self, kind, label, prefix=False):
+        """The current run's widget of this type and label (or label prefix)."""
+        for element in self.elements.values():
+            if element.WhichOneof("type") == kind:
+                widget = getattr(element, kind)
+                if widget.label == label or (prefix and widget.label.startswith(label)):
+                    return widget
+        raise LookupError(f"no {kind} labelled {label!r} on the page")
+
+    def set(self, kind, label, value, prefix=False):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        widget = self.find(kind, label, prefix)
+        state = WidgetState(id=widget.id)
+        if kind == "checkbox":
+            state.bool_value = value
+        elif kind == "selectbox" and "raw_value" not in widget.DESCRIPTOR.fields_by_name:
+            state.int_value = list(widget.options).index(value)     # Streamlit before 1.45
+        else:
+            state.string_value = value
+        self.widget_states[widget.id] = state
+
+    def download_urls(self):
+        return [element.download_button.url for element in self.elements.values()
+                if element.WhichOneof("type") == "download_button" and element.download_button.url]
+
+    # ── Actions ───────────────────────────
+    async def rerun(self, click=None):
+        """Rerun the script (clicking the button labelled `click`); returns (seconds, ok)."""
+        triggers = [self.find("button", click).id] if click else []
+        while not self.finished.empty():
+            self.finished.get_nowait()
+        errors = len(self.errors)
+        self._running = True
+        started = time.perf_counter()
+        try:
+            await self._send(triggers)
+            status = await asyncio.wait_for(self.finished.get(), self.timeout)
+        except asyncio.TimeoutError:
+            self.errors.append(f"rerun timed out after {self.timeout:.0f}s")
+            status = None
+        finally:
+            self._running = False
+        return time.perf_counter() - started, status is not None and len(self.errors) == errors
+
+    def preparing(self):
+        return any(element.WhichOneof("type") == "button" and element.button.label.startswith("⏳")
+                   for element in self.elements.values())
+
+    async def download(self):
+        """Wait for "Preparing..." exports, then fetch every download button's file as the
+        browser would; returns (seconds, ok)."""
+        started, ok = time.perf_counter(), True
+        while self.preparing() and time.perf_counter() - started < self.timeout:
+            await asyncio.sleep(0.1)
+        await self.idle()
+        for url in self.download_urls():
+            try:
+                await asyncio.to_thread(lambda: urllib.request.urlopen(self.base_url + url,
+                                                                       timeout=self.timeout).read())
+            except OSError as e:
+                self.errors.append(f"download {url}: {e}")
+                ok = False
+        return time.perf_counter() - started, ok
+
+
+async def run_session(index, base_url, args, deadline, results, sessions, journeys=None):
+    """Journeys until the deadline (or `journeys` of them): open, profile edit, plan, download,
+    coach question, download."""
+    from prompts import feature_options, position_options
+
+    rng = random.Random(args.seed * 100003 + index)
+    session = SimulatedSession(base_url, args.timeout)
+    sessions.append(session)
+
+    async def step(name, action):
+        try:
+            seconds, ok = await action
+        except LookupError as e:         # the page did not show what the journey expected
+            session.errors.append(str(e))
+            seconds, ok = 0.0, False
+        results.append((name, seconds, ok))
+
+    async def think():
+        await asyncio.sleep(args.think * rng.uniform(0.5, 1.5))
+        await session.idle()
+
+    try:
+        await session.connect()
+    except OSError as e:
+        session.errors.append(f"connect: {e}")
+        results.append(("open", 0.0, False))
+        return
+    await step("open", session.rerun())
+    done = 0
+    while time.monotonic() < deadline and (journeys is None or done < journeys):
+        done += 1
+        await think()
+        session.set("text_input", "Name", f"Load Test Athlete {index}")
+        session.set("selectbox", "Select Your Sport", rng.choice(list(position_options)))
+        await step("profile", session.rerun())
+        await think()
+        try:
+            session.set("selectbox", "Select a Feature", rng.choice(feature_options))
+            if args.fresh:
+                session.set("checkbox", "Reuse Cached Plans", False)
+                session.set("checkbox", "Serve Ready-Made Plans", False)
+        except LookupError as e:
+            session.errors.append(str(e))
+        await step("generate", session.rerun(click="🚀 Generate Personalized Plan"))
+        await think()
+        await step("download", session.download())
+        await think()
+        try:
+            session.set("text_area", "Ask", rng.choice(QUESTIONS), prefix=True)
+        except LookupError as e:
+            session.errors.append(str(e))
+        await step("coach", session.rerun(click="🎯 Ask AI Coach"))
+        await think()
+        await step("download", session.download())
+
+
+# ─────────────────────────────────────────────
+# STAGES
+# ─────────────────────────────────────────────
+async def drive(base_url, args, n):
+    """N sessions (started over the ramp-up) until the duration is up; returns raw results."""
+    results, sessions, client_lags = [], [], []
+    lag_task = asyncio.get_running_loop().create_task(loop_lag(client_lags))
+    started = time.time()
+    deadline = time.monotonic() + args.ramp + args.duration
+    tasks = []
+    for index in range(n):
+        tasks.append(asyncio.get_running_loop().create_task(
+            run_session(index, base_url, args, deadline, results, sessions)))
+        await asyncio.sleep(args.ramp / n)
+    await asyncio.gather(*tasks)
+    # All sessions still connected: the server's memory now holds every one of them
+    await asyncio.sleep(2 * SAMPLE_SECONDS)
+    ended = time.time()
+    lag_task.cancel()
+    for session in sessions:
+        await session.close()
+    return results, sessions, client_lags, started, ended
+
+
+def stage_report(n, results, sessions, client_lags, server, baseline, seconds):
+    """Summary of one stage; latencies in ms, memory in MB."""
+    def stats(samples):
+        if not samples:
+            return None
+        return {"n": len(samples), "p50": round(percentile(samples, 50) * 1e3, 1),
+                "p95": round(percentile(samples, 95) * 1e3, 1),
+                "p99": round(percentile(samples, 99) * 1e3, 1)}
+
+    ok = [(name, s) for name, s, good in results if good]
+    steps = {name: stats([s for step, s in ok if step == name]) for name in STEPS}
+    steps["rerun"] = stats([s for step, s in ok if step in RERUN_STEPS])
+    reruns = sum(1 for name, _, _ in results if name != "download")
+    cpu = ((server[-1]["cpu"] - server[0]["cpu"]) / (server[-1]["t"] - server[0]["t"]) * 100
+           if len(server) > 1 else None)
+    rss = server[-1]["rss"] if server else None
+    return {
+        "sessions":            n,
+        "seconds":             round(seconds, 1),
+        "reruns_per_second":   round(reruns / seconds, 2),
+        "plans_per_minute":    round(sum(1 for name, _ in ok if name == "generate") / seconds * 60, 1),
+        "answers_per_minute":  round(sum(1 for name, _ in ok if name == "coach") / seconds * 60, 1),
+        "failed_steps":        sum(1 for _, _, good in results if not good),
+        "errors":              sorted({e for session in sessions for e in session.errors})[:10],
+        "fragment_runs":       sum(session.fragment_runs for session in sessions),
+        "latency_ms":          steps,
+        "loop_lag_ms_p95":     round(percentile([s["loop_lag"] for s in server], 95) * 1e3, 1) if server else None,
+        "loop_lag_ms_max":     round(max(s["loop_lag"] for s in server) * 1e3, 1) if server else None,
+        "client_lag_ms_p95":   round(percentile(client_lags, 95) * 1e3, 1) if client_lags else None,
+        "threads_max":         max((s["threads"] for s in server), default=None),
+        "script_threads_max":  max((s["script_threads"] for s in server), default=None),
+        "in_flight_max":       max((s["in_flight"] for s in server), default=None),
+        "queued_max":          max((s["queued"] for s in server), default=None),
+        "exports_pending_max": max((s["exports"] for s in server), default=None),
+        "model_calls":         server[-1]["model_calls"] - server[0]["model_calls"] if server else None,
+        "cpu_percent":         round(cpu, 1) if cpu is not None else None,
+        "rss_mb":              round(rss / 1e6, 1) if rss else None,
+        "mb_per_session":      round((rss - baseline) / 1e6 / n, 2) if rss and baseline else None,
+    }
+
+
+def run_stage(args, n):
+    scratch = tempfile.mkdtemp(prefix="coachbot_load_")
+    process, base_url, stats_file = start_server(args, scratch)
+    try:
+        # One untimed journey first: imports, first-run caches and the fake model warm up
+        warm_args = argparse.Namespace(**dict(vars(args), think=0))
+        asyncio.run(warm_up(base_url, warm_args))
+        time.sleep(2 * SAMPLE_SECONDS)
+        with open(stats_file, encoding="utf-8") as f:
+            baseline = json.loads(f.readlines()[-1])["rss"]
+        results, sessions, client_lags, started, ended = asyncio.run(drive(base_url, args, n))
+        server = read_server_stats(stats_file, started, ended)
+        return stage_report(n, results, sessions, client_lags, server, baseline, ended - started)
+    finally:
+        process.kill()
+        process.wait()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+async def warm_up(base_url, args):
+    results, sessions = [], []
+    await run_session(0, base_url, args, float("inf"), results, sessions, journeys=1)
+    for session in sessions:
+        await session.close()
+
+
+def print_report(reports):
+    def p(report, step, stat):
+        value = (report["latency_ms"].get(step) or {}).get(stat)
+        return f"{value:9.0f}" if value is not None else f"{'-':>9}"
+
+    print(f"{'sessions':>8} {'rerun/s':>8} {'plans/m':>8} {'rerun p50':>9} {'rerun p95':>9} "
+          f"{'rerun p99':>9} {'plan p95':>9} {'coach p95':>9} {'dl p95':>9} {'loop lag':>9} "
+          f"{'client':>7} {'scripts':>7} {'models':>6} {'queued':>6} {'cpu %':>6} {'MB':>7} "
+          f"{'MB/sess':>7} {'failed':>6}")
+    for r in reports:
+        print(f"{r['sessions']:8d} {r['reruns_per_second']:8.2f} {r['plans_per_minute']:8.1f} "
+              f"{p(r, 'rerun', 'p50')} {p(r, 'rerun', 'p95')} {p(r, 'rerun', 'p99')} "
+              f"{p(r, 'generate', 'p95')} {p(r, 'coach', 'p95')} {p(r, 'download', 'p95')} "
+              f"{r['loop_lag_ms_p95'] or 0:9.1f} {r['client_lag_ms_p95'] or 0:7.1f} "
+              f"{r['script_threads_max'] or 0:7d} {r['in_flight_max'] or 0:6d} {r['queued_max'] or 0:6d} "
+              f"{r['cpu_percent'] or 0:6.1f} {r['rss_mb'] or 0:7.1f} {r['mb_per_session'] or 0:7.2f} "
+              f"{r['failed_steps']:6d}")
+    print("Latencies in ms (p95 unless noted); loop lag = server event loop p95; scripts = "
+          "concurrent script runs; models = model calls in flight; queued = waiting on the rate limiter.")
+    for r in reports:
+        for error in r["errors"]:
+            print(f"[{r['sessions']} sessions] {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test CoachBot with concurrent simulated sessions.")
+    parser.add_argument("--sessions", default="1,5,10,25",
+                        help="Comma-separated session counts, one stage (and fresh server) each")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per stage after ramp-up")
+    parser.add_argument("--ramp", type=float, default=5, help="Seconds over which sessions connect")
+    parser.add_argument("--think", type=float, default=1.0, help="Mean pause between a user's actions (s)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Turn off cached and ready-made plans, so every plan calls the model")
+    parser.add_argument("--timeout", type=float, default=120, help="Give up on a rerun after this long (s)")
+    parser.add_argument("--latency", type=float, default=1.0, help="Fake time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=150,
+                        help="Fake generation speed (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake calls that fail")
+    parser.add_argument("--rpm", type=float, help="Rate limit for the server (default: COACHBOT_RPM)")
+    parser.add_argument("--tpm", type=float, help="Token rate limit for the server (default: COACHBOT_TPM)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the reports to this JSON file")
+    # Internal: the server process started for each stage
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--secrets", help=argparse.SUPPRESS)
+    parser.add_argument("--stats-file", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args)
+        return 0
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        parser.error("the load test needs the 'websockets' package (installed with recent Streamlit)")
+    counts = [int(part) for part in args.sessions.split(",") if part.strip()]
+    if not counts or min(counts) < 1:
+        parser.error("--sessions needs one or more positive counts")
+
+    reports = []
+    for n in counts:
+        print(f"running {n} session(s) for {args.ramp + args.duration:.0f}s...", file=sys.stderr)
+        reports.append(run_stage(args, n))
+    print_report(reports)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": {k: v for k, v in vars(args).items()
+                                    if k not in ("serve", "port", "secrets", "stats_file", "json")},
+                       "reports": reports}, f, indent=2)
+    return 1 if any(r["failed_steps"] for r in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+CoachBot AI - Markdown table extraction
+Splits a response into prose and pipe tables (incrementally, so it works while
+streaming) and turns each table into a typed DataFrame for rendering and export.
+"""
+
+import io
+import re
+import zipfile
+
+_SEPARATOR = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+_NUMBER = re.compile(r"^\s*([-+]?\d[\d,]*(?:\.\d+)?)\s*([a-zA-Z%]*)\s*$")
+_THOUSANDS = re.compile(r"^[-+]?\d{1,3}(?:,\d{3})+(?:\.\d+)?$")      # 2,350 / 12,500.5
+_DECIMAL_COMMA = re.compile(r"^[-+]?\d+,(?:\d{1,2}|\d{4,})$")        # 1,5 / 0,75
+
+# Units the prompts ask for; a column is numeric only if every value shares one unit
+_UNITS = {"", "g", "kg", "kcal", "cal", "ml", "l", "min", "mins", "s", "sec", "%", "x", "m", "km"}
+
+
+def _split_row(line):
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    cells = re.split(r"(?<!\\)\|", line)
+    return [cell.strip().replace("\\|", "|") for cell in cells]
+
+
+def _is_row(line):
+    return "|" in line and line.strip() != ""
+
+
+def _parse_number(text):
+    """(value, comma style) of a number: "," groups thousands only as d,ddd; a decimal
+    comma is never followed by exactly three digits. (None, None) if it is ambiguous."""
+    if "," not in text:
+        return float(text), None
+    if _THOUSANDS.match(text):
+        return float(text.replace(",", "")), "thousands"
+    if _DECIMAL_COMMA.match(text):
+        return float(text.replace(",", ".")), "decimal"
+    return None, None
+
+
+def _coerce_column(name, values):
+    """Numbers for sets/reps/kcal/ml columns; anything ambiguous stays text."""
+    import pandas as pd  # deferred: only needed once a response contains a table
+    parsed, units, commas = [], set(), set()
+    for value in values:
+        if value == "":
+            parsed.append(None)
+            continue
+        match = _NUMBER.match(value)
+        if not match or match.group(2).lower() not in _UNITS:
+            return name, values
+        number, comma = _parse_number(match.group(1))
+        if number is None:
+            return name, values
+        parsed.append(number)
+        units.add(match.group(2).lower())
+        if comma:
+            commas.add(comma)
+    # Mixed units, or "," meaning thousands in one row and decimals in another
+    if len(units) > 1 or len(commas) > 1 or not any(v is not None for v in parsed):
+        return name, values
+    unit = units.pop() if units else ""
+    if unit and unit not in name.lower():
+        name = f"{name} ({unit})"
+    series = pd.Series(parsed, dtype="float64")
+    if series.dropna().mod(1).eq(0).all():
+        series = series.astype("Int64")
+    return name, series
+
+
+def table_to_dataframe(header, rows):
+    import pandas as pd
+    width = len(header)
+    rows = [(row + [""] * width)[:width] for row in rows]
+    columns = {}
+    for i, name in enumerate(header):
+        name = name or f"Column {i + 1}"
+        while name in columns:
+            name += " "
+        name, values = _coerce_column(name, [row[i] for row in rows])
+        columns[name] = values
+    return pd.DataFrame(columns)
+
+
+class MarkdownTableParser:
+    """Line-by-line state machine over a growing response.
+
+    feed() accepts chunks as they stream in; only complete lines are parsed, so
+    each chunk costs time proportional to the chunk, not the whole response.
+    blocks() returns [("text", str) | ("table", DataFrame)], including the block
+    still being written (a partial table renders with the rows seen so far).
+    """
+
+    def __init__(self):
+        self._buffer = ""          # incomplete trailing line
+        self._closed = []          # finished blocks
+        self._text = []            # lines of the open prose block
+        self._candidate = None     # row-like line that may be a table header
+        self._header = None        # header of the open table
+        self._rows = []            # rows of the open table
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split("\n")
+        for line in lines:
+            self._line(line)
+
+    def close(self):
+        """Flush the trailing partial line and the open block."""
+        if self._buffer:
+            self._line(self._buffer)
+            self._buffer = ""
+        self._close_table()
+        if self._candidate is not None:
+            self._text.append(self._candidate)
+            self._candidate = None
+        self._close_text()
+
+    def _line(self, line):
+        if self._header is not None:
+            if _is_row(line) and not _SEPARATOR.match(line):
+                self._rows.append(_split_row(line))
+                return
+            self._close_table()
+        if self._candidate is not None:
+            if _SEPARATOR.match(line):
+                self._close_text()
+                self._header, self._rows = _split_row(self._candidate), []
+                self._candidate = None
+                return
+            self._text.append(self._candidate)
+            self._candidate = None
+        if _is_row(line):
+            self._candidate = line
+        else:
+            self._text.append(line)
+
+    def _close_text(self):
+        text = "\n".join(self._text).strip("\n")
+        if text.strip():
+            self._closed.append(("text", text))
+        self._text = []
+
+    def _close_table(self):
+        if self._header is not None:
+            self._closed.append(("table", table_to_dataframe(self._header, self._rows)))
+            self._header, self._rows = None, []
+
+    @property
+    def completed(self):
+        """Number of blocks that will not change any more."""
+        return len(self._closed)
+
+    def blocks(self):
+        open_blocks = []
+        if self._header is not None:
+            rows = list(self._rows)
+            if self._buffer and _is_row(self._buffer):
+                rows.append(_split_row(self._buffer))
+            open_blocks.append(("table", table_to_dataframe(self._header, rows)))
+        else:
+            lines = self._text + ([self._candidate] if self._candidate is not None else [])
+            lines += [self._buffer] if self._buffer else []
+            text = "\n".join(lines).strip("\n")
+            if text.strip():
+                open_blocks.append(("text", text))
+        return self._closed + open_blocks
+
+
+def split_response(text):
+    """Parse a complete response into prose and table blocks."""
+    parser = MarkdownTableParser()
+    parser.feed(text)
+    parser.close()
+    return parser.blocks()
+
+
+def extract_tables(text):
+    return [block for kind, block in split_response(text) if kind == "table"]
+
+
+def tables_to_zip(tables, fmt="csv"):
+    """Bundle tables as table_1.csv, table_2.csv, ... (or .parquet) in a zip archive."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i, df in enumerate(tables, start=1):
+            if fmt == "parquet":
+                data = io.BytesIO()
+                df.to_parquet(data, index=False)
+                zf.writestr(f"table_{i}.parquet", data.getvalue())
+            else:
+                zf.writestr(f"table_{i}.csv", df.to_csv(index=False))
+    return buffer.getvalue()
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
@@ -0,0 +1,256 @@
+"""
+CoachBot AI - Model routing, hedging and circuit breakers
+Requests go to the first healthy model of a configurable route. If it has not
+produced a first token within its observed p95, a hedged request goes to the next
+model and the first good response wins; the slower call is cancelled. Models
+that keep failing (or losing hedges) are skipped for a cool-down period.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from telemetry import get_metrics
+
+MODEL_ROUTE = [name.strip() for name in
+               os.environ.get("COACHBOT_MODEL_ROUTE", "gemini-2.5-flash,gemini-2.5-flash-lite").split(",")
+               if name.strip()]
+HEDGE_ENABLED = os.environ.get("COACHBOT_HEDGE", "1") not in ("", "0")
+HEDGE_QUANTILE = float(os.environ.get("COACHBOT_HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SECONDS = 1.0
+# Hedge delay until a model has MIN_SAMPLES observations: (streamed, blocking) seconds.
+# A blocking call's "first token" is the whole response, so it gets far longer.
+HEDGE_DEFAULT_SECONDS = (float(os.environ.get("COACHBOT_HEDGE_AFTER", "15")),
+                         float(os.environ.get("COACHBOT_HEDGE_AFTER_BLOCKING", "60")))
+MIN_SAMPLES = 20
+SAMPLE_WINDOW = 200
+BREAKER_FAILURES = int(os.environ.get("COACHBOT_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.environ.get("COACHBOT_BREAKER_COOLDOWN", "60"))
+MAX_ATTEMPTS_IN_FLIGHT = 64
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive failures -> one trial call after `cooldown`."""
+
+    def __init__(self, failures=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.consecutive = 0
+        self.opened_at = 0.0
+
+    def available(self, now):
+        """Closed, or open with the cool-down over. No side effects: routing asks this of
+        every model in a route, most of which never get launched."""
+        return self.state == "closed" or (self.state == "open" and now - self.opened_at >= self.cooldown)
+
+    def claim(self, now):
+        """Called for the model actually launched. Returns True if this is the trial call,
+        whose outcome the caller must then record with success() or failure()."""
+        if self.state == "open" and now - self.opened_at >= self.cooldown:
+            self.state = "half_open"        # let exactly one request find out if it recovered
+            return True
+        return False
+
+    def success(self):
+        self.state, self.consecutive = "closed", 0
+
+    def failure(self, now):
+        """Returns True if this failure opened the breaker."""
+        self.consecutive += 1
+        if self.state == "half_open" or (self.state == "closed" and self.consecutive >= self.failures):
+            self.state, self.opened_at = "open", now
+            return True
+        return False
+
+
+class Attempt:
+    """One model's try at a request; the call reports progress through it."""
+
+    def __init__(self, model_name, events, streamed):
+        self.model_name = model_name
+        self.streamed = streamed
+        self.cancelled = threading.Event()
+        self._events = events
+        self.sent_at = None
+        self.trial = False
+
+    def sent(self):
+        """Called right before the request goes out (after any rate-limiter wait)."""
+        if self.sent_at is None:
+            self.sent_at = time.monotonic()
+            self._events.put(("sent", self, None))
+
+    def chunk(self, text):
+        self._events.put(("chunk", self, text))
+
+
+class ModelRouter:
+    """Process-wide routing state: per-model first-token samples and circuit breakers."""
+
+    def __init__(self, route=MODEL_ROUTE, hedge=HEDGE_ENABLED, quantile=HEDGE_QUANTILE,
+                 default_delays=HEDGE_DEFAULT_SECONDS, min_delay=HEDGE_MIN_SECONDS):
+        self.route = list(route)
+        self.hedge = hedge
+        self.quantile = quantile
+        self.default_delays = default_delays
+        self.min_delay = min_delay
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=SAMPLE_WINDOW))   # (model, streamed) -> seconds
+        self._breakers = defaultdict(CircuitBreaker)
+        self._pool = ThreadPoolExecutor(max_workers=MAX_ATTEMPTS_IN_FLIGHT,
+                                        thread_name_prefix="coachbot-attempt")
+
+    def fallbacks(self, model_name):
+        """Models a request for `model_name` may be hedged or failed over to, in order."""
+        return [name for name in self.route if name != model_name]
+
+    def hedge_delay(self, model_name, stream):
+        """p95 (by default) of the model's recent times to first token, or the default."""
+        with self._lock:
+            samples = sorted(self._samples[(model_name, stream)])
+        if len(samples) < MIN_SAMPLES:
+            return self.default_delays[0 if stream else 1]
+        return max(self.min_delay, samples[min(len(samples) - 1, int(self.quantile * len(samples)))])
+
+    def breaker_states(self):
+        with self._lock:
+            return {name: breaker.state for name, breaker in self._breakers.items()}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._breakers.clear()
+
+    def _plan(self, model_names):
+        """model_names minus those with an open breaker (all of them if every one is open)."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [name for name in model_names if self._breakers[name].available(now)]
+        for name in model_names:
+            if name not in healthy:
+                self._event(name, "skipped")
+        return healthy or list(model_names[:1])
+
+    def _event(self, model_name, event):
+        get_metrics().inc("coachbot_route_events_total", model=model_name, event=event)
+
+    def _first_token(self, attempt):
+        if attempt.sent_at is None:
+            return
+        with self._lock:
+            self._samples[(attempt.model_name, attempt.streamed)].append(
+                time.monotonic() - attempt.sent_at)
+
+    def _claim(self, model_name):
+        with self._lock:
+            return self._breakers[model_name].claim(time.monotonic())
+
+    def _succeeded(self, model_name):
+        with self._lock:
+            self._breakers[model_name].success()
+
+    def _failed(self, model_name):
+        with self._lock:
+            opened = self._breakers[model_name].failure(time.monotonic())
+        if opened:
+            self._event(model_name, "breaker_open")
+
+    def _run(self, attempt, call):
+        try:
+            attempt._events.put(("done", attempt, call(attempt)))
+        except Exception as e:
+            attempt._events.put(("error", attempt, e))
+
+    def execute(self, model_names, call, stream=False, on_text=None):
+        """Run `call(attempt)` on the first healthy model, hedging and failing over as needed.
+
+        call(attempt) sends the request to attempt.model_name, calls attempt.sent()
+        just before sending and attempt.chunk(text) for every streamed chunk, returns
+        the final response, and stops early once attempt.cancelled is set.
+        on_text(text) receives the winning attempt's chunks. Returns (model name,
+        response) of the winner; raises the last error if every model failed.
+        """
+        events = queue.Queue()
+        pending = self._plan(list(model_names))
+        attempts = []
+        finished = set()                 # attempts whose done/error event has been received
+        winner, deadline, last_error = None, None, None
+
+        def launch():
+            attempt = Attempt(pending.pop(0), events, stream)
+            attempt.trial = self._claim(attempt.model_name)
+            attempts.append(attempt)
+            self._pool.submit(self._run, attempt, call)
+
+        def crown(attempt):
+            for other in attempts:
+                if other is not attempt and other not in finished and not other.cancelled.is_set():
+                    other.cancelled.set()
+                    self._event(other.model_name, "cancelled")
+                    if other is attempts[0] or other.trial:
+                        # Lost a hedge: counts against it. A trial call must record an
+                        # outcome either way, or its breaker would stay half-open for good.
+                        self._failed(other.model_name)
+            self._event(attempt.model_name, "won")
+            self._first_token(attempt)
+            return attempt
+
+        launch()
+        while True:
+            timeout = None
+            if winner is None and deadline is not None and pending and self.hedge:
+                timeout = max(0.0, deadline - time.monotonic())
+            try:
+                kind, attempt, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                # Nothing from the current model within its usual time: hedge
+                self._event(attempts[-1].model_name, "hedged")
+                deadline = None
+                launch()
+                continue
+            if kind in ("done", "error"):
+                finished.add(attempt)
+            if attempt.cancelled.is_set():
+                continue
+
+            if kind == "sent":
+                if attempt is attempts[-1]:
+                    deadline = attempt.sent_at + self.hedge_delay(attempt.model_name, stream)
+            elif kind == "chunk":
+                if winner is None:
+                    winner = crown(attempt)
+                if on_text is not None:
+                    on_text(payload)
+            elif kind == "done":
+                if winner is None:
+                    winner = crown(attempt)
+                self._succeeded(attempt.model_name)
+                return attempt.model_name, payload
+            else:
+                last_error = payload
+                self._failed(attempt.model_name)
+                if attempt is winner:
+                    raise payload        # failed mid-stream; its chunks are already out
+                if pending:
+                    self._event(attempt.model_name, "failover")
+                    deadline = None
+                    launch()
+                elif all(a in finished or a.cancelled.is_set() for a in attempts):
+                    raise last_error
+
+
+_default_router = None
+_default_lock = threading.Lock()
+
+
+def get_model_router():
+    """Process-wide router (module globals survive Streamlit reruns)."""
+    global _default_router
+    with _default_lock:
+        if _default_router is None:
+            _default_router = ModelRouter()
+        return _default_router
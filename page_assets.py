@@ -0,0 +1,109 @@
+"""
+CoachBot AI - Page assets
+The page's CSS and JavaScript, minified once per process instead of on every rerun.
+"""
+
+import re
+from functools import lru_cache
+
+CSS = """
+.main-header {
+    font-size: 2.5rem;
+    color: #1E88E5;
+    text-align: center;
+    font-weight: bold;
+    margin-bottom: 0.5rem;
+}
+.sub-header {
+    font-size: 1.2rem;
+    color: #666;
+    text-align: center;
+    margin-bottom: 2rem;
+}
+.feature-box {
+    background-color: #f0f2f6;
+    padding: 1.5rem;
+    border-radius: 10px;
+    margin: 1rem 0;
+    border-left: 5px solid #1E88E5;
+}
+.output-box {
+    background-color: #e8f4f8;
+    padding: 1.5rem;
+    border-radius: 10px;
+    margin: 1rem 0;
+    border: 2px solid #1E88E5;
+}
+.stButton>button {
+    width: 100%;
+    background-color: #1E88E5;
+    color: white;
+    font-weight: bold;
+    border-radius: 5px;
+    padding: 0.5rem 1rem;
+}
+.ref-table {
+    width: 100%;
+    border-collapse: collapse;
+    margin-bottom: 1rem;
+}
+.ref-table th, .ref-table td {
+    padding: 0.4rem 0.6rem;
+    border-bottom: 1px solid #e0e0e0;
+    text-align: left;
+}
+.ref-table th {
+    background-color: #f0f2f6;
+}
+/* Hide sidebar for Tab 2 */
+[data-testid="stSidebar"][aria-label="sidebar"] {
+    display: block;
+}
+"""
+
+SCRIPT = """
+// Hide sidebar when Custom Coach tab is active
+const tabs = window.parent.document.querySelectorAll('[role="tab"]');
+const sidebar = window.parent.document.querySelector('[data-testid="stSidebar"]');
+
+if (tabs && sidebar) {
+    tabs.forEach((tab, index) => {
+        tab.addEventListener('click', () => {
+            if (index === 1) {  // Tab 2 (Custom Coach)
+                sidebar.style.display = 'none';
+            } else {  // Tab 1 (Smart Assistant)
+                sidebar.style.display = 'block';
+            }
+        });
+    });
+    
+    // Check initial state
+    const activeTab = window.parent.document.querySelector('[role="tab"][aria-selected="true"]');
+    if (activeTab) {
+        const activeIndex = Array.from(tabs).indexOf(activeTab);
+        sidebar.style.display = activeIndex === 1 ? 'none' : 'block';
+    }
+}
+"""
+
+
+def minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r"\s*([{};:,>])\s*", r"\1", css).replace(";}", "}").strip()
+
+
+def minify_js(js):
+    """Drop comments and indentation; newlines stay so automatic semicolons still apply."""
+    lines = []
+    for line in js.splitlines():
+        line = re.sub(r"(^|\s)//.*$", "", line).strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+@lru_cache(maxsize=None)
+def page_head():
+    """The <style>/<script> block injected at the top of every run."""
+    return f"<style>{minify_css(CSS)}</style>\n<script>\n{minify_js(SCRIPT)}\n</script>"
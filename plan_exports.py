@@ -0,0 +1,325 @@
+"""
+CoachBot AI - Plan export pipeline
+PDF, XLSX (one sheet per table, reference tables included) and CSV/Parquet zip
+versions of a plan. They are built on a background worker pool as soon as a plan
+is shown, and kept by content hash, so download buttons serve prebuilt bytes and
+reruns never rebuild them.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+
+from markdown_tables import parquet_available, split_response
+from reference_tables import dashboard_tables
+from structured_output import structured_blocks
+from telemetry import get_metrics
+
+EXPORT_WORKERS = int(os.environ.get("COACHBOT_EXPORT_WORKERS", "2"))
+EXPORT_CACHE_MB = float(os.environ.get("COACHBOT_EXPORT_CACHE_MB", "64"))
+EXPORT_WAIT_SECONDS = 0.5      # how long a rerun waits for a build before showing "Preparing..."
+EXPORT_POLL_SECONDS = 1.0      # then how often the download row checks again
+# A TrueType font for the PDF (e.g. DejaVuSans.ttf); without one, text outside Latin-1 is simplified
+PDF_FONT = os.environ.get("COACHBOT_PDF_FONT", "")
+EXPORT_VERSION = 2       # bump when the output of a builder changes, so cached exports are rebuilt
+
+# format -> (label, file extension, mime type)
+FORMATS = {
+    "pdf":     ("PDF", "pdf", "application/pdf"),
+    "xlsx":    ("Excel", "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv":     ("CSV Tables", "zip", "application/zip"),
+    "parquet": ("Parquet Tables", "zip", "application/zip"),
+}
+
+
+def _importable(*modules):
+    for module in modules:
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            pass
+    return False
+
+
+@lru_cache(maxsize=None)
+def available_formats():
+    """Formats whose optional dependency is installed (fpdf2, openpyxl/xlsxwriter, pyarrow)."""
+    formats = []
+    if _importable("fpdf"):
+        formats.append("pdf")
+    if _importable("openpyxl", "xlsxwriter"):
+        formats.append("xlsx")
+    formats.append("csv")
+    if parquet_available():
+        formats.append("parquet")
+    return formats
+
+
+def export_key(result, fmt):
+    """Content hash of everything an export of this plan result depends on."""
+    progress = result.get("progress")      # (builder, args) of the logged progress table
+    payload = json.dumps([EXPORT_VERSION, fmt, result["feature"], result["text"],
+                          result.get("structured") is not None, result["training_intensity"],
+                          result["calorie_goal"],
+                          progress and (progress[0].__name__, progress[1])], default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def export_file_name(result, fmt):
+    return f"coachbot_plan_{result['generated_at']}.{FORMATS[fmt][1]}"
+
+
+# ─────────────────────────────────────────────
+# DOCUMENT
+# ─────────────────────────────────────────────
+def _plain(text):
+    """Markdown prose -> plain text for PDF and spreadsheet cells."""
+    text = re.sub(r"^#{1,6}\s*", "", text, flags=re.M)
+    text = re.sub(r"\*\*(.+?)\*\*|__(.+?)__", lambda m: m.group(1) or m.group(2), text)
+    return re.sub(r"(?<![\w*])\*(?!\s)(.+?)(?<!\s)\*", r"\1", text)
+
+
+def _table_title(previous_text, number):
+    """A table's title: the heading or bold line just above it, if there is one."""
+    lines = [line for line in (previous_text or "").strip().splitlines() if line.strip()]
+    title = _plain(lines[-1]).strip().rstrip(":") if lines else ""
+    return title if title and len(title) <= 60 else f"Plan Table {number}"
+
+
+def plan_document(result):
+    """The plan as blocks plus every table by title: the plan's own, then the reference tables."""
+    if result.get("structured") is not None:
+        blocks = structured_blocks(result["structured"], result["feature"])
+    else:
+        blocks = split_response(result["text"])
+    plan_tables, previous = [], None
+    for kind, block in blocks:
+        if kind == "table":
+            plan_tables.append((_table_title(previous, len(plan_tables) + 1), block))
+        previous = block if kind == "text" else None
+    return {
+        "title":     result["feature"].split(". ", 1)[-1],
+        # No generation time: export_key leaves it out so identical plans share their exports
+        # (the download's file name carries it)
+        "subtitle":  f"{result['training_intensity']} intensity · {result['calorie_goal']}",
+        "blocks":    blocks,
+        "tables":    plan_tables,
+        "reference": dashboard_tables(result["feature"], result["training_intensity"],
+                                      result["calorie_goal"], result.get("progress")),
+    }
+
+
+def _file_stem(title, number, used):
+    stem = f"{number:02d}_{re.sub(r'[^a-z0-9]+', '_', title.lower()).strip('_') or 'table'}"
+    while stem in used:
+        stem += "_"
+    used.add(stem)
+    return stem
+
+
+# ─────────────────────────────────────────────
+# BUILDERS
+# ─────────────────────────────────────────────
+def build_zip(document, fmt="csv"):
+    """plan.md plus every table as 01_<title>.csv (or .parquet)."""
+    buffer, used = io.BytesIO(), set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("plan.md", "\n\n".join(block for kind, block in document["blocks"] if kind == "text"))
+        for number, (title, df) in enumerate(document["tables"] + document["reference"], start=1):
+            stem = _file_stem(title, number, used)
+            if fmt == "parquet":
+                data = io.BytesIO()
+                df.to_parquet(data, index=False)
+                zf.writestr(f"{stem}.parquet", data.getvalue())
+            else:
+                zf.writestr(f"{stem}.csv", df.to_csv(index=False))
+    return buffer.getvalue()
+
+
+def _sheet_name(title, used):
+    name = re.sub(r"[\[\]:*?/\\]", "-", title)[:31] or "Table"
+    base, i = name, 2
+    while name.lower() in used:
+        suffix = f" ({i})"
+        name, i = base[:31 - len(suffix)] + suffix, i + 1
+    used.add(name.lower())
+    return name
+
+
+def build_xlsx(document):
+    """A "Plan" sheet with the prose, then one sheet per table."""
+    import pandas as pd
+    buffer, used = io.BytesIO(), {"plan"}
+    lines = [document["title"], document["subtitle"], ""]
+    for kind, block in document["blocks"]:
+        if kind == "text":
+            lines += _plain(block).splitlines() + [""]
+    with pd.ExcelWriter(buffer) as writer:
+        pd.DataFrame({"Plan": lines}).to_excel(writer, sheet_name="Plan", index=False)
+        for title, df in document["tables"] + document["reference"]:
+            df.to_excel(writer, sheet_name=_sheet_name(title, used), index=False)
+    return buffer.getvalue()
+
+
+# Common non-Latin-1 characters in plans, for the PDF core fonts
+_LATIN1 = str.maketrans({"‘": "'", "’": "'", "“": '"', "”": '"', "–": "-", "—": "-", "…": "...",
+                         "•": "-", "→": "->", "≥": ">=", "≤": "<=", "×": "x", "\u00a0": " "})
+
+
+def build_pdf(document):
+    """Title, the plan's prose and tables in order, then the reference tables."""
+    from fpdf import FPDF
+    pdf = FPDF(format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    if PDF_FONT:
+        pdf.add_font("Body", "", PDF_FONT)
+        pdf.add_font("Body", "B", PDF_FONT)
+        family, clean = "Body", _plain
+    else:
+        family = "Helvetica"
+
+        def clean(text):
+            return _plain(text).translate(_LATIN1).encode("latin-1", "ignore").decode("latin-1")
+    pdf.add_page()
+
+    def heading(text, size):
+        pdf.set_font(family, "B", size)
+        pdf.multi_cell(0, size * 0.55, clean(text))
+        pdf.ln(2)
+
+    def table(df):
+        pdf.set_font(family, "", 8)
+        with pdf.table(text_align="LEFT", line_height=4) as grid:
+            grid.row([clean(str(column)) for column in df.columns])
+            for values in df.astype(object).where(df.notna(), "").itertuples(index=False):
+                grid.row([clean(str(value)) for value in values])
+        pdf.ln(4)
+
+    heading(document["title"], 16)
+    pdf.set_font(family, "", 9)
+    pdf.multi_cell(0, 5, clean(document["subtitle"]))
+    pdf.ln(4)
+    for kind, block in document["blocks"]:
+        if kind == "table":
+            table(block)
+        elif block.strip():
+            pdf.set_font(family, "", 10)
+            pdf.multi_cell(0, 5, clean(block.strip()))
+            pdf.ln(3)
+    if document["reference"]:
+        pdf.add_page()
+        heading("Training Schedule & Breakdown", 14)
+        for title, df in document["reference"]:
+            heading(title, 11)
+            table(df)
+    return bytes(pdf.output())
+
+
+BUILDERS = {
+    "pdf":     build_pdf,
+    "xlsx":    build_xlsx,
+    "csv":     lambda document: build_zip(document, "csv"),
+    "parquet": lambda document: build_zip(document, "parquet"),
+}
+
+
+# ─────────────────────────────────────────────
+# PIPELINE
+# ─────────────────────────────────────────────
+class ExportPipeline:
+    """Process-wide pool + byte cache of exports, keyed by export_key().
+
+    Identical plans (any session) share one build. Built exports are kept in an
+    LRU bounded by total size; a failed build is remembered so it is not retried
+    on every rerun.
+    """
+
+    def __init__(self, workers=EXPORT_WORKERS, max_bytes=int(EXPORT_CACHE_MB * 1e6)):
+        self.max_bytes = max_bytes
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="coachbot-export")
+        self._lock = threading.Lock()
+        self._built = OrderedDict()      # key -> bytes
+        self._size = 0
+        self._building = {}              # key -> Future
+        self._failed = OrderedDict()     # key -> error message
+        self.stats = {"built": 0, "failed": 0, "evicted": 0}
+
+    def lookup(self, result, fmt):
+        """("ready", bytes), ("building", None) or ("failed", message); starts a missing build."""
+        key = export_key(result, fmt)
+        with self._lock:
+            data = self._built.get(key)
+            if data is not None:
+                self._built.move_to_end(key)
+                return "ready", data
+            if key in self._failed:
+                return "failed", self._failed[key]
+            if key not in self._building:
+                self._building[key] = self._pool.submit(self._build, key, result, fmt)
+            return "building", None
+
+    def _futures(self, result, formats):
+        keys = {export_key(result, fmt) for fmt in formats or available_formats()}
+        with self._lock:
+            return [future for key, future in self._building.items() if key in keys]
+
+    def building(self, result, formats=None):
+        return bool(self._futures(result, formats))
+
+    def wait(self, result, formats=None, timeout=None):
+        """Block until the result's pending builds finish (or the timeout passes)."""
+        futures = self._futures(result, formats)
+        if futures:
+            wait(futures, timeout=timeout)
+
+    def _build(self, key, result, fmt):
+        started = time.perf_counter()
+        try:
+            data = BUILDERS[fmt](plan_document(result))
+        except Exception as e:
+            get_metrics().observe("coachbot_export_build_seconds", time.perf_counter() - started,
+                                  format=fmt, result="error")
+            with self._lock:
+                self._building.pop(key, None)
+                self._failed[key] = str(e) or type(e).__name__
+                while len(self._failed) > 256:
+                    self._failed.popitem(last=False)
+                self.stats["failed"] += 1
+            return
+        get_metrics().observe("coachbot_export_build_seconds", time.perf_counter() - started,
+                              format=fmt, result="ok")
+        with self._lock:
+            self._building.pop(key, None)
+            self._built[key] = data
+            self._size += len(data)
+            self.stats["built"] += 1
+            while self._size > self.max_bytes and len(self._built) > 1:
+                _, evicted = self._built.popitem(last=False)
+                self._size -= len(evicted)
+                self.stats["evicted"] += 1
+
+    @property
+    def pending(self):
+        return len(self._building)
+
+
+_default_pipeline = None
+_default_lock = threading.Lock()
+
+
+def get_export_pipeline():
+    """Process-wide pipeline (module globals survive Streamlit reruns)."""
+    global _default_pipeline
+    with _default_lock:
+        if _default_pipeline is None:
+            _default_pipeline = ExportPipeline()
+        return _default_pipeline
@@ -0,0 +1,118 @@
+"""
+CoachBot AI - Bounded plan history
+Each session keeps a small ring of metadata + previews; full plans are zlib-compressed
+and spilled to SQLite, and only loaded back when the user opens one.
+"""
+
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from response_cache import DEFAULT_DB_PATH
+
+RING_SIZE = 20               # entries kept in memory per session
+PREVIEW_CHARS = 200
+RETENTION_SECONDS = 7 * 24 * 3600
+MAX_SPILL_FALLBACK = 5       # compressed bodies kept in memory if SQLite is unavailable
+
+_schema_lock = threading.Lock()
+_schema_ready = set()
+
+
+class PlanHistory:
+    """Per-session history whose memory footprint doesn't grow with the number of plans."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ring_size=RING_SIZE):
+        self.session_id = uuid.uuid4().hex
+        self.db_path = db_path
+        self._entries = deque(maxlen=ring_size)
+        self._fallback = OrderedDict()     # plan_id -> compressed body, when SQLite fails
+        self._ensure_schema()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _ensure_schema(self):
+        if not self.db_path:
+            return
+        with _schema_lock:
+            if self.db_path in _schema_ready:
+                return
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS plan_history ("
+                        " plan_id TEXT PRIMARY KEY, session_id TEXT NOT NULL,"
+                        " created REAL NOT NULL, feature TEXT, body BLOB NOT NULL)"
+                    )
+                    conn.execute("DELETE FROM plan_history WHERE created < ?",
+                                 (time.time() - RETENTION_SECONDS,))
+                _schema_ready.add(self.db_path)
+            except sqlite3.Error:
+                pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def add(self, feature, response):
+        """Store a plan; returns its id."""
+        plan_id = uuid.uuid4().hex
+        body = zlib.compress(response.encode("utf-8"), 6)
+        if len(self._entries) == self._entries.maxlen:
+            self._forget(self._entries[0]["plan_id"])
+        self._entries.append({
+            "plan_id":   plan_id,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "feature":   feature,
+            "preview":   response[:PREVIEW_CHARS],
+            "chars":     len(response),
+        })
+        if not self._spill(plan_id, feature, body):
+            self._fallback[plan_id] = body
+            while len(self._fallback) > MAX_SPILL_FALLBACK:
+                self._fallback.popitem(last=False)
+        return plan_id
+
+    def _spill(self, plan_id, feature, body):
+        if not self.db_path:
+            return False
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT INTO plan_history VALUES (?, ?, ?, ?, ?)",
+                             (plan_id, self.session_id, time.time(), feature, body))
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _forget(self, plan_id):
+        self._fallback.pop(plan_id, None)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM plan_history WHERE plan_id = ?", (plan_id,))
+            except sqlite3.Error:
+                pass
+
+    def recent(self, n=5):
+        """Metadata for the n most recent plans, newest first."""
+        return list(self._entries)[-n:][::-1]
+
+    def load(self, plan_id):
+        """Full text of one plan, or None if it has expired."""
+        body = self._fallback.get(plan_id)
+        if body is None and self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute("SELECT body FROM plan_history WHERE plan_id = ?",
+                                       (plan_id,)).fetchone()
+                body = row[0] if row else None
+            except sqlite3.Error:
+                body = None
+        return zlib.decompress(body).decode("utf-8") if body is not None else None
@@ -0,0 +1,171 @@
+"""
+CoachBot AI - Pre-generated plan library
+Plans for the common sport x position x fitness level x feature cells (plus the
+intensity and calorie options), generated offline by build_plan_library.py and
+stored zlib-compressed in an indexed SQLite file. Profiles without free-text
+details are served from it in milliseconds; the rest can start from the nearest entry.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from gemini_client import DEFAULT_MODEL
+from prompts import build_prompt
+from response_cache import make_cache_key
+
+DEFAULT_LIBRARY_PATH = os.environ.get("COACHBOT_PLAN_LIBRARY", "coachbot_plan_library.sqlite3")
+DEFAULT_MEMORY_ENTRIES = 128
+COMPRESSION_LEVEL = 9
+
+# Free-text fields (and the logged training load) that make a plan personal; any of
+# these set means live generation. The name is not one of them: library plans simply
+# address the athlete as "Athlete".
+PERSONAL_FIELDS = ("injury_history", "allergies", "specific_goal", "training_load")
+# Ages are bucketed: (oldest age in the band, age its plans are written for). Gender,
+# diet, session length and frequency change the plan too much to share, so they match exactly.
+AGE_BANDS = ((13, 12), (17, 15), (24, 21), (34, 30), (49, 42), (None, 55))
+# Stored alongside each plan so the library can be browsed and counted per cell
+INDEX_FIELDS = ("sport", "position", "fitness_level", "training_intensity", "calorie_goal")
+
+
+def is_personalized(profile):
+    return any(str(profile.get(field) or "").strip() for field in PERSONAL_FIELDS)
+
+
+def library_age(age):
+    """The age a library plan for this athlete's age band is written for."""
+    for oldest, age_for in AGE_BANDS:
+        if oldest is None or int(age) <= oldest:
+            return age_for
+
+
+def library_profile(profile):
+    """The library cell a profile falls in: same selections, age band, no free text."""
+    return dict(profile, name="", age=library_age(profile["age"]),
+                **{field: "" for field in PERSONAL_FIELDS})
+
+
+def library_key(profile, feature, model_name=DEFAULT_MODEL):
+    """Hash of the cell's rendered prompt, so an edited template never serves a stale plan."""
+    return make_cache_key(build_prompt(library_profile(profile), feature), model_name, None)
+
+
+class PlanLibrary:
+    """Read-mostly store of pre-generated plans; a missing file just means no hits."""
+
+    def __init__(self, path=DEFAULT_LIBRARY_PATH, memory_entries=DEFAULT_MEMORY_ENTRIES):
+        self.path = path
+        self.memory_entries = memory_entries
+        self._memory = OrderedDict()          # key -> entry dict
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self.stats = {"hits": 0, "misses": 0}
+
+    @property
+    def available(self):
+        return bool(self.path) and os.path.exists(self.path)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _ensure_schema(self):
+        if self._schema_ready:
+            return
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                " key TEXT PRIMARY KEY, feature TEXT NOT NULL, sport TEXT, position TEXT,"
+                " fitness_level TEXT, training_intensity TEXT, calorie_goal TEXT, model TEXT,"
+                " plan BLOB NOT NULL, chars INTEGER NOT NULL, generated_at REAL NOT NULL"
+                ") WITHOUT ROWID"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS plans_cell ON plans"
+                         " (sport, position, fitness_level, feature)")
+        self._schema_ready = True
+
+    # ── Lookup ────────────────────────────
+    def covers(self, profile):
+        """True if this profile should be served from the library rather than generated."""
+        return self.available and not is_personalized(profile)
+
+    def get(self, profile, feature, model_name=DEFAULT_MODEL):
+        """{"text", "generated_at"} for the profile's cell, or None."""
+        key = library_key(profile, feature, model_name)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry
+
+        row = None
+        if self.available:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute("SELECT plan, generated_at FROM plans WHERE key = ?",
+                                       (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+
+        with self._lock:
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            entry = {"text": zlib.decompress(row[0]).decode("utf-8"), "generated_at": row[1]}
+            self._memory[key] = entry
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+            self.stats["hits"] += 1
+            return entry
+
+    # ── Building (build_plan_library.py) ──
+    def keys(self):
+        """Keys already in the library, so an interrupted build can resume."""
+        if not self.available:
+            return set()
+        self._ensure_schema()
+        with self._connect() as conn:
+            return {row[0] for row in conn.execute("SELECT key FROM plans")}
+
+    def put_many(self, entries, model_name=DEFAULT_MODEL):
+        """Store [(profile, feature, text)] in one transaction."""
+        self._ensure_schema()
+        now = time.time()
+        rows = [
+            (library_key(profile, feature, model_name), feature,
+             *(profile[field] for field in INDEX_FIELDS), model_name,
+             zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL), len(text), now)
+            for profile, feature, text in entries
+        ]
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                             rows)
+
+    def summary(self):
+        """Entry count, raw characters and compressed bytes."""
+        if not self.available:
+            return {"plans": 0, "chars": 0, "compressed_bytes": 0}
+        self._ensure_schema()
+        with self._connect() as conn:
+            plans, chars, stored = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chars), 0), COALESCE(SUM(LENGTH(plan)), 0) FROM plans"
+            ).fetchone()
+        return {"plans": plans, "chars": chars, "compressed_bytes": stored}
+
+
+_default_library = None
+_default_lock = threading.Lock()
+
+
+def get_plan_library():
+    """Process-wide library (module globals survive Streamlit reruns)."""
+    global _default_library
+    with _default_lock:
+        if _default_library is None:
+            _default_library = PlanLibrary()
+        return _default_library
@@ -0,0 +1,566 @@
+"""
+CoachBot AI - Prompt template registry
+The 10 feature prompts are parsed and validated once at import; rendering a
+feature only resolves the profile fields that template actually uses. Shared
+by the web app and the roster CLI so both send exactly the same prompts.
+"""
+
+import hashlib
+import json
+from string import Formatter
+
+# ─────────────────────────────────────────────
+# SPORT / POSITION / FEATURE DATA
+# ─────────────────────────────────────────────
+position_options = {
+    "Football/Soccer":         ["Goalkeeper","Defender","Midfielder","Forward/Striker","Winger"],
+    "Cricket":                 ["Batsman","Bowler (Fast)","Bowler (Spin)","All-rounder","Wicket-keeper"],
+    "Basketball":              ["Point Guard","Shooting Guard","Small Forward","Power Forward","Center"],
+    "Athletics/Track & Field": ["Sprinter","Middle Distance","Long Distance","Jumper","Thrower"],
+    "Tennis":                  ["Singles Player","Doubles Player","Baseline Player","Serve-and-Volley"],
+    "Swimming":                ["Freestyle","Backstroke","Breaststroke","Butterfly","Individual Medley"],
+    "Volleyball":              ["Setter","Outside Hitter","Middle Blocker","Libero","Opposite Hitter"],
+    "Badminton":               ["Singles Player","Doubles Player","Mixed Doubles"],
+    "Hockey":                  ["Forward","Midfielder","Defender","Goalkeeper"],
+    "Kabaddi":                 ["Raider","Defender","All-Rounder"],
+    "Rugby":                   ["Forward","Back"],
+    "Other":                   ["General Athlete"],
+}
+
+feature_options = [
+    "1. Full-Body Workout Plan for [Position] in [Sport]",
+    "2. Safe Recovery Training Schedule for Athlete with [Injury]",
+    "3. Tactical Coaching Tips to Improve [Skill] in [Sport]",
+    "4. Week-Long Nutrition Guide for Young Athlete",
+    "5. Personalized Warm-up & Cooldown Routine",
+    "6. Mental Focus Routines for Tournaments",
+    "7. Hydration & Electrolyte Strategy",
+    "8. Pre-Match Visualization Techniques",
+    "9. Positional Decision-Making Drills",
+    "10. Mobility Workouts for Post-Injury Recovery",
+]
+
+DEFAULT_FEATURE = feature_options[0]
+
+# Choices offered by the sidebar and form; the plan library builder walks the same lists
+gender_options             = ["Male","Female","Other","Prefer not to say"]
+fitness_level_options      = ["Beginner","Intermediate","Advanced","Elite"]
+diet_type_options          = ["Vegetarian","Non-Vegetarian","Vegan","Pescatarian"]
+calorie_goal_options       = ["Maintenance","Deficit (Weight Loss)","Surplus (Muscle Gain)"]
+training_intensity_options = ["Low","Moderate","High","Very High"]
+training_duration_options  = ["30 minutes","45 minutes","60 minutes","90 minutes","120 minutes"]
+training_frequency_options = ["2-3 times/week","4-5 times/week","6 times/week","Daily"]
+
+# Profile fields (and defaults) shared by the sidebar and the roster CLI
+PROFILE_DEFAULTS = {
+    "name":               "",
+    "age":                15,
+    "gender":             "Male",
+    "sport":              "Other",
+    "position":           "General Athlete",
+    "fitness_level":      "Beginner",
+    "injury_history":     "",
+    "diet_type":          "Non-Vegetarian",
+    "allergies":          "",
+    "calorie_goal":       "Maintenance",
+    "training_intensity": "Low",
+    "training_duration":  "30 minutes",
+    "training_frequency": "2-3 times/week",
+    "specific_goal":      "",
+    "training_load":      "",       # training_log.TrainingLog.load_summary(), "" without a log
+}
+
+
+def build_profile(**fields):
+    """Fill in defaults for any missing profile field."""
+    profile = dict(PROFILE_DEFAULTS)
+    profile.update({k: v for k, v in fields.items() if k in PROFILE_DEFAULTS and v is not None})
+    return profile
+
+
+# ─────────────────────────────────────────────
+# TEMPLATE ENGINE
+# ─────────────────────────────────────────────
+# Derived fields: name -> (profile fields it reads, how to compute it)
+DERIVED_FIELDS = {
+    "athlete_name":       (("name",),           lambda p: p["name"] or "Athlete"),
+    "injury_summary":     (("injury_history",), lambda p: p["injury_history"] or "None"),
+    "injury_note":        (("injury_history",), lambda p: p["injury_history"] or "none"),
+    "injury_focus":       (("injury_history",), lambda p: p["injury_history"] or "general recovery"),
+    "allergy_summary":    (("allergies",),      lambda p: p["allergies"] or "None"),
+    "allergy_note":       (("allergies",),      lambda p: p["allergies"] or "none"),
+    "allergy_exclusions": (("allergies",),      lambda p: p["allergies"] or "nothing"),
+    "goal_summary":       (("specific_goal",),  lambda p: p["specific_goal"] or "General improvement"),
+    "training_load_line": (("training_load",),  lambda p: f"\n- Recent Training Load: {p['training_load']}"
+                                                          if p["training_load"] else ""),
+}
+
+
+class PromptTemplate:
+    """A prompt parsed once into literal/field segments.
+
+    `dependencies` lists the profile fields the rendered prompt depends on, which
+    is exactly what a cache key or change check for this feature needs.
+    """
+
+    def __init__(self, name, text, extra_fields=()):
+        self.name = name
+        self.extra_fields = tuple(extra_fields)
+        self._segments = []
+        fields = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None:
+                if spec or conversion:
+                    raise ValueError(f"{name}: format specs are not supported ({{{field}}})")
+                if (field not in PROFILE_DEFAULTS and field not in DERIVED_FIELDS
+                        and field not in self.extra_fields):
+                    raise ValueError(f"{name}: unknown template field {{{field}}}")
+                fields.append(field)
+            self._segments.append((literal, field))
+        self.fields = tuple(dict.fromkeys(fields))
+        deps = set()
+        for field in self.fields:
+            if field in DERIVED_FIELDS:
+                deps.update(DERIVED_FIELDS[field][0])
+            elif field in PROFILE_DEFAULTS:
+                deps.add(field)
+        self.dependencies = tuple(sorted(deps))
+
+    def render(self, profile, **extra):
+        values = {}
+        for field in self.fields:
+            if field in DERIVED_FIELDS:
+                values[field] = str(DERIVED_FIELDS[field][1](profile))
+            elif field in PROFILE_DEFAULTS:
+                values[field] = str(profile[field])
+            else:
+                values[field] = str(extra[field])
+        return "".join(literal + (values[field] if field is not None else "")
+                       for literal, field in self._segments)
+
+    def fingerprint(self, profile):
+        """Hash of this template plus only the profile values it depends on."""
+        payload = json.dumps([self.name, [profile[f] for f in self.dependencies]], default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ─────────────────────────────────────────────
+# TEMPLATES
+# ─────────────────────────────────────────────
+# Full user context injected into every prompt
+CONTEXT_TEMPLATE = PromptTemplate("user_context", """
+Athlete Profile:
+- Name: {athlete_name}
+- Age: {age} years old
+- Gender: {gender}
+- Sport: {sport}
+- Position: {position}
+- Current Fitness Level: {fitness_level}
+- Injury History / Risk Zones: {injury_summary}
+- Diet Type: {diet_type}
+- Food Allergies / Restrictions: {allergy_summary}
+- Daily Calorie Goal: {calorie_goal}
+- Training Intensity: {training_intensity}
+- Training Duration per Session: {training_duration}
+- Training Frequency: {training_frequency}
+- Specific Goal: {goal_summary}{training_load_line}
+""")
+DERIVED_FIELDS["user_context"] = (CONTEXT_TEMPLATE.dependencies, CONTEXT_TEMPLATE.render)
+
+# ── 10 PROMPTS — text explanations + embedded tables ──
+_FEATURE_TEXTS = {
+
+"1. Full-Body Workout Plan for [Position] in [Sport]": """
+You are an experienced sports coach. Create a full-body workout plan for this athlete.
+
+{user_context}
+
+IMPORTANT: You MUST include markdown tables in your response. Follow this structure exactly:
+
+1. Write 2-3 paragraphs explaining the approach and why it suits this {position} in {sport}.
+
+2. Then create this MARKDOWN TABLE (copy this format exactly):
+
+| Day | Focus | Key Exercises | Sets x Reps | Duration |
+|-----|-------|---------------|-------------|----------|
+| Monday | Strength | Squats, Push-ups, Rows | 4x10, 3x12, 4x10 | 60 min |
+| Tuesday | Cardio | Running intervals | 6x400m | 45 min |
+(continue for all 7 days)
+
+3. Write 1-2 paragraphs on progressive overload.
+
+4. Then create this MARKDOWN TABLE:
+
+| Exercise | Sets | Reps | Rest | Technique Tip |
+|----------|------|------|------|---------------|
+| Squats | 4 | 10 | 90s | Keep chest up |
+(add 6-8 exercises)
+
+5. End with 1 paragraph on recovery advice for a {age}-year-old.
+
+CRITICAL: Use proper markdown table syntax with pipes (|) and dashes. Make the tables complete.
+""",
+
+"2. Safe Recovery Training Schedule for Athlete with [Injury]": """
+You are a sports physiotherapist. Create a recovery plan for injury: {injury_focus}.
+
+{user_context}
+
+MANDATORY FORMAT - Include these markdown tables:
+
+1. Write 2-3 paragraphs on recovery approach and safety principles.
+
+2. Create this MARKDOWN TABLE:
+
+| Phase | Weeks | Focus | Key Exercises | Load Level | Duration/Day |
+|-------|-------|-------|---------------|------------|--------------|
+| Phase 1 | 1-2 | Pain management | Gentle stretching | Very low | 15 min |
+| Phase 2 | 3-4 | Mobility | Pool work, bands | Low | 25 min |
+(continue for 4-5 phases)
+
+3. Write 1-2 paragraphs on warning signs.
+
+4. Create this MARKDOWN TABLE:
+
+| Exercise to AVOID | Reason | Safe Alternative |
+|-------------------|--------|------------------|
+| Jumping | Impact stress | Step-ups |
+| Sprinting | Re-injury risk | Walking intervals |
+(add 5-6 items)
+
+5. End with 1 paragraph on return criteria.
+
+CRITICAL: Use pipes (|) and dashes for markdown tables.
+""",
+
+"3. Tactical Coaching Tips to Improve [Skill] in [Sport]": """
+You are a tactical coach specialising in {sport}. Give advanced coaching advice for this athlete.
+
+{user_context}
+
+Write your response in this exact format:
+1. Start with 2-3 paragraphs describing the key tactical responsibilities of a {position} in {sport}, what skills they must develop, and how their fitness level and goal affect tactical training.
+2. Then include a Markdown table: Key Tactical Scenarios (Situation | What To Read | Best Response | Common Mistake).
+3. Then 1-2 paragraphs on developing game intelligence and communication with teammates.
+4. Then a Markdown table: Training Drills (Drill Name | Duration | Players Needed | Instructions | KPI to Measure).
+5. End with a short paragraph on professional examples and how to study the game.
+
+Reference their specific position, sport, and goal throughout.
+""",
+
+"4. Week-Long Nutrition Guide for Young Athlete": """
+You are a sports nutritionist. Create a nutrition guide for this {age}-year-old {sport} athlete.
+
+{user_context}
+
+IMPORTANT: You MUST include markdown tables. Follow this structure:
+
+1. Write 2-3 paragraphs on nutritional approach for {sport}, macro split for {calorie_goal}, and handling {diet_type} diet with allergies: {allergy_note}.
+
+2. Create this MARKDOWN TABLE:
+
+| Nutrient | Grams/Day | % Total | Calories | Best Sources |
+|----------|-----------|---------|----------|--------------|
+| Protein | 150g | 30% | 600 | Chicken, eggs, beans |
+| Carbs | 280g | 45% | 1120 | Rice, oats, fruits |
+| Fats | 70g | 25% | 630 | Avocado, nuts, oil |
+
+3. Write 1-2 paragraphs on meal timing around training.
+
+4. Create this MARKDOWN TABLE:
+
+| Day | Breakfast | Lunch | Dinner | Snacks | Total kcal |
+|-----|-----------|-------|--------|--------|------------|
+| Monday | Oatmeal + eggs | Chicken rice bowl | Salmon + veggies | Protein shake | 2400 |
+(continue for all 7 days, adapt to {diet_type}, exclude {allergy_exclusions})
+
+5. End with 1 paragraph on hydration and grocery tips.
+
+CRITICAL: Use proper markdown table format with pipes (|) and dashes.
+""",
+
+"5. Personalized Warm-up & Cooldown Routine": """
+You are a professional strength and conditioning coach. Create a warm-up and cooldown routine for this athlete.
+
+{user_context}
+
+Write your response in this exact format:
+1. Start with 2 paragraphs explaining why a proper warm-up matters for a {position} in {sport}, and how injury history ({injury_note}) affects the routine.
+2. Then include a Markdown table: Dynamic Warm-up (Exercise | Duration | Sets | Purpose | Injury Modification).
+3. Then 1 paragraph explaining the sport-specific activation phase and what it prepares the athlete for.
+4. Then a Markdown table: Cooldown & Stretching (Exercise | Hold Duration | Target Muscle | Benefit | Notes).
+5. End with a short paragraph on foam rolling sequence and breathing techniques for recovery.
+
+Make the routine practical for {training_duration} sessions at {training_intensity} intensity.
+""",
+
+"6. Mental Focus Routines for Tournaments": """
+You are a sports psychologist. Build a mental preparation programme for this athlete.
+
+{user_context}
+
+Write your response in this exact format:
+1. Start with 2-3 paragraphs explaining the mental challenges for a {age}-year-old {position} in tournament {sport}, and the overall psychological approach to competition preparation.
+2. Then include a Markdown table: Pre-Tournament Timeline (Days Before | Mental Activity | Duration | Goal | How To Do It).
+3. Then 1-2 paragraphs on managing performance anxiety, dealing with nerves, and building confidence specifically for {sport}.
+4. Then a Markdown table: Match-Day Mental Routine (Time | Activity | Duration | Purpose | Technique).
+5. End with a paragraph on post-performance reflection and positive self-talk strategies.
+
+Be age-appropriate for {age} years old and reference {sport} scenarios throughout.
+""",
+
+"7. Hydration & Electrolyte Strategy": """
+You are a sports nutrition and hydration specialist. Build a hydration strategy for this athlete.
+
+{user_context}
+
+Write your response in this exact format:
+1. Start with 2-3 paragraphs explaining why hydration is critical for {sport} at {training_intensity} intensity, how dehydration impacts performance, and the general daily targets for a {age}-year-old athlete.
+2. Then include a Markdown table: Daily Hydration Schedule (Time of Day | Amount (ml) | Drink Type | Purpose | Notes).
+3. Then 1-2 paragraphs on electrolyte balance, when to use sports drinks vs water, and hot/cold weather adjustments.
+4. Then a Markdown table: Training Hydration Protocol (Phase | Timing | Amount | Electrolytes Needed | Warning Signs).
+5. End with a short paragraph on recognising dehydration early and practical tips for staying consistent.
+
+Reference their training frequency ({training_frequency}) and duration ({training_duration}) throughout.
+""",
+
+"8. Pre-Match Visualization Techniques": """
+You are a sports psychologist specialising in mental performance. Teach visualisation techniques for this athlete.
+
+{user_context}
+
+Write your response in this exact format:
+1. Start with 2-3 paragraphs explaining what visualisation is, why it works for athletes, and how a {position} in {sport} can specifically benefit from it before matches.
+2. Then include a Markdown table: Visualisation Timeline (Time Before Match | Activity | Duration | What to Visualise | Expected Benefit).
+3. Then 1-2 paragraphs on combining breathing techniques with mental imagery and how to handle negative thoughts that arise.
+4. Then a Markdown table: Position-Specific Scenarios to Visualise (Scenario | What to See | What to Feel | Outcome to Imagine).
+5. End with a sample 5-minute visualisation script written specifically for a {position} in {sport}.
+
+Make it practical for a {age}-year-old. Reference their specific position throughout.
+""",
+
+"9. Positional Decision-Making Drills": """
+You are a professional {sport} coach. Design decision-making drills for this athlete.
+
+{user_context}
+
+Write your response in this exact format:
+1. Start with 2-3 paragraphs explaining the decision-making demands of a {position} in {sport}, the key cognitive skills to develop, and how training at {training_intensity} intensity helps build game intelligence.
+2. Then include a Markdown table: Core Drills (Drill Name | Duration | Players Needed | Instructions | Progression | KPI).
+3. Then 1-2 paragraphs on how to practice decision-making alone (solo drills) and the mental habits to build between sessions.
+4. Then a Markdown table: Game Scenarios (Situation | Options Available | Best Decision | Why | Common Error).
+5. End with a short paragraph on tracking improvement and integrating drills into team training sessions.
+
+All drills must be specific to {position} in {sport}. Reference their fitness level and goal.
+""",
+
+"10. Mobility Workouts for Post-Injury Recovery": """
+You are a sports physiotherapist and mobility specialist. Design a post-injury mobility programme for this athlete.
+
+{user_context}
+
+Write your response in this exact format:
+1. Start with 2-3 paragraphs explaining the importance of mobility work for {sport}, how their injury history ({injury_focus}) shapes this programme, and the key principles of safe progression.
+2. Then include a Markdown table: Phase-by-Phase Plan (Phase | Weeks | Focus | Key Exercises | Load | Daily Duration).
+3. Then 1-2 paragraphs on exercises to strictly avoid during recovery, pain management strategies, and when to seek professional support.
+4. Then a Markdown table: Daily Mobility Routine (Exercise | Sets | Duration/Reps | Target Area | Technique Notes | Avoid If).
+5. End with a paragraph on return-to-sport mobility standards and how to progress toward full {sport} training.
+
+Emphasise safety throughout. Make the plan specific to {sport} movement demands.
+""",
+}
+
+FEATURE_TEMPLATES = {name: PromptTemplate(name, text) for name, text in _FEATURE_TEXTS.items()}
+if list(FEATURE_TEMPLATES) != feature_options:
+    raise ValueError("every feature in feature_options needs exactly one template")
+
+CUSTOM_TEMPLATE = PromptTemplate("custom", """
+You are a professional sports coach. Answer this question with text AND a markdown table.
+
+Question: {user_query}
+
+Response format (MANDATORY):
+
+1. Write 1-2 paragraphs answering the question with clear advice.
+
+2. Create a MARKDOWN TABLE related to the question. Examples:
+   - If question is about drills: make a table with Drill | Duration | How To | Benefit
+   - If about meals: Meal | Time | Foods | Macros
+   - If about exercises: Exercise | Sets | Reps | Notes
+   Use pipes (|) and dashes for proper markdown format.
+
+3. End with 1 short paragraph of tips.
+
+CRITICAL: Your response MUST include at least one properly formatted markdown table.
+""", extra_fields=("user_query",))
+
+# Follow-up questions in a Custom Coach chat: a running summary of older turns plus
+# the most recent turns verbatim, so the prompt stays roughly the same size.
+CHAT_TEMPLATE = PromptTemplate("custom_chat", """
+You are a professional sports coach in an ongoing conversation with an athlete. Use the earlier conversation for context, and answer the latest question.
+
+Summary of the earlier conversation:
+{conversation_summary}
+
+Most recent exchanges:
+{recent_turns}
+
+Latest question: {user_query}
+
+Response format (MANDATORY):
+
+1. Write 1-2 paragraphs answering the latest question with clear advice.
+
+2. Create a MARKDOWN TABLE related to the question. Use pipes (|) and dashes for proper markdown format.
+
+3. End with 1 short paragraph of tips.
+
+CRITICAL: Your response MUST include at least one properly formatted markdown table.
+""", extra_fields=("conversation_summary", "recent_turns", "user_query"))
+
+CHAT_SUMMARY_TEMPLATE = PromptTemplate("custom_chat_summary", """
+Update the running summary of a coaching conversation between an athlete and their coach.
+
+Current summary:
+{conversation_summary}
+
+Exchanges to fold into the summary:
+{recent_turns}
+
+Write the updated summary in at most {summary_words} words of plain text (no tables). Keep what is known about the athlete (sport, position, age, injuries, goals, diet, schedule), the advice already given, and any open questions.
+""", extra_fields=("conversation_summary", "recent_turns", "summary_words"))
+
+
+# Appended to a personalised request when it starts from a plan-library entry
+LIBRARY_SEED_TEMPLATE = PromptTemplate("library_seed", """
+
+A baseline plan written for an athlete with the same sport, position, fitness level and training settings (but no injuries, allergies or specific goal) is included below. Use it as your starting point: keep its structure and what still applies, and adapt everything that this athlete's injury history, allergies and specific goal change. Do not mention the baseline plan in your answer.
+
+Baseline plan:
+{library_plan}
+""", extra_fields=("library_plan",))
+
+
+# ── Context-cache layout: one shared prefix per athlete + a short per-feature delta ──
+# Persona, house rules and the athlete profile are identical for every feature, so
+# they can be cached once (see context_cache.py); each request then sends only the
+# feature's own instructions.
+CONTEXT_PREFIX_TEMPLATE = PromptTemplate("context_prefix", """
+You are CoachBot, an experienced youth sports coach who also draws on sports physiotherapy, sports nutrition and sports psychology. You will be asked for several different plans for the same athlete; each request names the specialist role to take and the exact structure to follow.
+
+Rules for every answer:
+- Follow the requested structure and section order exactly.
+- Write markdown tables with pipes (|) and dashes, with a header row and a separator row, and fill in every row.
+- Keep all advice safe and appropriate for the athlete's age, and work around their injury history and food allergies.
+- Do not use HTML tags.
+
+{user_context}
+""")
+
+PROFILE_REFERENCE = "Use the athlete profile given above."
+
+FEATURE_DELTA_TEMPLATES = {
+    name: PromptTemplate(f"{name} (delta)", text.replace("{user_context}", PROFILE_REFERENCE))
+    for name, text in _FEATURE_TEXTS.items()
+}
+
+# ── Structured (JSON) output: the response schema in structured_output.py carries
+# the sections and table columns, so these prompts only set the role and the focus ──
+_STRUCTURED_BRIEFS = {
+    "1. Full-Body Workout Plan for [Position] in [Sport]":
+        "You are an experienced sports coach. Create a full-body workout plan for this {position} in {sport}.",
+    "2. Safe Recovery Training Schedule for Athlete with [Injury]":
+        "You are a sports physiotherapist. Create a recovery plan for injury: {injury_focus}.",
+    "3. Tactical Coaching Tips to Improve [Skill] in [Sport]":
+        "You are a tactical coach specialising in {sport}. Give advanced coaching advice for this {position}, "
+        "referencing their fitness level and goal.",
+    "4. Week-Long Nutrition Guide for Young Athlete":
+        "You are a sports nutritionist. Create a nutrition guide for this {age}-year-old {sport} athlete: "
+        "{diet_type} diet, {calorie_goal} calories, excluding {allergy_exclusions}.",
+    "5. Personalized Warm-up & Cooldown Routine":
+        "You are a professional strength and conditioning coach. Create a warm-up and cooldown routine for this "
+        "{position} in {sport}, practical for {training_duration} sessions at {training_intensity} intensity.",
+    "6. Mental Focus Routines for Tournaments":
+        "You are a sports psychologist. Build an age-appropriate tournament mental preparation programme for this "
+        "{age}-year-old {position} in {sport}.",
+    "7. Hydration & Electrolyte Strategy":
+        "You are a sports nutrition and hydration specialist. Build a hydration strategy for {sport} at "
+        "{training_intensity} intensity, {training_frequency}, {training_duration} per session.",
+    "8. Pre-Match Visualization Techniques":
+        "You are a sports psychologist specialising in mental performance. Teach visualisation techniques to this "
+        "{age}-year-old {position} in {sport}.",
+    "9. Positional Decision-Making Drills":
+        "You are a professional {sport} coach. Design decision-making drills specific to a {position}, "
+        "at {training_intensity} intensity.",
+    "10. Mobility Workouts for Post-Injury Recovery":
+        "You are a sports physiotherapist and mobility specialist. Design a post-injury mobility programme for "
+        "{sport} around this injury history: {injury_focus}. Emphasise safety throughout.",
+}
+
+STRUCTURED_RULES = """
+Answer with JSON that follows the response schema. Keep every text field to short plain prose (no markdown, tables or HTML), and give every table row concrete values specific to this athlete. Keep all advice safe for their age, injury history and food allergies.
+"""
+
+STRUCTURED_TEMPLATES = {
+    name: PromptTemplate(f"{name} (json)", f"\n{brief}\n\n{{user_context}}\n{STRUCTURED_RULES}")
+    for name, brief in _STRUCTURED_BRIEFS.items()
+}
+if list(STRUCTURED_TEMPLATES) != feature_options:
+    raise ValueError("every feature in feature_options needs exactly one structured prompt")
+
+# ─────────────────────────────────────────────
+# RENDERING
+# ─────────────────────────────────────────────
+def get_template(feature):
+    return FEATURE_TEMPLATES.get(feature, FEATURE_TEMPLATES[DEFAULT_FEATURE])
+
+
+def build_prompt(profile, feature):
+    """Render the prompt for one feature."""
+    return get_template(feature).render(profile)
+
+
+def build_prompts(profile, features=None):
+    """Return {feature: prompt}, rendering only the requested features (all by default)."""
+    return {feature: build_prompt(profile, feature) for feature in (features or feature_options)}
+
+
+def build_structured_prompt(profile, feature):
+    """Prompt for the JSON mode; pair it with structured_output.response_schema(feature)."""
+    return STRUCTURED_TEMPLATES.get(feature, STRUCTURED_TEMPLATES[DEFAULT_FEATURE]).render(profile)
+
+
+def build_custom_prompt(user_query):
+    return CUSTOM_TEMPLATE.render({}, user_query=user_query)
+
+
+def build_context_prefix(profile):
+    """The shared, cacheable part of every feature prompt for this athlete."""
+    return CONTEXT_PREFIX_TEMPLATE.render(profile)
+
+
+def build_feature_delta(profile, feature):
+    """The feature-specific remainder sent after the cached prefix."""
+    return FEATURE_DELTA_TEMPLATES.get(feature, FEATURE_DELTA_TEMPLATES[DEFAULT_FEATURE]).render(profile)
+
+
+def context_fingerprint(profile):
+    """Changes exactly when a profile field used by the shared prefix changes."""
+    return CONTEXT_PREFIX_TEMPLATE.fingerprint(profile)
+
+
+def build_chat_prompt(user_query, conversation_summary, recent_turns):
+    """Prompt for a follow-up question; the first question of a chat uses build_custom_prompt."""
+    return CHAT_TEMPLATE.render({}, user_query=user_query,
+                                conversation_summary=conversation_summary or "(none yet)",
+                                recent_turns=recent_turns or "(none)")
+
+
+def build_chat_summary_prompt(conversation_summary, turns_text, summary_words):
+    return CHAT_SUMMARY_TEMPLATE.render({}, conversation_summary=conversation_summary or "(empty)",
+                                        recent_turns=turns_text, summary_words=summary_words)
+
+
+def build_library_seed(library_plan):
+    """Suffix that turns a feature prompt into "adapt this library plan" for a personalised profile."""
+    return LIBRARY_SEED_TEMPLATE.render({}, library_plan=library_plan)
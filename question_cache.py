@@ -0,0 +1,191 @@
+"""
+CoachBot AI - Similarity cache for Custom Coach questions
+Hashed n-gram TF-IDF vectors in NumPy, stored sparse; near-identical questions reuse an earlier answer.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+import numpy as np
+
+DEFAULT_INDEX_PATH = os.environ.get("COACHBOT_QUESTION_INDEX", "coachbot_questions.npz")
+DEFAULT_MAX_ENTRIES = int(os.environ.get("COACHBOT_QUESTION_MAX_ENTRIES", "1000"))
+DEFAULT_THRESHOLD = 0.85
+TEMPERATURE_TOLERANCE = 0.15
+DIMENSIONS = 2 ** 12
+
+_STOPWORDS = {"a", "an", "the", "to", "for", "of", "in", "on", "and", "or", "is", "are",
+              "what", "which", "how", "should", "can", "do", "i", "my", "me", "best", "get"}
+
+
+def normalize_question(question):
+    text = re.sub(r"[^a-z0-9\s]", " ", question.lower())
+    return " ".join(text.split())
+
+
+def _features(normalized):
+    """Word unigrams/bigrams (minus stopwords) plus character trigrams of each word."""
+    words = [w for w in normalized.split() if w not in _STOPWORDS] or normalized.split()
+    feats = list(words)
+    feats += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"#{w}#"
+        feats += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    return feats
+
+
+def vectorize(question):
+    """Sublinear term frequencies hashed into DIMENSIONS buckets (crc32 is stable across runs)."""
+    vec = np.zeros(DIMENSIONS, dtype=np.float32)
+    for feat in _features(normalize_question(question)):
+        vec[zlib.crc32(feat.encode("utf-8")) % DIMENSIONS] += 1.0
+    nz = vec > 0
+    vec[nz] = 1.0 + np.log(vec[nz])
+    return vec
+
+
+def _sparse(vec):
+    """(indices, values) of a vector's non-zero buckets."""
+    indices = np.flatnonzero(vec).astype(np.int32)
+    return indices, vec[indices].astype(np.float32)
+
+
+class QuestionCache:
+    """Fixed-size ring of (sparse tf vector, answer) pairs; IDF is applied at query time.
+
+    Each entry keeps only its non-zero buckets (a few dozen of DIMENSIONS), so the
+    index grows with the questions stored rather than being preallocated.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._loaded_mtime = None
+        self._reset()
+        self.stats = {"hits": 0, "misses": 0}
+        self._reload_if_changed()
+
+    def _reset(self):
+        self._rows = []        # per slot: (bucket indices int32, tf values float32)
+        self._entries = []     # per slot: {"question", "answer", "temperature", "added"}
+        self._next = 0
+        self._flat = None      # (row, index, value) of every slot, rebuilt after a change
+
+    @property
+    def size(self):
+        return len(self._entries)
+
+    def _reload_if_changed(self):
+        """Pick up answers other Streamlit processes have saved since we last looked."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        mtime = os.path.getmtime(self.path)
+        if mtime == self._loaded_mtime:
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if "tf" in data:           # dense index written by older versions
+                    rows = [_sparse(vec) for vec in data["tf"]]
+                else:
+                    bounds = data["offsets"]
+                    indices, values = data["indices"], data["values"]
+                    rows = [(indices[a:b], values[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        except (OSError, ValueError, KeyError):
+            return
+        self._reset()
+        count = min(len(meta["entries"]), len(rows), self.max_entries)
+        self._rows = rows[:count]
+        self._entries = meta["entries"][:count]
+        self._next = meta.get("next", count) % self.max_entries
+        self._loaded_mtime = mtime
+
+    def _save(self):
+        meta = json.dumps({"entries": self._entries, "next": self._next})
+        offsets = np.cumsum([0] + [len(indices) for indices, _ in self._rows])
+        tmp = f"{self.path}.tmp.npz"
+        np.savez_compressed(tmp, indices=np.concatenate([r[0] for r in self._rows]),
+                            values=np.concatenate([r[1] for r in self._rows]),
+                            offsets=offsets, meta=np.array(meta))
+        os.replace(tmp, self.path)
+        self._loaded_mtime = os.path.getmtime(self.path)
+
+    def _flatten(self):
+        if self._flat is None:
+            lengths = [len(indices) for indices, _ in self._rows]
+            self._flat = (np.repeat(np.arange(len(self._rows)), lengths),
+                          np.concatenate([r[0] for r in self._rows]),
+                          np.concatenate([r[1] for r in self._rows]))
+        return self._flat
+
+    def lookup(self, question, temperature, threshold=DEFAULT_THRESHOLD):
+        """Best earlier answer at a compatible temperature, or None.
+
+        Returns {"answer", "question", "similarity"} on a hit.
+        """
+        query = vectorize(question)
+        with self._lock:
+            self._reload_if_changed()
+            used = self.size
+            if not used or not query.any():
+                self.stats["misses"] += 1
+                return None
+            row, index, value = self._flatten()
+            df = np.bincount(index, minlength=DIMENSIONS)
+            idf = (np.log((1.0 + used) / (1.0 + df)) + 1.0).astype(np.float32)
+            weighted = value * idf[index]
+            q = query * idf
+            dots = np.bincount(row, weights=weighted * q[index], minlength=used)
+            norms = np.sqrt(np.bincount(row, weights=weighted * weighted, minlength=used)) * np.linalg.norm(q)
+            sims = np.divide(dots, norms, out=np.zeros(used), where=norms > 0)
+            temps = np.array([entry["temperature"] for entry in self._entries])
+            sims[np.abs(temps - temperature) > TEMPERATURE_TOLERANCE] = -1.0
+            best = int(np.argmax(sims))
+            if sims[best] < threshold:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            entry = self._entries[best]
+            return {"answer": entry["answer"], "question": entry["question"],
+                    "similarity": float(sims[best])}
+
+    def add(self, question, answer, temperature):
+        vec = vectorize(question)
+        if not vec.any():
+            return
+        with self._lock:
+            self._reload_if_changed()
+            # The ring fills slots 0..n-1 in order, then overwrites the oldest
+            slot = self._next
+            entry = {"question": question, "answer": answer,
+                     "temperature": temperature, "added": time.time()}
+            if slot < len(self._entries):
+                self._rows[slot], self._entries[slot] = _sparse(vec), entry
+            else:
+                self._rows.append(_sparse(vec))
+                self._entries.append(entry)
+            self._next = (slot + 1) % self.max_entries
+            self._flat = None
+            if self.path:
+                try:
+                    self._save()
+                except OSError:
+                    pass  # the in-memory index still serves this process
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_question_cache():
+    """Process-wide index (module globals survive Streamlit reruns)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = QuestionCache()
+        return _default_cache
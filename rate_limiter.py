@@ -0,0 +1,162 @@
+"""
+CoachBot AI - Client-side rate limiting
+Process-wide RPM/TPM token buckets plus jittered exponential backoff on 429/5xx.
+"""
+
+import os
+import random
+import threading
+import time
+
+DEFAULT_RPM = float(os.environ.get("COACHBOT_RPM", "60"))
+DEFAULT_TPM = float(os.environ.get("COACHBOT_TPM", "1000000"))
+DEFAULT_MAX_QUEUE = int(os.environ.get("COACHBOT_MAX_QUEUE", "32"))
+DEFAULT_MAX_WAIT = float(os.environ.get("COACHBOT_MAX_WAIT", "60"))
+DEFAULT_RETRIES = int(os.environ.get("COACHBOT_RETRIES", "4"))
+BASE_DELAY = 1.0
+MAX_DELAY = 30.0
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the wait queue is full or the request would wait longer than allowed."""
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute`; holds at most one minute's worth."""
+
+    def __init__(self, per_minute):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.available = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        rate = self.per_minute / 60.0
+        self.available = min(self.capacity, self.available + (now - self.updated) * rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / (self.per_minute / 60.0)
+
+    def take(self, amount):
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Every model request takes one request token and its estimated prompt tokens."""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, max_queue=DEFAULT_MAX_QUEUE,
+                 max_wait=DEFAULT_MAX_WAIT):
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.configure(rpm=rpm, tpm=tpm)
+
+    def configure(self, rpm=None, tpm=None):
+        """Change the quotas (0 disables that limit)."""
+        with self._lock:
+            if rpm is not None:
+                self.requests = TokenBucket(rpm) if rpm > 0 else None
+            if tpm is not None:
+                self.tokens = TokenBucket(tpm) if tpm > 0 else None
+
+    @property
+    def queued(self):
+        return self._waiting
+
+    def _wait_time(self, tokens, now):
+        wait = 0.0
+        if self.requests:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens and tokens:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        return wait
+
+    def acquire(self, tokens=0, on_queued=None):
+        """Block until the request fits the quota; returns seconds spent waiting.
+
+        on_queued(seconds) is called once if the request has to wait, so the UI can
+        say so. Raises RateLimitExceeded instead of queueing without bound.
+        """
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        notified = False
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                raise RateLimitExceeded("Too many requests are already queued.")
+            self._waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    wait = self._wait_time(tokens, now)
+                    if wait <= 0:
+                        if self.requests:
+                            self.requests.take(1)
+                        if self.tokens and tokens:
+                            self.tokens.take(tokens)
+                        return now - started
+                if now + wait > deadline:
+                    raise RateLimitExceeded(f"Request would wait more than {self.max_wait:.0f}s.")
+                if not notified and on_queued is not None:
+                    notified = True
+                    on_queued(wait)
+                time.sleep(wait)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+
+def is_retryable(error):
+    """429 and 5xx from google.api_core carry an HTTP `code`; fall back to the message."""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "unavailable" in message
+
+
+def call_with_retries(fn, limiter, tokens=0, on_queued=None, retries=DEFAULT_RETRIES, on_wait=None,
+                      on_send=None):
+    """Run fn() under the limiter, retrying 429/5xx with full-jitter exponential backoff.
+
+    on_wait(seconds), if given, is told about every limiter wait and backoff sleep;
+    on_send() is called right before each call to fn().
+    """
+    for attempt in range(retries + 1):
+        waited = limiter.acquire(tokens, on_queued)
+        if on_wait is not None:
+            on_wait(waited)
+        if on_send is not None:
+            on_send()
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2 ** attempt))
+            if on_queued is not None:
+                on_queued(delay)
+            if on_wait is not None:
+                on_wait(delay)
+            time.sleep(delay)
+
+
+_default_limiter = None
+_default_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Process-wide limiter shared by every session and worker thread."""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
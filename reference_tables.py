@@ -0,0 +1,198 @@
+"""
+CoachBot AI - Reference table layer
+Each table is built once per parameter set and reused across reruns.
+"""
+
+from functools import lru_cache, wraps
+
+
+def _frame(columns):
+    """pandas is imported on first use, so a cold start doesn't pay for it."""
+    import pandas as pd
+    return pd.DataFrame(columns)
+
+
+def _memoised(maxsize=None):
+    """lru_cache for a table builder, but every caller gets its own copy of the frame,
+    so editing a returned table can never change it for other sessions."""
+    def decorate(builder):
+        cached = lru_cache(maxsize=maxsize)(builder)
+
+        @wraps(builder)
+        def build(*args, **kwargs):
+            return cached(*args, **kwargs).copy()
+        build.cache_clear, build.cache_info = cached.cache_clear, cached.cache_info
+        return build
+    return decorate
+
+
+@_memoised()
+def create_weekly_training_table(intensity="Moderate"):
+    scores = {
+        "Low":       [4, 3, 5, 2, 4, 3, 1],
+        "Moderate":  [6, 5, 7, 3, 6, 4, 2],
+        "High":      [8, 6, 9, 4, 7, 5, 2],
+        "Very High": [9, 7, 10, 5, 8, 6, 2],
+    }.get(intensity, [6, 5, 7, 3, 6, 4, 2])
+    return _frame({
+        "Day":               ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"],
+        "Focus":             ["Strength Training","Cardio/Endurance","Sport-Specific Skills",
+                              "Recovery/Mobility","Strength + Conditioning","Light Cardio","Rest/Active Recovery"],
+        "Duration":          ["60 min","45 min","75 min","30 min","60 min","30 min","20 min"],
+        "Intensity (1-10)":  scores,
+    })
+
+@_memoised()
+def create_training_distribution_table():
+    return _frame({
+        "Training Type":   ["Strength Training","Cardio/Endurance","Skill Work",
+                            "Flexibility/Mobility","Rest/Recovery"],
+        "Percentage (%)":  [30, 25, 25, 10, 10],
+        "Hours per Week":  [3.0, 2.5, 2.5, 1.0, 1.0],
+    })
+
+@_memoised()
+def create_nutrition_table(calorie_goal="Maintenance"):
+    g, c = {
+        "Maintenance":            ("150g","280g","70g","2350 kcal"),
+        "Deficit (Weight Loss)":  ("140g","240g","60g","2000 kcal"),
+        "Surplus (Muscle Gain)":  ("180g","340g","85g","2800 kcal"),
+    }.get(calorie_goal, ("150g","280g","70g","2350 kcal")), None
+    vals = g
+    return _frame({
+        "Nutrient":       ["Protein","Carbohydrates","Fats","Total Calories"],
+        "Percentage":     ["30%","45%","25%","100%"],
+        "Grams per Day":  [vals[0], vals[1], vals[2], "—"],
+        "Calories":       ["varies","varies","varies", vals[3]],
+    })
+
+@_memoised()
+def create_weekly_meal_plan_table():
+    return _frame({
+        "Day":       ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"],
+        "Breakfast": ["Oatmeal + Eggs","Greek Yogurt + Fruits","Whole Grain Toast + Avocado",
+                      "Protein Smoothie","Scrambled Eggs + Veggies","Pancakes + Berries","Omelet + Toast"],
+        "Lunch":     ["Chicken + Rice + Veggies","Fish + Quinoa Salad","Turkey Wrap + Soup",
+                      "Pasta + Lean Meat","Grilled Chicken Salad","Rice Bowl + Protein","Sandwich + Fruit"],
+        "Dinner":    ["Salmon + Sweet Potato","Lean Beef + Brown Rice","Chicken Stir-fry",
+                      "Fish + Vegetables","Turkey + Quinoa","Grilled Chicken + Pasta","Lean Meat + Rice"],
+        "Snacks":    ["Protein Bar + Nuts","Fruit + Cheese","Hummus + Veggies",
+                      "Greek Yogurt","Trail Mix","Protein Shake","Fruit + Nut Butter"],
+    })
+
+@_memoised()
+def create_exercise_table():
+    return _frame({
+        "Exercise":   ["Squats","Bench Press","Deadlifts","Pull-ups",
+                       "Shoulder Press","Lunges","Rows","Core Work"],
+        "Sets":       [4, 4, 3, 3, 3, 3, 4, 3],
+        "Reps":       ["8-10","8-10","6-8","8-12","10-12","10 each leg","10-12","15-20"],
+        "Rest (sec)": [90, 90, 120, 90, 60, 60, 75, 45],
+        "Notes":      ["Focus on form","Control the weight","Keep back straight",
+                       "Use assistance if needed","Full range of motion","Maintain balance",
+                       "Squeeze at top","Engage core throughout"],
+    })
+
+@_memoised(maxsize=32)
+def create_progress_tracking_table(weeks=8, columns=None):
+    w  = list(range(1, weeks + 1))
+    s  = [20,30,42,55,65,75,82,90,93,95,97,99][:weeks]
+    e  = [25,35,45,58,68,76,84,92,94,96,98,99][:weeks]
+    k  = [30,38,48,58,68,76,83,89,91,93,95,97][:weeks]
+    bw = [70,70.5,71,71.2,71.5,71.8,72,72.2,72.3,72.4,72.5,72.6][:weeks]
+    notes = ["Baseline","Good progress","Increasing intensity","Maintaining form",
+             "Peak week","Recovery focus","Final push","Assessment week",
+             "Advanced","Near peak","Optimising","Elite"][:weeks]
+    df = _frame({
+        "Week": w, "Strength (%)": s, "Endurance (%)": e,
+        "Skill Level (%)": k, "Body Weight (kg)": bw, "Notes": notes,
+    })
+    return df[list(columns)] if columns else df
+
+@_memoised()
+def create_injury_recovery_table():
+    return _frame({
+        "Phase":      ["Week 1-2","Week 3-4","Week 5-6","Week 7-8","Week 9+"],
+        "Focus":      ["Pain Management","Gentle Movement","Strength Building",
+                       "Sport-Specific Work","Full Training"],
+        "Intensity":  ["Very Low (2-3/10)","Low (3-4/10)","Moderate (5-6/10)",
+                       "High (7-8/10)","Full (9-10/10)"],
+        "Activities": ["Ice, Rest, Gentle Stretching","Pool Work, Light Mobility",
+                       "Resistance Bands, Bodyweight","Light Sport Drills","Full Practice"],
+        "Red Flags":  ["Sharp pain, Swelling","Persistent pain","Limited ROM",
+                       "Pain during sport moves","Recurring issues"],
+    })
+
+
+@_memoised()
+def create_meal_calorie_table():
+    return _frame({
+        "Meal":       ["Breakfast","Lunch","Dinner","Snacks"],
+        "Calorie %":  [25, 30, 30, 15],
+    })
+
+@_memoised()
+def create_recovery_activity_table():
+    return _frame({
+        "Activity":  ["Stretching","Foam Rolling","Low Impact Cardio","Rest"],
+        "Time %":    [30, 20, 25, 25],
+    })
+
+@_memoised()
+def create_focus_distribution_table():
+    return _frame({
+        "Category":      ["Physical Training","Skill Development","Mental Training","Recovery"],
+        "Percentage %":  [40, 30, 15, 15],
+    })
+
+@lru_cache(maxsize=128)
+def table_html(builder, *args):
+    """Static HTML for a reference table — rendered once, then reused on every rerun."""
+    return builder(*args).to_html(index=False, border=0, classes="ref-table")
+
+def dashboard_layout(feature_type, training_intensity, calorie_goal, progress=None):
+    """Rows of (icon, title, builder, args) for the reference tables shown below a plan.
+
+    A row with two tables is drawn side by side; exports list every table in order.
+    progress, the (builder, args) of an athlete's logged progress table (see
+    training_log.progress_source), replaces the example progress tables.
+    """
+    rows = [[("📅", "Weekly Training Schedule", create_weekly_training_table, (training_intensity,))]]
+    if any(k in feature_type for k in ["Workout","Training Plan","Strength","Decision",
+                                        "Drill","Warm","Tactical","Mental","Visualization"]):
+        rows += [
+            [("💪", "Exercise Routine", create_exercise_table, ()),
+             ("📈", "Training Distribution", create_training_distribution_table, ())],
+            [("📊", "8-Week Progress Tracking", create_progress_tracking_table, (8,))],
+        ]
+    elif "Nutrition" in feature_type:
+        rows += [
+            [("🍽️", "Macro Breakdown", create_nutrition_table, (calorie_goal,)),
+             ("📋", "Meal Calorie Distribution", create_meal_calorie_table, ())],
+            [("🗓️", "Weekly Meal Plan", create_weekly_meal_plan_table, ())],
+        ]
+    elif any(k in feature_type for k in ["Recovery","Mobility","Hydration"]):
+        rows += [
+            [("🏥", "Recovery Timeline", create_injury_recovery_table, ())],
+            [("🧘", "Recovery Activities", create_recovery_activity_table, ()),
+             ("📊", "Progress Tracking", create_progress_tracking_table,
+              (8, ("Week","Strength (%)","Endurance (%)")))],
+        ]
+    else:
+        rows += [
+            [("📋", "Training Distribution", create_focus_distribution_table, ()),
+             ("📊", "Progress Tracking", create_progress_tracking_table,
+              (8, ("Week","Strength (%)","Skill Level (%)")))],
+        ]
+    if progress is not None:
+        rows = [row for row in ([entry for entry in row if entry[2] is not create_progress_tracking_table]
+                                for row in rows) if row]
+        rows.append([("📊", "Progress (Training Log)", *progress)])
+    return rows
+
+
+def dashboard_tables(feature_type, training_intensity, calorie_goal, progress=None):
+    """[(title, DataFrame)] for every reference table of the dashboard, in display order."""
+    return [(title, builder(*args))
+            for row in dashboard_layout(feature_type, training_intensity, calorie_goal, progress)
+            for _, title, builder, args in row]
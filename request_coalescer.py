@@ -0,0 +1,177 @@
+"""
+CoachBot AI - Coalescing of identical in-flight requests
+When a dozen athletes with the same profile press Generate together, only the
+first request goes to Gemini; the rest attach to it and receive the same chunks
+as they arrive. Keys are response-cache keys (normalised prompt + model + config).
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from gemini_client import (StreamingHtmlCleaner, describe_error, generate_text, is_truncated,
+                           routed_request, usage_from_response)
+from telemetry import get_metrics
+
+DEFAULT_MAX_IN_FLIGHT = int(os.environ.get("COACHBOT_MAX_IN_FLIGHT", "32"))
+EMPTY_RESPONSE = "⚠️ Response was blocked or empty. Please try again."
+
+
+class Flight:
+    """One model request in progress; any number of callers can follow its output."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._chunks = []
+        self.done = False
+        self.truncated = False
+        self.queued = None          # seconds the rate limiter made the request wait, if it did
+
+    # ── Producer side (the worker thread) ─
+    def queue(self, seconds):
+        with self._cond:
+            self.queued = seconds
+            self._cond.notify_all()
+
+    def append(self, chunk):
+        with self._cond:
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+
+    def finish(self, truncated=False):
+        with self._cond:
+            self.truncated = truncated
+            self.done = True
+            self._cond.notify_all()
+
+    # ── Consumer side (any session) ───────
+    def follow(self, on_queued=None):
+        """Yield every chunk so far, then new ones as they arrive, until the request is done.
+
+        A caller that stops iterating (rerun, closed tab) just detaches; the request
+        carries on for everyone else.
+        """
+        seen, told = 0, False
+        while True:
+            with self._cond:
+                while (seen == len(self._chunks) and not self.done
+                       and (told or self.queued is None or on_queued is None)):
+                    self._cond.wait()
+                chunks, done, queued = self._chunks[seen:], self.done, self.queued
+            if queued is not None and on_queued is not None and not told:
+                told = True
+                on_queued(queued)
+            seen += len(chunks)
+            yield from chunks
+            if done:
+                return
+
+    def result(self, on_queued=None):
+        """Block until done; returns (text, truncated)."""
+        text = "".join(self.follow(on_queued))
+        return text, self.truncated
+
+
+def _stream_into(flight, model, prompt, on_usage, feature):
+    """Streamed (and routed) generate_content, cleaned chunk by chunk into the flight."""
+    cleaner = StreamingHtmlCleaner()
+    produced = False
+
+    def on_text(text):
+        nonlocal produced
+        cleaned = cleaner.feed(text)
+        if cleaned:
+            produced = True
+            flight.append(cleaned)
+
+    try:
+        response = routed_request(model, prompt, stream=True, on_text=on_text,
+                                  on_queued=flight.queue, feature=feature)
+        tail = cleaner.flush()
+        if tail:
+            produced = True
+            flight.append(tail)
+
+        truncated = bool(response.candidates) and is_truncated(response.candidates[0])
+        if on_usage is not None:
+            on_usage(usage_from_response(response, truncated))
+        if not produced:
+            flight.append(EMPTY_RESPONSE)
+        return truncated
+    except Exception as e:
+        flight.append(("\n\n" if produced else "") + describe_error(e))
+        return False
+
+
+def _generate_into(flight, model, prompt, on_usage, feature):
+    text, truncated = generate_text(model, prompt, on_usage, on_queued=flight.queue, feature=feature)
+    flight.append(text)
+    return truncated
+
+
+class RequestCoalescer:
+    """Process-wide table of in-flight requests by key.
+
+    Every request runs on a worker thread, so it is not tied to the session that
+    started it. Failures arrive as the usual "⚠️" text to whoever is attached, and
+    a flight leaves the table before it finishes, so a failed (or finished) request
+    is never handed to later callers: they start a fresh one or hit the response cache.
+    on_usage and telemetry are recorded once per real model call, by the first caller.
+    """
+
+    def __init__(self, max_in_flight=DEFAULT_MAX_IN_FLIGHT):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="coachbot-flight")
+        self.stats = {"started": 0, "joined": 0}
+
+    def join(self, key, model, prompt, stream=True, on_usage=None, feature=None):
+        """Flight for this key: the one already running, or a new one started now.
+
+        key=None opts out of coalescing (the request always runs on its own).
+        """
+        with self._lock:
+            flight = self._flights.get(key) if key is not None else None
+            joined = flight is not None
+            if joined:
+                self.stats["joined"] += 1
+            else:
+                flight = Flight()
+                self.stats["started"] += 1
+                if key is not None:
+                    self._flights[key] = flight
+        if key is not None:
+            get_metrics().record_cache(feature, "inflight", joined)
+        if not joined:
+            self._pool.submit(self._run, key, flight, model, prompt, stream, on_usage, feature)
+        return flight
+
+    def _run(self, key, flight, model, prompt, stream, on_usage, feature):
+        truncated = False
+        try:
+            produce = _stream_into if stream else _generate_into
+            truncated = produce(flight, model, prompt, on_usage, feature)
+        except Exception as e:
+            flight.append(describe_error(e))   # e.g. a failing on_usage callback
+        finally:
+            with self._lock:
+                if key is not None and self._flights.get(key) is flight:
+                    del self._flights[key]
+            flight.finish(truncated)
+
+    @property
+    def in_flight(self):
+        return len(self._flights)
+
+
+_default_coalescer = None
+_default_lock = threading.Lock()
+
+
+def get_request_coalescer():
+    """Process-wide coalescer (module globals survive Streamlit reruns)."""
+    global _default_coalescer
+    with _default_lock:
+        if _default_coalescer is None:
+            _default_coalescer = RequestCoalescer()
+        return _default_coalescer
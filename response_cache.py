@@ -0,0 +1,134 @@
+"""
+CoachBot AI - Two-tier response cache
+In-process LRU (with TTL) in front of an on-disk SQLite store shared by all workers.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_DB_PATH = os.environ.get("COACHBOT_CACHE_DB", "coachbot_cache.sqlite3")
+DEFAULT_MAX_ENTRIES = int(os.environ.get("COACHBOT_CACHE_MAX_ENTRIES", "256"))
+DEFAULT_TTL_SECONDS = int(os.environ.get("COACHBOT_CACHE_TTL", str(7 * 24 * 3600)))
+
+# Config keys that don't change what a good answer looks like. max_output_tokens is
+# tuned per feature over time, and a budget change shouldn't empty the cache.
+IGNORED_CONFIG_KEYS = ("max_output_tokens",)
+
+
+def make_cache_key(prompt, model_name, generation_config):
+    """Hash the whitespace-normalised prompt together with the model + generation config."""
+    normalised = re.sub(r"\s+", " ", prompt).strip()
+    config = {k: v for k, v in (generation_config or {}).items() if k not in IGNORED_CONFIG_KEYS}
+    payload = json.dumps(
+        {"prompt": normalised, "model": model_name, "config": config},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Bounded LRU in memory, backed by SQLite so every Streamlit process shares results."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, max_entries=DEFAULT_MAX_ENTRIES,
+                 ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()          # key -> (stored_at, text)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    " key TEXT PRIMARY KEY, stored_at REAL NOT NULL, response TEXT NOT NULL)"
+                )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds and now - stored_at > self.ttl_seconds
+
+    def _remember(self, key, stored_at, text):
+        self._memory[key] = (stored_at, text)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Return the cached response text, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and not self._expired(entry[0], now):
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[1]
+            self._memory.pop(key, None)
+
+        row = None
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT stored_at, response FROM responses WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error:
+                row = None
+
+        with self._lock:
+            if row and not self._expired(row[0], now):
+                self._remember(key, row[0], row[1])
+                self.stats["disk_hits"] += 1
+                return row[1]
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, text):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, text)
+            self.stats["stores"] += 1
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, stored_at, response) VALUES (?, ?, ?)",
+                        (key, now, text),
+                    )
+                    if self.ttl_seconds:
+                        conn.execute("DELETE FROM responses WHERE stored_at < ?",
+                                     (now - self.ttl_seconds,))
+            except sqlite3.Error:
+                pass  # the in-memory tier still serves this process
+
+    def invalidate(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            except sqlite3.Error:
+                pass
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide cache instance (module globals survive Streamlit reruns)."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
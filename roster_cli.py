@@ -0,0 +1,225 @@
+"""
+CoachBot AI - Headless roster generation
+Generates plans for every athlete x feature in a roster CSV/JSONL without the web UI.
+
+Usage:
+    python roster_cli.py squad.csv --features 1,4,7 --output plans.jsonl
+    python roster_cli.py squad.jsonl --features all --parquet plans.parquet
+
+Roster columns (all optional except sport/position): id, name, age, gender, sport,
+position, fitness_level, injury_history, diet_type, allergies, calorie_goal,
+training_intensity, training_duration, training_frequency, specific_goal.
+With --training-log, each named athlete's recent workload from the training log
+(see training_log.py) is added to their profile.
+Results are appended to the JSONL output as they finish; re-running the same
+command skips athlete/feature pairs that already succeeded.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import datetime
+
+from batch_generation import generate_batch
+from context_cache import get_context_cache
+from gemini_client import (
+    DEFAULT_MODEL, configure_api_key, get_model, is_error_response, plan_generation_config,
+)
+from prompts import build_profile, build_prompt, feature_options
+from rate_limiter import get_rate_limiter
+from response_cache import make_cache_key
+from telemetry import get_metrics, write_metrics_file
+from token_budget import get_token_budgeter
+from training_log import TrainingLog, athlete_id as log_athlete_id
+
+
+def load_roster(path):
+    """Read athletes from a .csv or .jsonl file into a list of dicts.
+
+    Raises ValueError naming the row for unreadable rows, bad ages and duplicate ids.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = []
+            for i, line in enumerate((line for line in f if line.strip()), start=1):
+                try:
+                    rows.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f"row {i}: not a JSON object ({e})") from None
+        else:
+            rows = list(csv.DictReader(f))
+    athletes, seen = [], {}
+    for i, row in enumerate(rows, start=1):
+        row = {k.strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k}
+        if row.get("age") not in (None, ""):
+            row["age"] = parse_age(row["age"], i)
+        athlete_id = str(row.pop("id", "") or f"{i}-{row.get('name') or 'athlete'}")
+        if athlete_id in seen:
+            raise ValueError(f"row {i}: duplicate athlete id {athlete_id!r} (also row {seen[athlete_id]})")
+        seen[athlete_id] = i
+        athletes.append((athlete_id, build_profile(**{k: v for k, v in row.items() if v != ""})))
+    return athletes
+
+
+def parse_age(value, row_number):
+    """A whole-number age ("15" and spreadsheet-style "15.0" are fine, "fifteen" is not)."""
+    try:
+        age = float(value)
+    except (TypeError, ValueError):
+        age = None
+    if isinstance(value, bool) or age is None or not age.is_integer():
+        raise ValueError(f"row {row_number}: age must be a whole number, got {value!r}")
+    return int(age)
+
+
+def parse_features(spec):
+    if spec.strip().lower() == "all":
+        return list(feature_options)
+    features = []
+    for part in spec.split(","):
+        try:
+            number = int(part)
+        except ValueError:
+            raise ValueError(f"--features: {part.strip()!r} is not a feature number "
+                             f"(1-{len(feature_options)}) or 'all'") from None
+        if not 1 <= number <= len(feature_options):
+            raise ValueError(f"--features: feature number must be 1-{len(feature_options)}, got {number}")
+        features.append(feature_options[number - 1])
+    return features
+
+
+def load_completed(output_path):
+    """(athlete_id, feature) pairs already generated successfully in a previous run."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from an interrupted run
+            if not record.get("error"):
+                done.add((record["athlete_id"], record["feature"]))
+    return done
+
+
+def export_parquet(jsonl_path, parquet_path):
+    import pandas as pd
+    df = pd.read_json(jsonl_path, lines=True)
+    # A resumed run may have retried earlier failures — keep the latest attempt
+    df = df.drop_duplicates(["athlete_id", "feature"], keep="last")
+    df.to_parquet(parquet_path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate CoachBot plans for a whole roster.")
+    parser.add_argument("roster", help="Roster file (.csv or .jsonl)")
+    parser.add_argument("--features", default="all",
+                        help="Comma-separated feature numbers (1-10) or 'all'")
+    parser.add_argument("--output", default="coachbot_plans.jsonl", help="JSONL results log")
+    parser.add_argument("--parquet", help="Also write the results to this Parquet file")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent model requests")
+    parser.add_argument("--rpm", type=float, default=30, help="Max requests per minute (0 = no limit)")
+    parser.add_argument("--tpm", type=float, help="Max prompt tokens per minute (0 = no limit)")
+    parser.add_argument("--temperature", type=float, default=0.5)
+    parser.add_argument("--no-cache", action="store_true", help="Bypass the shared response cache")
+    parser.add_argument("--context-cache", action="store_true",
+                        help="Cache each athlete's profile prefix once and send only per-feature deltas")
+    parser.add_argument("--training-log", metavar="DIR",
+                        help="Add each athlete's logged training load (by name) to their prompt")
+    parser.add_argument("--metrics", help="Write request latency/token metrics (Prometheus text) here")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY"),
+                        help="Gemini API key (defaults to $GEMINI_API_KEY)")
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("no API key: pass --api-key or set GEMINI_API_KEY")
+    configure_api_key(args.api_key)
+    get_rate_limiter().configure(rpm=args.rpm, tpm=args.tpm)
+
+    try:
+        features = parse_features(args.features)
+    except ValueError as e:
+        parser.error(str(e))
+    try:
+        athletes = load_roster(args.roster)
+    except ValueError as e:
+        parser.error(f"{args.roster}: {e}")
+    if args.training_log:
+        log = TrainingLog(args.training_log)
+        for _, profile in athletes:
+            profile["training_load"] = log.load_summary(log_athlete_id(profile["name"]))
+    done = load_completed(args.output)
+
+    budgeter = get_token_budgeter()
+    jobs = {}
+    profiles = dict(athletes)
+    if args.context_cache and not get_context_cache().caches_profiles():
+        print("--context-cache ignored: athlete prefixes are below the backend's minimum for "
+              "cached content (COACHBOT_CONTEXT_CACHE_MIN_TOKENS)", file=sys.stderr)
+        args.context_cache = False
+    if args.context_cache:
+        # Every athlete's prefix is created up front, so it has to outlive the whole run
+        context = get_context_cache()
+        context.max_entries = max(context.max_entries, len(athletes))
+        if args.rpm:
+            run_seconds = len(athletes) * len(features) / args.rpm * 60
+            context.ttl_seconds = max(context.ttl_seconds, int(run_seconds) + 300)
+    for athlete_id, profile in athletes:
+        for feature in features:
+            if (athlete_id, feature) in done:
+                continue
+            config = plan_generation_config(args.temperature, budgeter.budget_for(feature))
+            if args.context_cache:
+                request = context.prepare(profile, feature, config, owner=athlete_id)
+                model, prompt, full_prompt = request.model, request.prompt, request.full_prompt
+            else:
+                model, prompt = get_model(DEFAULT_MODEL, config), build_prompt(profile, feature)
+                full_prompt = prompt
+            jobs[(athlete_id, feature)] = (model, prompt,
+                                           make_cache_key(full_prompt, DEFAULT_MODEL, config))
+
+    total = len(athletes) * len(features)
+    print(f"{len(athletes)} athletes x {len(features)} features: "
+          f"{total - len(jobs)} already done, {len(jobs)} to generate", file=sys.stderr)
+
+    failures = 0
+    with open(args.output, "a", encoding="utf-8") as out:
+        for count, ((athlete_id, feature), res) in enumerate(
+                generate_batch(jobs, max_workers=args.workers, use_cache=not args.no_cache,
+                               on_usage=lambda job, usage: budgeter.record(job[1], DEFAULT_MODEL, usage),
+                               feature_of=lambda job: job[1]),
+                start=1):
+            error = is_error_response(res["text"])
+            failures += error
+            out.write(json.dumps({
+                "athlete_id":   athlete_id,
+                "name":         profiles[athlete_id]["name"],
+                "feature":      feature,
+                "model":        DEFAULT_MODEL,
+                "temperature":  args.temperature,
+                "response":     res["text"],
+                "truncated":    res["truncated"],
+                "cached":       res["cached"],
+                "seconds":      round(res["seconds"], 3),
+                "error":        error,
+                "generated_at": datetime.now().isoformat(timespec="seconds"),
+            }, ensure_ascii=False) + "\n")
+            out.flush()
+            print(f"[{count}/{len(jobs)}] {'FAIL' if error else 'ok  '} {athlete_id} — {feature}",
+                  file=sys.stderr)
+
+    if args.context_cache:
+        context.clear()
+    if args.parquet:
+        export_parquet(args.output, args.parquet)
+    if args.metrics:
+        write_metrics_file(get_metrics(), args.metrics)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
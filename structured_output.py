@@ -0,0 +1,272 @@
+"""
+CoachBot AI - Structured (JSON) plan output
+An alternative to markdown tables: every feature has a response schema of short
+prose fields and typed table rows. Gemini answers with JSON that matches it, and
+the tables are built straight from the parsed rows with no markdown parsing; a
+markdown copy is kept for downloads, plan history and the plan pack.
+"""
+
+import json
+import math
+import re
+from collections import namedtuple
+
+from gemini_client import is_error_response
+from prompts import feature_options
+
+# kind is "text" or "table"; columns is ((key, title, type), ...) for tables
+Section = namedtuple("Section", "key kind title hint columns")
+
+_TYPES = {"str": "STRING", "int": "INTEGER", "num": "NUMBER"}
+
+INVALID_RESPONSE = ("⚠️ The structured plan could not be read (it may have been cut off by the "
+                    "length limit). Please try again, or turn off Structured Output.")
+
+
+def _slug(title):
+    return re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_")
+
+
+def _text(key, hint):
+    return Section(key, "text", None, hint, ())
+
+
+def _table(key, title, hint, columns):
+    """columns: "Day, Focus, Duration (min):int" - each column is text unless typed."""
+    parsed = []
+    for spec in columns.split(","):
+        name, _, kind = spec.strip().partition(":")
+        parsed.append((_slug(name), name, _TYPES[kind or "str"]))
+    return Section(key, "table", title, hint, tuple(parsed))
+
+
+# ── One layout per feature, mirroring the tables the markdown prompts ask for ──
+FEATURE_LAYOUTS = {
+    "1. Full-Body Workout Plan for [Position] in [Sport]": (
+        _text("approach", "2-3 short paragraphs on the approach and why it suits the athlete's position and sport."),
+        _table("weekly_schedule", "Weekly Schedule", "One row per day, Monday to Sunday.",
+               "Day, Focus, Key Exercises, Sets x Reps, Duration (min):int"),
+        _text("progression", "1-2 short paragraphs on progressive overload."),
+        _table("exercises", "Exercise Details", "6-8 exercises.",
+               "Exercise, Sets:int, Reps, Rest (s):int, Technique Tip"),
+        _text("recovery", "1 short paragraph of recovery advice for the athlete's age."),
+    ),
+    "2. Safe Recovery Training Schedule for Athlete with [Injury]": (
+        _text("approach", "2-3 short paragraphs on the recovery approach and safety principles."),
+        _table("phases", "Recovery Phases", "4-5 phases in order.",
+               "Phase, Weeks, Focus, Key Exercises, Load Level, Duration per Day (min):int"),
+        _text("warning_signs", "1-2 short paragraphs on warning signs."),
+        _table("avoid", "Exercises to Avoid", "5-6 exercises.",
+               "Exercise to Avoid, Reason, Safe Alternative"),
+        _text("return_criteria", "1 short paragraph on return criteria."),
+    ),
+    "3. Tactical Coaching Tips to Improve [Skill] in [Sport]": (
+        _text("responsibilities", "2-3 short paragraphs on the position's tactical responsibilities and the skills to develop."),
+        _table("scenarios", "Key Tactical Scenarios", "5-7 scenarios.",
+               "Situation, What To Read, Best Response, Common Mistake"),
+        _text("game_intelligence", "1-2 short paragraphs on game intelligence and communication with teammates."),
+        _table("drills", "Training Drills", "4-6 drills.",
+               "Drill Name, Duration (min):int, Players Needed:int, Instructions, KPI to Measure"),
+        _text("study_the_game", "1 short paragraph on professional examples and how to study the game."),
+    ),
+    "4. Week-Long Nutrition Guide for Young Athlete": (
+        _text("approach", "2-3 short paragraphs on the nutritional approach, macro split for the calorie goal, and the diet type and allergies."),
+        _table("macros", "Daily Macronutrients", "Protein, carbohydrates and fats.",
+               "Nutrient, Grams per Day:int, Share of Total (%):int, Calories:int, Best Sources"),
+        _text("meal_timing", "1-2 short paragraphs on meal timing around training."),
+        _table("meal_plan", "Weekly Meal Plan", "One row per day, Monday to Sunday, suited to the diet type and allergies.",
+               "Day, Breakfast, Lunch, Dinner, Snacks, Total (kcal):int"),
+        _text("hydration_and_shopping", "1 short paragraph on hydration and grocery tips."),
+    ),
+    "5. Personalized Warm-up & Cooldown Routine": (
+        _text("why_warm_up", "2 short paragraphs on why a proper warm-up matters for the position and how the injury history affects it."),
+        _table("warm_up", "Dynamic Warm-up", "6-8 exercises.",
+               "Exercise, Duration, Sets:int, Purpose, Injury Modification"),
+        _text("activation", "1 short paragraph on the sport-specific activation phase."),
+        _table("cooldown", "Cooldown & Stretching", "5-7 exercises.",
+               "Exercise, Hold Duration, Target Muscle, Benefit, Notes"),
+        _text("recovery", "1 short paragraph on foam rolling and breathing for recovery."),
+    ),
+    "6. Mental Focus Routines for Tournaments": (
+        _text("challenges", "2-3 short paragraphs on the mental challenges of tournament play and the overall approach."),
+        _table("pre_tournament", "Pre-Tournament Timeline", "5-7 steps, furthest from the tournament first.",
+               "Days Before, Mental Activity, Duration, Goal, How To Do It"),
+        _text("anxiety", "1-2 short paragraphs on managing nerves and building confidence."),
+        _table("match_day", "Match-Day Mental Routine", "5-7 steps in time order.",
+               "Time, Activity, Duration, Purpose, Technique"),
+        _text("reflection", "1 short paragraph on post-performance reflection and positive self-talk."),
+    ),
+    "7. Hydration & Electrolyte Strategy": (
+        _text("why_hydration", "2-3 short paragraphs on why hydration matters at this intensity and the daily targets for the athlete's age."),
+        _table("daily_schedule", "Daily Hydration Schedule", "6-8 times of day.",
+               "Time of Day, Amount (ml):int, Drink Type, Purpose, Notes"),
+        _text("electrolytes", "1-2 short paragraphs on electrolytes, sports drinks vs water, and weather adjustments."),
+        _table("training_protocol", "Training Hydration Protocol", "Before, during and after training.",
+               "Phase, Timing, Amount, Electrolytes Needed, Warning Signs"),
+        _text("tips", "1 short paragraph on spotting dehydration early and staying consistent."),
+    ),
+    "8. Pre-Match Visualization Techniques": (
+        _text("introduction", "2-3 short paragraphs on what visualisation is and how this position benefits before matches."),
+        _table("timeline", "Visualisation Timeline", "4-6 steps, furthest from the match first.",
+               "Time Before Match, Activity, Duration, What to Visualise, Expected Benefit"),
+        _text("breathing", "1-2 short paragraphs on combining breathing with imagery and handling negative thoughts."),
+        _table("scenarios", "Position-Specific Scenarios", "4-6 scenarios.",
+               "Scenario, What to See, What to Feel, Outcome to Imagine"),
+        _text("script", "A sample 5-minute visualisation script for the position."),
+    ),
+    "9. Positional Decision-Making Drills": (
+        _text("demands", "2-3 short paragraphs on the position's decision-making demands and the cognitive skills to develop."),
+        _table("core_drills", "Core Drills", "4-6 drills.",
+               "Drill Name, Duration (min):int, Players Needed:int, Instructions, Progression, KPI"),
+        _text("solo_practice", "1-2 short paragraphs on solo decision-making practice and habits between sessions."),
+        _table("game_scenarios", "Game Scenarios", "5-7 scenarios.",
+               "Situation, Options Available, Best Decision, Why, Common Error"),
+        _text("tracking", "1 short paragraph on tracking improvement and fitting the drills into team sessions."),
+    ),
+    "10. Mobility Workouts for Post-Injury Recovery": (
+        _text("approach", "2-3 short paragraphs on mobility for this sport, how the injury history shapes the programme, and safe progression."),
+        _table("phases", "Phase-by-Phase Plan", "4-5 phases in order.",
+               "Phase, Weeks, Focus, Key Exercises, Load, Daily Duration (min):int"),
+        _text("avoid_and_pain", "1-2 short paragraphs on exercises to avoid, pain management and when to seek professional support."),
+        _table("daily_routine", "Daily Mobility Routine", "6-8 exercises.",
+               "Exercise, Sets:int, Duration/Reps, Target Area, Technique Notes, Avoid If"),
+        _text("return_to_sport", "1 short paragraph on return-to-sport mobility standards."),
+    ),
+}
+if list(FEATURE_LAYOUTS) != feature_options:
+    raise ValueError("every feature in feature_options needs exactly one structured layout")
+
+
+def _schema(layout):
+    properties = {}
+    for section in layout:
+        if section.kind == "text":
+            properties[section.key] = {"type": "STRING", "description": section.hint}
+        else:
+            properties[section.key] = {
+                "type": "ARRAY",
+                "description": section.hint,
+                "items": {
+                    "type": "OBJECT",
+                    "properties": {key: {"type": kind} for key, _, kind in section.columns},
+                    "required": [key for key, _, _ in section.columns],
+                },
+            }
+    return {"type": "OBJECT", "properties": properties, "required": list(properties)}
+
+
+# Built once at import; part of the generation config (and so of every cache key)
+RESPONSE_SCHEMAS = {feature: _schema(layout) for feature, layout in FEATURE_LAYOUTS.items()}
+
+
+def get_layout(feature):
+    return FEATURE_LAYOUTS.get(feature, FEATURE_LAYOUTS[feature_options[0]])
+
+
+def response_schema(feature):
+    return RESPONSE_SCHEMAS.get(feature, RESPONSE_SCHEMAS[feature_options[0]])
+
+
+# ─────────────────────────────────────────────
+# PARSING
+# ─────────────────────────────────────────────
+def _cell(value, kind):
+    if value is None:
+        return None
+    if kind == "STRING":
+        return str(value).strip()
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number):        # json.loads accepts NaN and Infinity
+        return None
+    return int(number) if kind == "INTEGER" else number
+
+
+def parse_structured(text, feature):
+    """{section key: text or list of row dicts} from a JSON response, or None if it is not one.
+
+    Missing fields become empty rather than failing the whole plan; a response that
+    is not a JSON object (an error, or JSON cut off by the token limit) gives None.
+    """
+    text = (text or "").strip()
+    if text.startswith("```"):
+        text = text.strip("`").removeprefix("json").strip()
+    try:
+        raw = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(raw, dict):
+        return None
+    data = {}
+    for section in get_layout(feature):
+        value = raw.get(section.key)
+        if section.kind == "text":
+            data[section.key] = str(value).strip() if value is not None else ""
+        else:
+            rows = value if isinstance(value, list) else []
+            data[section.key] = [{key: _cell(row.get(key), kind) for key, _, kind in section.columns}
+                                 for row in rows if isinstance(row, dict)]
+    return data
+
+
+def read_structured(text, feature):
+    """(markdown text, data) for a raw JSON response; data is None if it cannot be used."""
+    data = parse_structured(text, feature)
+    if data is None:
+        return (text if is_error_response(text) else INVALID_RESPONSE), None
+    return structured_to_markdown(data, feature), data
+
+
+# ─────────────────────────────────────────────
+# RENDERING
+# ─────────────────────────────────────────────
+def _dataframe(section, rows):
+    import pandas as pd  # deferred, as in markdown_tables
+    columns = {}
+    for key, title, kind in section.columns:
+        values = [row.get(key) for row in rows]
+        if kind == "INTEGER":
+            columns[title] = pd.array(values, dtype="Int64")
+        elif kind == "NUMBER":
+            columns[title] = pd.array(values, dtype="Float64")
+        else:
+            columns[title] = [value or "" for value in values]
+    return pd.DataFrame(columns)
+
+
+def structured_blocks(data, feature):
+    """[(kind, block)] like markdown_tables.split_response: prose strings and DataFrames."""
+    blocks = []
+    for section in get_layout(feature):
+        value = data.get(section.key)
+        if section.kind == "text":
+            if value:
+                blocks.append(("text", value))
+        elif value:
+            blocks.append(("text", f"**{section.title}**"))
+            blocks.append(("table", _dataframe(section, value)))
+    return blocks
+
+
+def _markdown_cell(value):
+    return "" if value is None else str(value).replace("|", "\\|").replace("\n", " ")
+
+
+def structured_to_markdown(data, feature):
+    """The same plan as prose + pipe tables, for downloads, history and the plan library."""
+    parts = []
+    for section in get_layout(feature):
+        value = data.get(section.key)
+        if section.kind == "text":
+            if value:
+                parts.append(value)
+        elif value:
+            lines = [f"**{section.title}**", "",
+                     "| " + " | ".join(title for _, title, _ in section.columns) + " |",
+                     "|" + "|".join("---" for _ in section.columns) + "|"]
+            lines += ["| " + " | ".join(_markdown_cell(row.get(key)) for key, _, _ in section.columns) + " |"
+                      for row in value]
+            parts.append("\n".join(lines))
+    return "\n\n".join(parts)
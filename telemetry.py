@@ -0,0 +1,285 @@
+"""
+CoachBot AI - Request telemetry
+Latency, token and cache metrics per feature and model, exported in the Prometheus
+text format to a local metrics file and (optionally) a /metrics HTTP endpoint.
+"""
+
+import contextlib
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_FILE = os.environ.get("COACHBOT_METRICS_FILE", "coachbot_metrics.prom")
+METRICS_PORT = int(os.environ.get("COACHBOT_METRICS_PORT", "0"))     # 0 = no HTTP endpoint
+METRICS_INTERVAL = float(os.environ.get("COACHBOT_METRICS_INTERVAL", "15"))
+STARTUP_TIMING = os.environ.get("COACHBOT_STARTUP_TIMING", "") not in ("", "0")
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80)
+UNKNOWN = "unknown"
+
+# name -> (type, help)
+METRICS = {
+    "coachbot_prompt_build_seconds":        ("histogram", "Time to render a prompt from the profile."),
+    "coachbot_queue_wait_seconds":          ("histogram", "Time a model request waited on the rate limiter and retry backoff."),
+    "coachbot_time_to_first_token_seconds": ("histogram", "Time from sending a request to its first text (whole response when not streaming)."),
+    "coachbot_generation_seconds":          ("histogram", "Total model request time, queue wait excluded."),
+    "coachbot_render_seconds":              ("histogram", "Time spent rendering a phase of the page."),
+    "coachbot_startup_seconds":             ("histogram", "First script run of a process: module imports and the whole run."),
+    "coachbot_script_run_seconds":          ("histogram", "Full script runs (reruns included)."),
+    "coachbot_export_build_seconds":        ("histogram", "Background builds of a plan export (PDF, XLSX, CSV/Parquet zip) by result."),
+    "coachbot_requests_total":              ("counter", "Model requests by finish reason (ERROR if the call failed, CANCELLED if it lost a hedge)."),
+    "coachbot_prompt_tokens_total":         ("counter", "Prompt tokens reported by usage_metadata."),
+    "coachbot_output_tokens_total":         ("counter", "Output tokens reported by usage_metadata."),
+    "coachbot_thoughts_tokens_total":       ("counter", "Thinking tokens reported by usage_metadata."),
+    "coachbot_cached_tokens_total":         ("counter", "Prompt tokens served from cached content (explicit or implicit)."),
+    "coachbot_route_events_total":          ("counter", "Model routing: won, hedged, failover, cancelled, skipped (breaker open), breaker_open."),
+    "coachbot_cache_requests_total":        ("counter", "Response, similar-question, in-flight (coalesced) and plan-library lookups by result."),
+}
+
+
+def model_label(model):
+    """'models/gemini-2.5-flash' (or a GenerativeModel) -> 'gemini-2.5-flash'."""
+    name = model if isinstance(model, str) else getattr(model, "model_name", None)
+    return (name or UNKNOWN).split("/")[-1]
+
+
+def finish_reason_label(candidate):
+    """Enum name of a candidate's finish_reason, e.g. STOP, MAX_TOKENS, SAFETY."""
+    reason = getattr(candidate, "finish_reason", None)
+    if reason is None:
+        return UNKNOWN
+    name = getattr(reason, "name", None) or str(reason)
+    return name.split(".")[-1].upper()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels, extra=None):
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=SECONDS_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.total += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms keyed by metric name + sorted label pairs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)     # (name, labels) -> value
+        self._histograms = {}                   # (name, labels) -> Histogram
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def record_cache(self, feature, cache, hit):
+        self.inc("coachbot_cache_requests_total", feature=feature or UNKNOWN, cache=cache,
+                 result="hit" if hit else "miss")
+
+    def render(self):
+        """Everything recorded so far in the Prometheus text exposition format."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (h.buckets, list(h.counts), h.total, h.count)
+                          for key, h in self._histograms.items()}
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            if kind == "counter":
+                series = sorted((labels, value) for (n, labels), value in counters.items() if n == name)
+            else:
+                series = sorted((labels, h) for (n, labels), h in histograms.items() if n == name)
+            if not series:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in series:
+                if kind == "counter":
+                    lines.append(f"{name}{_labels(labels)} {value:g}")
+                    continue
+                buckets, counts, total, count = value
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{_labels(labels, ('le', f'{bound:g}'))} {bucket_count}")
+                lines.append(f"{name}_bucket{_labels(labels, ('le', '+Inf'))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {total:.6f}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestSpan:
+    """Measurements for one model request; finish() or fail() records them exactly once."""
+
+    def __init__(self, registry, feature, model):
+        self.registry = registry
+        self.labels = {"feature": feature or UNKNOWN, "model": model_label(model)}
+        self.started = time.perf_counter()
+        self.queue_wait = 0.0
+        self.first_token_at = None
+        self._done = False
+
+    def add_queue_wait(self, seconds):
+        self.queue_wait += seconds
+
+    def first_token(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+
+    def _close(self, finish_reason):
+        if self._done:
+            return False
+        self._done = True
+        ended = time.perf_counter()
+        first = self.first_token_at or ended
+        registry, labels = self.registry, self.labels
+        registry.observe("coachbot_queue_wait_seconds", self.queue_wait, **labels)
+        registry.observe("coachbot_time_to_first_token_seconds",
+                         max(0.0, first - self.started - self.queue_wait), **labels)
+        registry.observe("coachbot_generation_seconds",
+                         max(0.0, ended - self.started - self.queue_wait), **labels)
+        registry.inc("coachbot_requests_total", finish_reason=finish_reason, **labels)
+        return True
+
+    def finish(self, finish_reason, usage=None):
+        """usage is gemini_client.usage_from_response()."""
+        if not self._close(finish_reason) or not usage:
+            return
+        self.registry.inc("coachbot_prompt_tokens_total", usage["prompt_tokens"], **self.labels)
+        self.registry.inc("coachbot_output_tokens_total", usage["output_tokens"], **self.labels)
+        self.registry.inc("coachbot_thoughts_tokens_total", usage["thoughts_tokens"], **self.labels)
+        self.registry.inc("coachbot_cached_tokens_total", usage.get("cached_tokens", 0), **self.labels)
+
+    def fail(self):
+        self._close("ERROR")
+
+    def cancel(self):
+        """The request lost a hedge and was abandoned."""
+        self._close("CANCELLED")
+
+
+# ─────────────────────────────────────────────
+# EXPORT
+# ─────────────────────────────────────────────
+def write_metrics_file(registry, path):
+    """Atomically replace `path` (node_exporter textfile collectors read this format)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(registry.render())
+    os.replace(tmp, path)
+
+
+def _file_writer(registry, path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_metrics_file(registry, path)
+        except OSError:
+            pass
+
+
+def _serve(registry, port):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="coachbot-metrics").start()
+    return server
+
+
+_registry = MetricsRegistry()
+_exporter_lock = threading.Lock()
+_exporter_started = False
+_cold_run_recorded = False
+
+
+def get_metrics():
+    """Process-wide registry (module globals survive Streamlit reruns)."""
+    return _registry
+
+
+def start_request(feature, model):
+    return RequestSpan(_registry, feature, model)
+
+
+def record_script_run(import_seconds, total_seconds):
+    """Time one full app.py run; the first one in a process is recorded as the cold start.
+
+    Returns True for that first run. With COACHBOT_STARTUP_TIMING=1 the cold start is
+    also printed to stderr, so release-over-release numbers can be read off the logs.
+    """
+    global _cold_run_recorded
+    _registry.observe("coachbot_script_run_seconds", total_seconds)
+    with _exporter_lock:
+        cold, _cold_run_recorded = not _cold_run_recorded, True
+    if cold:
+        _registry.observe("coachbot_startup_seconds", import_seconds, phase="imports")
+        _registry.observe("coachbot_startup_seconds", total_seconds, phase="first_run")
+        if STARTUP_TIMING:
+            print(f"coachbot startup: imports {import_seconds * 1000:.0f} ms, "
+                  f"first run {total_seconds * 1000:.0f} ms", file=sys.stderr)
+    return cold
+
+
+def start_exporter(path=METRICS_FILE, port=METRICS_PORT, interval=METRICS_INTERVAL):
+    """Start the metrics file writer and HTTP endpoint once per process."""
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+    if path:
+        threading.Thread(target=_file_writer, args=(_registry, path, interval),
+                         daemon=True, name="coachbot-metrics-file").start()
+    if port:
+        try:
+            _serve(_registry, port)
+        except OSError:
+            pass  # another worker process already serves this port
@@ -0,0 +1,21 @@
+from markdown_tables import table_to_dataframe
+
+
+def column(*values, name="Amount"):
+    df = table_to_dataframe([name], [[value] for value in values])
+    return df.columns[0], df.iloc[:, 0].tolist()
+
+
+def test_comma_groups_thousands():
+    assert column("2,350 kcal", "1,800 kcal") == ("Amount (kcal)", [2350, 1800])
+    assert column("1,500 ml") == ("Amount (ml)", [1500])
+    assert column("12,500.5 g") == ("Amount (g)", [12500.5])
+
+
+def test_decimal_comma():
+    assert column("1,5 L", "2 L") == ("Amount (l)", [1.5, 2.0])
+
+
+def test_ambiguous_commas_stay_text():
+    assert column("1,5", "2,350") == ("Amount", ["1,5", "2,350"])
+    assert column("1234,567") == ("Amount", ["1234,567"])
@@ -0,0 +1,19 @@
+from reference_tables import create_exercise_table, create_progress_tracking_table, table_html
+
+
+def test_edits_do_not_reach_the_next_caller():
+    table = create_exercise_table()
+    table.loc[0, "Exercise"] = "Changed"
+    table["Extra"] = 1
+    fresh = create_exercise_table()
+    assert fresh.loc[0, "Exercise"] == "Squats"
+    assert "Extra" not in fresh.columns
+    assert "Changed" not in table_html(create_exercise_table)
+
+
+def test_column_subsets_are_independent_too():
+    columns = ("Week", "Strength (%)")
+    table = create_progress_tracking_table(8, columns)
+    table.iloc[0, 1] = -1
+    assert create_progress_tracking_table(8, columns).iloc[0, 1] == 20
+    assert create_progress_tracking_table(8).iloc[0, 1] == 20
@@ -0,0 +1,176 @@
+"""
+CoachBot AI - Token budgets
+Per-feature max_output_tokens that adapt to recorded usage, plus pre-flight prompt counting.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from prompts import feature_options
+from response_cache import DEFAULT_DB_PATH
+
+MAX_OUTPUT_TOKENS = 8192
+MIN_OUTPUT_TOKENS = 1024
+BUDGET_STEP = 256           # budgets are rounded so the model registry stays small
+HEADROOM = 1.3              # budget = p95 observed output x headroom
+HISTORY_WINDOW = 100        # observations kept per feature
+MIN_SAMPLES = 5             # don't tune a budget from fewer observations than this
+RECOMPUTE_EVERY = 10        # re-tune after this many new observations
+CUSTOM_FEATURE = "Custom Coach"
+
+# Starting ceilings before any usage is recorded. gemini-2.5-flash spends part of
+# max_output_tokens on thinking, so these leave room above the visible answer.
+DEFAULT_BUDGETS = dict(zip(feature_options, [
+    8192,   # Full-body workout: 7-day table + exercise table
+    6144,   # Recovery schedule
+    6144,   # Tactical tips
+    8192,   # Week-long nutrition: 7-day meal plan
+    4096,   # Warm-up & cooldown
+    6144,   # Mental focus
+    4096,   # Hydration
+    6144,   # Visualisation
+    6144,   # Decision-making drills
+    6144,   # Post-injury mobility
+]))
+DEFAULT_BUDGETS[CUSTOM_FEATURE] = 4096
+
+
+def _round_budget(tokens):
+    tokens = -(-int(tokens) // BUDGET_STEP) * BUDGET_STEP
+    return max(MIN_OUTPUT_TOKENS, min(MAX_OUTPUT_TOKENS, tokens))
+
+
+class TokenBudgeter:
+    """Tracks usage_metadata per feature and derives each feature's output budget from it."""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._history = defaultdict(lambda: deque(maxlen=HISTORY_WINDOW))
+        self._since_recompute = defaultdict(int)
+        self._budgets = dict(DEFAULT_BUDGETS)
+        self._prompt_counts = OrderedDict()    # prompt hash -> token count
+        self._counter = ThreadPoolExecutor(max_workers=2, thread_name_prefix="coachbot-count")
+        if self.db_path:
+            self._load()
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _load(self):
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS token_usage ("
+                    " feature TEXT NOT NULL, model TEXT NOT NULL, prompt_tokens INTEGER,"
+                    " output_tokens INTEGER, thoughts_tokens INTEGER, truncated INTEGER,"
+                    " recorded_at REAL NOT NULL)"
+                )
+                rows = conn.execute(
+                    "SELECT feature, output_tokens, thoughts_tokens, truncated FROM ("
+                    " SELECT *, ROW_NUMBER() OVER (PARTITION BY feature ORDER BY recorded_at DESC) AS n"
+                    " FROM token_usage) WHERE n <= ? ORDER BY recorded_at",
+                    (HISTORY_WINDOW,),
+                ).fetchall()
+        except sqlite3.Error:
+            return
+        for feature, output, thoughts, truncated in rows:
+            self._history[feature].append(((output or 0) + (thoughts or 0), bool(truncated)))
+        for feature in list(self._history):
+            self._recompute(feature)
+
+    def budget_for(self, feature):
+        with self._lock:
+            return self._budgets.get(feature, MAX_OUTPUT_TOKENS)
+
+    def record(self, feature, model_name, usage):
+        """Record one response's usage (see gemini_client.usage_from_response)."""
+        spent = usage["output_tokens"] + usage["thoughts_tokens"]
+        if not spent and not usage["truncated"]:
+            return  # no usage_metadata on this response; nothing to learn from
+        with self._lock:
+            self._history[feature].append((spent, usage["truncated"]))
+            self._since_recompute[feature] += 1
+            if usage["truncated"]:
+                # Hit the ceiling: raise it straight away rather than waiting for p95
+                current = self._budgets.get(feature, MAX_OUTPUT_TOKENS)
+                self._budgets[feature] = _round_budget(current * 1.5)
+                self._since_recompute[feature] = 0
+            elif self._since_recompute[feature] >= RECOMPUTE_EVERY:
+                self._recompute(feature)
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT INTO token_usage VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (feature, model_name, usage["prompt_tokens"], usage["output_tokens"],
+                         usage["thoughts_tokens"], int(usage["truncated"]), time.time()),
+                    )
+            except sqlite3.Error:
+                pass
+
+    def _recompute(self, feature):
+        history = self._history[feature]
+        self._since_recompute[feature] = 0
+        if len(history) < MIN_SAMPLES:
+            return
+        spent = sorted(tokens for tokens, _ in history)
+        p95 = spent[min(len(spent) - 1, int(0.95 * len(spent)))]
+        budget = _round_budget(p95 * HEADROOM)
+        if any(truncated for _, truncated in list(history)[-RECOMPUTE_EVERY:]):
+            budget = max(budget, self._budgets.get(feature, MAX_OUTPUT_TOKENS))
+        self._budgets[feature] = budget
+
+    def stats(self, feature):
+        with self._lock:
+            history = list(self._history[feature])
+            budget = self._budgets.get(feature, MAX_OUTPUT_TOKENS)
+        return {
+            "budget":    budget,
+            "samples":   len(history),
+            "avg_spent": sum(t for t, _ in history) / len(history) if history else 0,
+            "truncated": sum(1 for _, tr in history if tr),
+        }
+
+    def count_prompt_tokens(self, model, prompt):
+        """Pre-flight count_tokens, run off-thread so it never delays generation.
+
+        Returns a Future resolving to the token count (or None if counting failed).
+        """
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        with self._lock:
+            if key in self._prompt_counts:
+                self._prompt_counts.move_to_end(key)
+                done = Future()
+                done.set_result(self._prompt_counts[key])
+                return done
+
+        def _count():
+            try:
+                total = model.count_tokens(prompt).total_tokens
+            except Exception:
+                return None
+            with self._lock:
+                self._prompt_counts[key] = total
+                while len(self._prompt_counts) > 512:
+                    self._prompt_counts.popitem(last=False)
+            return total
+
+        return self._counter.submit(_count)
+
+
+_default_budgeter = None
+_default_lock = threading.Lock()
+
+
+def get_token_budgeter():
+    """Process-wide budgeter (module globals survive Streamlit reruns)."""
+    global _default_budgeter
+    with _default_lock:
+        if _default_budgeter is None:
+            _default_budgeter = TokenBudgeter()
+        return _default_budgeter
@@ -0,0 +1,524 @@
+"""
+CoachBot AI - Athlete training log and workload analytics
+Sessions (date, duration, RPE, intensity, body weight) are appended per athlete as
+small Parquet segments. A per-athlete daily table with the workload metrics
+(session-RPE load, weekly load, acute:chronic workload ratio, rolling averages) is
+updated incrementally: a new session only recomputes the days from its date on,
+using the 27 days before it. The table is snapshotted next to the segments, so a
+restart reads one file plus the few segments logged since.
+
+Usage:
+    python training_log.py import club_sessions.csv
+    python training_log.py overview --as-of 2026-10-16
+
+Import columns: athlete, date, duration_min, rpe (0-10), and optionally intensity
+and body_weight_kg.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+DEFAULT_LOG_DIR = os.environ.get("COACHBOT_TRAINING_LOG", "coachbot_training_log")
+# The in-app Club Overview shows every athlete's log to whoever opens the tab, so it is
+# off unless a coach/admin deployment turns it on (the CLI overview is always available)
+CLUB_OVERVIEW_ENABLED = os.environ.get("COACHBOT_CLUB_OVERVIEW", "") not in ("", "0")
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+# Williams et al. EWMA variant of the ratio: lambda = 2 / (N + 1)
+EWMA_ACUTE = 2 / (ACUTE_DAYS + 1)
+EWMA_CHRONIC = 2 / (CHRONIC_DAYS + 1)
+SNAPSHOT_AFTER = 16       # segments not yet in the snapshot before it is rewritten
+PROGRESS_WEEKS = 8
+
+SESSION_COLUMNS = ("date", "duration_min", "rpe", "intensity", "body_weight_kg")
+# Per-day sums, so weekly figures (e.g. duration-weighted RPE) come straight from the daily table
+DAY_SUMS = ("sessions", "minutes", "load", "rpe_minutes")
+
+
+def athlete_id(name):
+    """Log key for an athlete name ("Sarah K." -> "sarah-k"); None for an empty name.
+
+    Not an authenticated identity: anyone who types the same name shares the log.
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", str(name or "").lower()).strip("-")
+    return slug or None
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def acwr_zone(ratio):
+    if ratio is None or np.isnan(ratio):
+        return "Building baseline"
+    if ratio < 0.8:
+        return "Under-training"
+    if ratio <= 1.3:
+        return "Sweet spot"
+    if ratio <= 1.5:
+        return "Caution"
+    return "High injury risk"
+
+
+# ─────────────────────────────────────────────
+# VECTORISED METRICS
+# ─────────────────────────────────────────────
+def read_sessions_csv(source):
+    """Sessions from a CSV path or file object (columns as in SESSION_COLUMNS, extras kept)."""
+    import pandas as pd
+    df = pd.read_csv(source)
+    df.columns = [str(column).strip().lower() for column in df.columns]
+    return df
+
+
+def sessions_frame(sessions):
+    """Validated sessions (list of dicts or DataFrame) with their session-RPE load."""
+    import pandas as pd
+    df = pd.DataFrame(sessions).copy()
+    missing = [column for column in ("date", "duration_min", "rpe") if column not in df.columns]
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(missing)}")
+    if "intensity" not in df.columns:
+        df["intensity"] = ""
+    if "body_weight_kg" not in df.columns:
+        df["body_weight_kg"] = np.nan
+    df = df[list(SESSION_COLUMNS)]
+    df["date"] = pd.to_datetime(df["date"], errors="coerce").dt.normalize().astype("datetime64[ns]")
+    for column in ("duration_min", "rpe", "body_weight_kg"):
+        df[column] = pd.to_numeric(df[column], errors="coerce").astype("float64")
+    df["intensity"] = df["intensity"].fillna("").astype(str)
+    bad = (df["date"].isna() | ~df["duration_min"].between(1, 600) | ~df["rpe"].between(0, 10)
+           | (df["body_weight_kg"].notna() & ~df["body_weight_kg"].between(20, 250)))
+    if bad.any():
+        raise ValueError(f"{int(bad.sum())} session(s) need a date, 1-600 minutes, an RPE of 0-10 "
+                         "and (if given) a body weight of 20-250 kg")
+    df["load"] = df["duration_min"] * df["rpe"]       # session-RPE load, arbitrary units
+    return df
+
+
+def _daily_sums(sessions):
+    """Per-day sums and the day's last recorded body weight, indexed by date."""
+    grouped = sessions.assign(sessions=1, minutes=sessions["duration_min"],
+                              rpe_minutes=sessions["rpe"] * sessions["duration_min"]).groupby("date")
+    days = grouped[list(DAY_SUMS)].sum()
+    days["body_weight"] = grouped["body_weight_kg"].last()       # last non-null of the day
+    return days
+
+
+def _ewma(values, alpha, seed):
+    import pandas as pd
+    series = pd.Series(values, dtype="float64")
+    if seed is None or np.isnan(seed):
+        return series.ewm(alpha=alpha, adjust=False).mean().to_numpy()
+    seeded = pd.concat([pd.Series([seed]), series], ignore_index=True)
+    return seeded.ewm(alpha=alpha, adjust=False).mean().to_numpy()[1:]
+
+
+def daily_metrics(prefix, days):
+    """Metric rows for `days` (consecutive dates with DAY_SUMS + body_weight), continuing `prefix`.
+
+    Only the last CHRONIC_DAYS - 1 rows of prefix are read, whatever its length.
+    """
+    import pandas as pd
+    tail = prefix.iloc[-(CHRONIC_DAYS - 1):]
+    last = prefix.iloc[-1] if len(prefix) else None
+    n = len(tail)
+    load = pd.Series(np.concatenate([tail["load"].to_numpy(float), days["load"].to_numpy(float)]))
+    acute = load.rolling(ACUTE_DAYS, min_periods=1).sum().to_numpy()[n:]
+    # Chronic load as a weekly equivalent (28-day sum / 4), so the ratio compares like with like
+    chronic = load.rolling(CHRONIC_DAYS, min_periods=1).sum().to_numpy()[n:] * ACUTE_DAYS / CHRONIC_DAYS
+    mean7 = load.rolling(ACUTE_DAYS, min_periods=1).mean().to_numpy()[n:]
+    std7 = load.rolling(ACUTE_DAYS, min_periods=2).std(ddof=0).to_numpy()[n:]
+    day_index = (int(last["day_index"]) + 1 if last is not None else 0) + np.arange(len(days))
+    ewma_acute = _ewma(days["load"], EWMA_ACUTE, last["ewma_acute"] if last is not None else None)
+    ewma_chronic = _ewma(days["load"], EWMA_CHRONIC, last["ewma_chronic"] if last is not None else None)
+    weight = pd.Series(np.concatenate([tail["body_weight_last"].to_numpy(float),
+                                       days["body_weight"].to_numpy(float)])).ffill()
+
+    baseline = day_index >= CHRONIC_DAYS - 1        # a ratio needs four weeks of history
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = pd.DataFrame({
+            "date":             days.index.to_numpy(),
+            "day_index":        day_index,
+            **{column: days[column].to_numpy(float) for column in DAY_SUMS},
+            "body_weight":      days["body_weight"].to_numpy(float),
+            "body_weight_last": weight.to_numpy()[n:],
+            "body_weight_7d":   weight.rolling(ACUTE_DAYS, min_periods=1).mean().to_numpy()[n:],
+            "acute_load":       acute,
+            "chronic_load":     chronic,
+            "acwr":             np.where(baseline & (chronic > 0), acute / chronic, np.nan),
+            "ewma_acute":       ewma_acute,
+            "ewma_chronic":     ewma_chronic,
+            "ewma_acwr":        np.where(baseline & (ewma_chronic > 0), ewma_acute / ewma_chronic, np.nan),
+            "monotony":         np.where(std7 > 0, mean7 / std7, np.nan),
+        })
+    return out
+
+
+def _empty_daily():
+    import pandas as pd
+    return pd.DataFrame({"day_index": [], "load": [], "body_weight_last": [],
+                         "ewma_acute": [], "ewma_chronic": []})
+
+
+def apply_sessions(frame, sessions):
+    """The daily table with `sessions` added; only days from the earliest new session are recomputed."""
+    import pandas as pd
+    new = _daily_sums(sessions)
+    start = new.index.min()
+    if frame is None or frame.empty:
+        prefix, old = None, None
+        end = new.index.max()
+    else:
+        cut = int(frame["date"].searchsorted(start))
+        prefix, old = frame.iloc[:cut], frame.iloc[cut:].set_index("date")
+        if cut:
+            start = prefix["date"].iloc[-1] + pd.Timedelta(days=1)     # fill rest days up to the session
+        end = max(new.index.max(), frame["date"].iloc[-1])
+    dates = pd.date_range(start, end, freq="D")
+    days = new.reindex(dates)
+    days[list(DAY_SUMS)] = days[list(DAY_SUMS)].fillna(0)
+    if old is not None and len(old):
+        days[list(DAY_SUMS)] += old[list(DAY_SUMS)].reindex(dates, fill_value=0)
+        days["body_weight"] = days["body_weight"].fillna(old["body_weight"].reindex(dates))
+    if prefix is None or prefix.empty:
+        return daily_metrics(_empty_daily(), days)
+    return pd.concat([prefix, daily_metrics(prefix, days)], ignore_index=True)
+
+
+def rest_days(frame, as_of):
+    """The table continued with zero-load days up to `as_of` (not stored), or cut at `as_of`."""
+    import pandas as pd
+    as_of = pd.Timestamp(as_of)
+    last = frame["date"].iloc[-1]
+    if as_of <= last:
+        return frame.iloc[:int(frame["date"].searchsorted(as_of, side="right"))]
+    dates = pd.date_range(last + pd.Timedelta(days=1), as_of, freq="D")
+    days = pd.DataFrame({column: 0.0 for column in DAY_SUMS}, index=dates)
+    days["body_weight"] = np.nan
+    return pd.concat([frame, daily_metrics(frame, days)], ignore_index=True)
+
+
+def weekly_table(daily, weeks=PROGRESS_WEEKS):
+    """Progress table of the last `weeks` Monday-Sunday weeks of a daily table (newest last)."""
+    import pandas as pd
+    end = daily["date"].iloc[-1]
+    first = end - pd.Timedelta(days=int(end.weekday()) + 7 * (weeks - 1))
+    rows = daily.iloc[int(daily["date"].searchsorted(first)):]
+    week = rows["date"] - pd.to_timedelta(rows["date"].dt.weekday, unit="D")
+    grouped = rows.groupby(week)
+    sums = grouped[list(DAY_SUMS)].sum()
+    latest = grouped[["acwr", "body_weight_last"]].last()
+    starts = pd.date_range(first, periods=weeks, freq="7D")
+    sums = sums.reindex(starts, fill_value=0)
+    latest = latest.reindex(starts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg_rpe = np.where(sums["minutes"] > 0, sums["rpe_minutes"] / sums["minutes"], np.nan)
+    return pd.DataFrame({
+        "Week":             [f"{start:%d %b}" for start in starts],
+        "Sessions":         sums["sessions"].astype(int).to_numpy(),
+        "Minutes":          sums["minutes"].round().astype(int).to_numpy(),
+        "Load (AU)":        sums["load"].round().astype(int).to_numpy(),
+        "Avg RPE":          np.round(avg_rpe, 1),
+        "ACWR":             latest["acwr"].round(2).to_numpy(),
+        "Body Weight (kg)": latest["body_weight_last"].round(1).to_numpy(),
+        "Notes":            [acwr_zone(ratio) for ratio in latest["acwr"].to_numpy(float)],
+    })
+
+
+# ─────────────────────────────────────────────
+# STORE
+# ─────────────────────────────────────────────
+class _Athlete:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.daily = None            # daily metrics table, or None before the first session
+        self.applied = set()         # segment file names included in `daily`
+        self.snapshot = set()        # ... and in the snapshot on disk
+
+
+class TrainingLog:
+    """Per-athlete Parquet segments plus an incrementally maintained daily metrics table.
+
+    <root>/sessions/<athlete>/<time>-<id>.parquet   one segment per append
+    <root>/daily/<athlete>.parquet                  metrics snapshot; its metadata lists
+                                                    the segments it already includes
+    Segments are never rewritten, so several processes can append at once; each
+    one picks up the others' segments the next time it reads that athlete.
+    """
+
+    def __init__(self, root=DEFAULT_LOG_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._athletes = {}
+        self.stats = {"appends": 0, "segments_read": 0, "snapshots": 0}
+
+    @property
+    def available(self):
+        return parquet_available()
+
+    def _dir(self, athlete):
+        return os.path.join(self.root, "sessions", athlete)
+
+    def _snapshot_path(self, athlete):
+        return os.path.join(self.root, "daily", f"{athlete}.parquet")
+
+    def _state(self, athlete):
+        with self._lock:
+            return self._athletes.setdefault(athlete, _Athlete())
+
+    def _segments(self, athlete):
+        try:
+            return {name for name in os.listdir(self._dir(athlete)) if name.endswith(".parquet")}
+        except FileNotFoundError:
+            return set()
+
+    def athletes(self):
+        try:
+            return sorted(os.listdir(os.path.join(self.root, "sessions")))
+        except FileNotFoundError:
+            return []
+
+    # ── Writing ───────────────────────────
+    def append(self, athlete, sessions):
+        """Validate and store sessions for one athlete; returns how many were added."""
+        df = sessions_frame(sessions)
+        if df.empty:
+            return 0
+        os.makedirs(self._dir(athlete), exist_ok=True)
+        name = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+        path = os.path.join(self._dir(athlete), name)
+        df.to_parquet(path + ".tmp", index=False)
+        state = self._state(athlete)
+        with state.lock:
+            # Publish and apply under one lock, so a concurrent _sync cannot apply it too
+            os.replace(path + ".tmp", path)
+            if state.daily is not None and state.applied <= self._segments(athlete):
+                state.daily = apply_sessions(state.daily, df)
+                state.applied.add(name)
+            self.stats["appends"] += 1
+        self._sync(athlete)
+        return len(df)
+
+    def _write_snapshot(self, athlete, state):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(state.daily, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[b"coachbot_applied"] = json.dumps(sorted(state.applied)).encode("utf-8")
+        path = self._snapshot_path(athlete)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table.replace_schema_metadata(metadata), path + ".tmp")
+        os.replace(path + ".tmp", path)
+        state.snapshot = set(state.applied)
+        self.stats["snapshots"] += 1
+
+    # ── Reading ───────────────────────────
+    def _read_segments(self, athlete, names):
+        import pyarrow.dataset as ds
+        paths = [os.path.join(self._dir(athlete), name) for name in sorted(names)]
+        self.stats["segments_read"] += len(paths)
+        return sessions_frame(ds.dataset(paths, format="parquet").to_table().to_pandas())
+
+    def _load_snapshot(self, athlete, state):
+        import pyarrow.parquet as pq
+        try:
+            table = pq.read_table(self._snapshot_path(athlete))
+        except (FileNotFoundError, OSError):
+            return
+        applied = json.loads((table.schema.metadata or {}).get(b"coachbot_applied", b"[]"))
+        daily = table.to_pandas()
+        daily["date"] = daily["date"].astype("datetime64[ns]")
+        state.daily, state.applied, state.snapshot = daily, set(applied), set(applied)
+
+    def _sync(self, athlete):
+        """Bring the athlete's table up to date with the segments on disk; returns the state."""
+        state = self._state(athlete)
+        with state.lock:
+            segments = self._segments(athlete)
+            if state.daily is None:
+                self._load_snapshot(athlete, state)
+            if not state.applied <= segments:
+                # Segments were removed (e.g. an athlete's log was cleaned up): start over
+                state.daily, state.applied, state.snapshot = None, set(), set()
+            unseen = segments - state.applied
+            if unseen:
+                state.daily = apply_sessions(state.daily, self._read_segments(athlete, unseen))
+                state.applied |= unseen
+            if len(state.applied - state.snapshot) >= SNAPSHOT_AFTER or (
+                    state.daily is not None and not os.path.exists(self._snapshot_path(athlete))):
+                self._write_snapshot(athlete, state)
+            return state
+
+    def daily(self, athlete, as_of=None):
+        """The athlete's daily metrics table (through `as_of`, with rest days), or None."""
+        daily = self._sync(athlete).daily
+        if daily is None or daily.empty:
+            return None
+        if as_of is not None:
+            daily = rest_days(daily, as_of)
+        return daily if len(daily) else None
+
+    def revision(self, athlete):
+        """Changes whenever the athlete's log does; None without a log."""
+        state = self._sync(athlete)
+        return f"{len(state.applied)}-{max(state.applied)}" if state.applied else None
+
+    def recent_sessions(self, athlete, limit=10):
+        """The most recently logged sessions, newest first, reading only the newest segments."""
+        import pandas as pd
+        frames, count = [], 0
+        for name in sorted(self._segments(athlete), reverse=True):
+            frames.append(self._read_segments(athlete, [name]))
+            count += len(frames[-1])
+            if count >= limit:
+                break
+        if not frames:
+            return None
+        df = pd.concat(frames[::-1], ignore_index=True).sort_values("date", kind="stable")
+        return df.iloc[::-1].head(limit).reset_index(drop=True)
+
+    # ── Summaries ─────────────────────────
+    def current(self, athlete, as_of=None):
+        """Workload figures as of a date (default today), or None without a log."""
+        daily = self.daily(athlete, as_of or date.today())
+        if daily is None:
+            return None
+        row = daily.iloc[-1]
+        week = daily.iloc[-ACUTE_DAYS:]
+        minutes = week["minutes"].sum()
+        return {
+            "as_of":         row["date"].date(),
+            "last_session":  daily.loc[daily["sessions"] > 0, "date"].iloc[-1].date(),
+            "sessions_7d":   int(week["sessions"].sum()),
+            "acute_load":    float(row["acute_load"]),
+            "chronic_load":  float(row["chronic_load"]),
+            "acwr":          float(row["acwr"]),
+            "ewma_acwr":     float(row["ewma_acwr"]),
+            "monotony":      float(row["monotony"]),
+            "avg_rpe_7d":    float(week["rpe_minutes"].sum() / minutes) if minutes else float("nan"),
+            "body_weight":   float(row["body_weight_last"]),
+        }
+
+    def weekly_summary(self, athlete, weeks=PROGRESS_WEEKS, as_of=None):
+        daily = self.daily(athlete, as_of or date.today())
+        return weekly_table(daily, weeks) if daily is not None else None
+
+    def load_summary(self, athlete, as_of=None):
+        """One line for the prompt's athlete profile; "" without a log."""
+        figures = self.current(athlete, as_of) if athlete and self.available else None
+        if figures is None:
+            return ""
+        parts = [f"last 7 days {figures['acute_load']:,.0f} AU over {figures['sessions_7d']} session(s)"
+                 + (f" (avg RPE {figures['avg_rpe_7d']:.1f})" if not np.isnan(figures["avg_rpe_7d"]) else ""),
+                 f"4-week average {figures['chronic_load']:,.0f} AU/week"]
+        if not np.isnan(figures["acwr"]):
+            parts.append(f"acute:chronic workload ratio {figures['acwr']:.2f} ({acwr_zone(figures['acwr']).lower()})")
+        if not np.isnan(figures["body_weight"]):
+            parts.append(f"body weight {figures['body_weight']:.1f} kg")
+        return "; ".join(parts)
+
+    def club_overview(self, as_of=None):
+        """Latest figures for every athlete in the log, highest workload ratio first."""
+        import pandas as pd
+        rows = []
+        for athlete in self.athletes():
+            figures = self.current(athlete, as_of)
+            if figures is None:
+                continue
+            rows.append({"Athlete": athlete, "Last Session": figures["last_session"],
+                         "Sessions (7d)": figures["sessions_7d"],
+                         "Load 7d (AU)": round(figures["acute_load"]),
+                         "Weekly Avg 28d (AU)": round(figures["chronic_load"]),
+                         "ACWR": round(figures["acwr"], 2), "Zone": acwr_zone(figures["acwr"])})
+        if not rows:
+            return None
+        return pd.DataFrame(rows).sort_values("ACWR", ascending=False, na_position="last",
+                                              ignore_index=True)
+
+
+_default_log = None
+_default_lock = threading.Lock()
+
+
+def get_training_log():
+    """Process-wide log (module globals survive Streamlit reruns)."""
+    global _default_log
+    with _default_lock:
+        if _default_log is None:
+            _default_log = TrainingLog()
+        return _default_log
+
+
+@lru_cache(maxsize=256)
+def logged_progress_table(athlete, weeks, as_of, revision):
+    """Memoised per log revision and day, like the reference table builders."""
+    return get_training_log().weekly_summary(athlete, weeks, as_of=date.fromisoformat(as_of))
+
+
+def progress_source(athlete, weeks=PROGRESS_WEEKS):
+    """(builder, args) for the athlete's logged progress table, or None without a log."""
+    log = get_training_log()
+    if not athlete or not log.available:
+        return None
+    revision = log.revision(athlete)
+    if revision is None:
+        return None
+    return logged_progress_table, (athlete, weeks, date.today().isoformat(), revision)
+
+
+# ─────────────────────────────────────────────
+# CLI
+# ─────────────────────────────────────────────
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import sessions into the CoachBot training log.")
+    parser.add_argument("--log", default=DEFAULT_LOG_DIR, help="Training log directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="Append sessions from a CSV file")
+    importer.add_argument("csv", help="CSV with athlete, date, duration_min, rpe[, intensity, body_weight_kg]")
+    overview = commands.add_parser("overview", help="Print every athlete's current workload")
+    overview.add_argument("--as-of", type=date.fromisoformat, help="Date (YYYY-MM-DD), default today")
+    args = parser.parse_args(argv)
+
+    log = TrainingLog(args.log)
+    if args.command == "import":
+        sessions = read_sessions_csv(args.csv)
+        if "athlete" not in sessions.columns:
+            parser.error("the CSV needs an 'athlete' column")
+        started = time.perf_counter()
+        total = 0
+        for name, group in sessions.groupby("athlete", sort=False):
+            athlete = athlete_id(name)
+            if athlete is None:
+                continue
+            try:
+                total += log.append(athlete, group.drop(columns="athlete"))
+            except ValueError as e:
+                print(f"{name}: {e}", file=sys.stderr)
+        print(f"{total:,} sessions imported in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        return 0
+
+    table = log.club_overview(args.as_of)
+    if table is None:
+        print("The training log is empty.", file=sys.stderr)
+        return 1
+    print(table.to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())